@@ -19,11 +19,16 @@
 import json
 from mathutils import Vector
 from pathlib import Path
-from typing import Optional, Union, Tuple, List, Dict
+from typing import Any, Callable, Deque, Optional, Union, Tuple, List, Dict
+import collections
+import functools
 import inspect
 from dataclasses import dataclass
 import enum
 import os
+import tempfile
+import threading
+import time
 
 import bpy
 from bpy.utils.previews import ImagePreviewCollection
@@ -51,6 +56,14 @@ class Engine(enum.Enum):
 
 VectorType = Union[Tuple[float, float, float], Vector]
 
+
+class LogLevel(enum.IntEnum):
+	"""Levels for MCprepEnv.log, messages print at or above the env's level."""
+	DEBUG = 10  # Only when very verbose, same as vv_only=True
+	INFO = 20  # Only when verbose, the default
+	WARNING = 30  # Always
+	ERROR = 40  # Always
+
 Skin = Tuple[str, Path]
 Entity = Tuple[str, str, str]
 
@@ -73,10 +86,69 @@ except:
 # -----------------------------------------------------------------------------
 
 
+class InstrumentSpan:
+	"""Times a named span, as a context manager or function decorator.
+
+	While instrumentation is off this is only an attribute check, see
+	MCprepEnv.span for usage.
+	"""
+	__slots__ = ("env", "name", "_start")
+
+	def __init__(self, env: "MCprepEnv", name: str):
+		self.env = env
+		self.name = name
+		self._start = None
+
+	def __enter__(self) -> "InstrumentSpan":
+		if self.env.spans is not None:
+			self._start = time.perf_counter()
+		return self
+
+	def __exit__(self, *args) -> bool:
+		if self._start is not None:
+			self.env.add_span(self.name, time.perf_counter() - self._start)
+			self._start = None
+		return False
+
+	def __call__(self, func: Callable) -> Callable:
+		env = self.env
+		name = self.name
+
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			if env.spans is None:
+				return func(*args, **kwargs)
+			start = time.perf_counter()
+			try:
+				return func(*args, **kwargs)
+			finally:
+				env.add_span(name, time.perf_counter() - start)
+		return wrapper
+
+
+def get_user_data_dir() -> Path:
+	"""Returns the folder for caches that persist across sessions.
+
+	Kept in blender's user datafiles instead of the addon folder, which may be
+	read-only and is replaced on every addon update. Not created here.
+	"""
+	try:
+		path = bpy.utils.user_resource('DATAFILES', path="mcprep")
+	except (AttributeError, TypeError, ValueError):
+		path = None
+	if not path:
+		path = os.path.join(tempfile.gettempdir(), "mcprep")
+	return Path(path)
+
+
 class MCprepEnv:
 	def __init__(self):
 		self.data = None
 		self.json_data: Optional[Dict] = None
+
+		# Canonical name resolver built from json_data, see
+		# generate.get_mc_canonical_name. Reset whenever json_data is set.
+		self.canon_resolver = None
 		self.json_path: Path = Path(os.path.dirname(__file__), "MCprep_resources", "mcprep_data.json")
 		self.json_path_update: Path = Path(os.path.dirname(__file__), "MCprep_resources", "mcprep_data_update.json")
 
@@ -121,6 +193,10 @@ class MCprepEnv:
 
 		self.skin_list: List[Skin] = []  # each is: [ basename, path ]
 		self.rig_categories: List[str] = []  # simple list of directory names
+
+		# Mob icon id to source file, and icons still to load in a timer.
+		self.mob_icon_paths: Dict[str, str] = {}
+		self.mob_icon_queue: List[Tuple[str, str]] = []
 		self.entity_list: List[Entity] = []
 
 		# -----------------------------------------------
@@ -136,10 +212,69 @@ class MCprepEnv:
 		# as a seperate variable to avoid conflicts
 		self.vivy_cache = None
 		
+		# Filename index per resource pack folder, to avoid repeat stat calls
+		# when looking up textures. See generate.find_from_texturepack.
+		self.texturepack_index_cache: Dict[str, object] = {}
+
+		# Additional pass files per texture folder with the folder's mtime,
+		# see generate.find_additional_passes.
+		self.pass_index_cache: Dict[str, Tuple[int, Dict]] = {}
+
+		# Grayscale check results by image file hash, see
+		# generate.is_image_grayscale.
+		self.grayscale_cache: Dict[str, bool] = {}
+
+		# Content hashes by file path, with the size and mtime they were
+		# taken at. See generate.get_file_hash.
+		self.file_hash_cache: Dict[str, Tuple[int, int, str]] = {}
+
+		# Flattened elements and textures of json models, keyed by model path
+		# and pack roots, with the mtimes of each file up the parent chain.
+		# See mcmodel.read_model.
+		self.model_cache: Dict[Tuple[str, str, str], Dict] = {}
+
+		# Names of meshes spawned per model path and resource pack, and of
+		# materials per texture path, to reuse on later spawns. Only names are
+		# kept as datablocks may be removed or undone. See mcmodel.add_model.
+		self.model_meshes: Dict[Tuple[str, str], Dict] = {}
+		self.model_materials: Dict[str, str] = {}
+
+		# Named counters (e.g. stat calls, cache hits) for timing reports.
+		# None when not collecting, so that counting is free. See count.
+		self.counters: Optional[Dict[str, int]] = None
+		self._counters_lock = threading.Lock()
+
+		# Call count and cumulative seconds per named span, None while
+		# instrumentation is off. See span.
+		self.spans: Optional[Dict[str, List[float]]] = None
+
+		# Most recent logged messages, included in error reports. See log.
+		self.log_history: Deque[str] = collections.deque(maxlen=100)
+
+		# Names of datablocks within library blend files, keyed by path and
+		# persisted to disk. None until first read, see util.get_blend_contents.
+		self.library_index: Optional[Dict[str, Dict]] = None
+		self.library_index_path: Path = Path(get_user_data_dir(), "library_index.json")
+
+		# ETag and Last-Modified of downloaded skins keyed by save location,
+		# persisted to disk. None until first read, see skin.fetch_skin.
+		self.skin_download_cache: Optional[Dict[str, Dict]] = None
+		self.skin_download_cache_path: Path = Path(get_user_data_dir(), "skin_download_cache.json")
+
 		# The JSON file for Vivy's materials
 		self.vivy_material_json: Optional[Dict] = None
 		self.reload_vivy_json() # Get latest JSON data
 
+	@property
+	def json_data(self) -> Optional[Dict]:
+		return self._json_data
+
+	@json_data.setter
+	def json_data(self, value: Optional[Dict]) -> None:
+		self._json_data = value
+		# Any lookup structures derived from the old data are now stale.
+		self.canon_resolver = None
+
 	def reload_vivy_json(self) -> None:
 		json_path = Path(os.path.join(os.path.dirname(__file__), "MCprep_resources", "vivy_materials.json"))
 		if not json_path.exists():
@@ -219,12 +354,99 @@ class MCprepEnv:
 				self.log('Issue clearing preview set ' + str(pcoll))
 				print(e)
 		self.preview_collections.clear()
+		self.mob_icon_paths = {}
+
+	@property
+	def log_level(self) -> LogLevel:
+		"""Lowest level of messages printed by log, per the verbose settings."""
+		if not self.verbose:
+			return LogLevel.WARNING
+		elif self.very_verbose:
+			return LogLevel.DEBUG
+		return LogLevel.INFO
+
+	def log(
+		self,
+		statement: Union[Any, Callable[[], Any]],
+		*args: Any,
+		vv_only: bool = False,
+		level: Optional[LogLevel] = None
+	) -> None:
+		"""Print a statement if its level is enabled, and keep it in history.
+
+		Formatting only happens once the level is known to be enabled, so in
+		loops pass %-style args, e.g. env.log("Tile %d", i), or a callable
+		returning the statement instead of building an f-string per call.
+
+		Args:
+			statement: Message, or callable returning it, %-formatted with args
+			vv_only: Shorthand for level=LogLevel.DEBUG
+			level: Defaults to LogLevel.INFO
+		"""
+		if level is None:
+			level = LogLevel.DEBUG if vv_only else LogLevel.INFO
+		if level < self.log_level:
+			return
+		if callable(statement):
+			statement = statement()
+		if args:
+			statement = statement % args
+		print(statement)
+		self.log_history.append(str(statement))
+
+	def count(self, name: str, amount: int = 1) -> None:
+		"""Increment a named counter, if counters are being collected."""
+		if self.counters is None:
+			return
+		with self._counters_lock:
+			self.counters[name] = self.counters.get(name, 0) + amount
 
-	def log(self, statement: str, vv_only: bool = False):
-		if self.verbose and vv_only and self.very_verbose:
-			print(statement)
-		elif self.verbose:
-			print(statement)
+	# -----------------------------------------------------------------------------
+	# INSTRUMENTATION
+	# -----------------------------------------------------------------------------
+
+	def span(self, name: str) -> InstrumentSpan:
+		"""Time a block or function as a named span, while instrumenting.
+
+		Use as a decorator, e.g. @env.span("util.obj_copy"), or as a context
+		manager with `with env.span("name"):`. Nested calls of the same span
+		are each added to its cumulative time.
+		"""
+		return InstrumentSpan(self, name)
+
+	def add_span(self, name: str, seconds: float) -> None:
+		"""Add one call of a span, if instrumentation is on."""
+		if self.spans is None:
+			return
+		with self._counters_lock:
+			span = self.spans.get(name)
+			if span is None:
+				self.spans[name] = [1, seconds]
+			else:
+				span[0] += 1
+				span[1] += seconds
+
+	def start_instrumentation(self) -> None:
+		"""Start collecting spans and counters, clearing any prior results."""
+		self.spans = {}
+		self.counters = {}
+
+	def stop_instrumentation(self) -> None:
+		self.spans = None
+		self.counters = None
+
+	def instrumentation_report(self) -> Dict[str, Dict]:
+		"""Returns the collected spans, slowest cumulative time first."""
+		spans = self.spans or {}
+		ordered = sorted(spans.items(), key=lambda item: item[1][1], reverse=True)
+		return {
+			"spans": {
+				name: {
+					"calls": calls,
+					"seconds": seconds,
+					"mean_ms": seconds / calls * 1000}
+				for name, (calls, seconds) in ordered},
+			"counters": dict(self.counters or {})}
 
 	def deprecation_warning(self):
 		if self.dev_build:
@@ -334,5 +556,17 @@ def unregister():
 	env.loaded_all_spawners = False
 	env.skin_list = []
 	env.rig_categories = []
+	env.mob_icon_paths = {}
+	env.mob_icon_queue = []
 	env.material_sync_cache = []
 	env.vivy_cache = []
+	env.texturepack_index_cache = {}
+	env.grayscale_cache = {}
+	env.file_hash_cache = {}
+	env.model_cache = {}
+	env.model_meshes = {}
+	env.model_materials = {}
+	env.stop_instrumentation()
+	env.pass_index_cache = {}
+	env.library_index = None
+	env.skin_download_cache = None
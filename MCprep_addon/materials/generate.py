@@ -16,8 +16,11 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import os
-from typing import Dict, Optional, List, Any, Tuple, Union
+import time
+from typing import Callable, Dict, Optional, List, Any, Tuple, Union
 from pathlib import Path
 from dataclasses import dataclass
 from enum import Enum
@@ -25,6 +28,12 @@ from enum import Enum
 import bpy
 from bpy.types import Context, Material, Image, Texture, Nodes, NodeLinks, Node
 
+# Bundled with Blender, but keep the pure python fallbacks working without it.
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
 from .. import util
 from ..conf import env, Form
 
@@ -52,95 +61,136 @@ def update_mcprep_texturepack_path(self, context: Context) -> None:
 	context.scene.mcprep_particle_plane_file = ''
 
 
-def get_mc_canonical_name(name: str) -> Tuple[str, Optional[Form]]:
-	"""Convert a material name to standard MC name.
+class CanonicalNameResolver:
+	"""Precompiled lookup of material names to canonical MC names.
 
-	Returns:
-		canonical name, or fallback to generalized name (never returns None)
-		form (mc, jmc, or mineways)
+	Built once from the loaded mcprep_data.json, merging the mc, jmc and
+	mineways block mappings into a single index while preserving the lookup
+	priority of exact mc, jmc, mineways matches and then lowercase jmc,
+	mineways matches. Results are memoized per raw material name.
 	"""
-	general_name = util.nameGeneralize(name)
-	if not env.json_data:
-		res = util.load_mcprep_json()
-		if not res:
-			return general_name, None
+	# Upper bound on the number of memoized raw names, oldest dropped first.
+	max_cache_size = 8192
 
-	# Special case to allow material names, e.g. in meshswap, to end in .emit
-	# while still mapping to canonical names, to pick up features like animated
-	# textures. Cross check that name isn't exactly .emit to avoid None return.
-	if ".emit" in general_name and general_name != ".emit":
-		general_name = general_name.replace(".emit", "")
-
-	no_missing = "blocks" in env.json_data
-	no_missing &= "block_mapping_mc" in env.json_data["blocks"]
-	no_missing &= "block_mapping_jmc" in env.json_data["blocks"]
-	no_missing &= "block_mapping_mineways" in env.json_data["blocks"]
-
-	if no_missing is False:
-		env.log("Missing key values in json")
-		return general_name, None
-
-	# The below workaround is to account for the jmc2obj v113+ which changes
-	# how mappings and assignments work.
-	if general_name.startswith("minecraft_block-"):
-		# minecraft_block-name maps to textures/block/name.png,
-		# other options over block are: entity, models, etc.
-		jmc_prefix = True
-		general_name = name[len("minecraft_block-"):]
-	else:
-		jmc_prefix = False
-
-	# Patch naming to avoid issues.
-	if general_name == "water":
-		# Improves connection with older exports, without getting
-		# mixed up with the new "water": "painting/water" texture.
-		general_name = "water_still"
-
-	if general_name in env.json_data["blocks"]["block_mapping_mc"]:
-		canon = env.json_data["blocks"]["block_mapping_mc"][general_name]
-		form = "mc" if not jmc_prefix else "jmc2obj"
-	elif general_name in env.json_data["blocks"]["block_mapping_jmc"]:
-		canon = env.json_data["blocks"]["block_mapping_jmc"][general_name]
-		form = "jmc2obj"
-	elif general_name in env.json_data["blocks"]["block_mapping_mineways"]:
-		canon = env.json_data["blocks"]["block_mapping_mineways"][general_name]
-		form = "mineways"
-	elif general_name.lower() in env.json_data["blocks"]["block_mapping_jmc"]:
-		canon = env.json_data["blocks"]["block_mapping_jmc"][
-			general_name.lower()]
-		form = "jmc2obj"
-	elif general_name.lower() in env.json_data["blocks"]["block_mapping_mineways"]:
-		canon = env.json_data["blocks"]["block_mapping_mineways"][
-			general_name.lower()]
-		form = "mineways"
-	else:
-		env.log(f"Canonical name not matched: {general_name}", vv_only=True)
-		canon = general_name
-		form = None
+	def __init__(self, json_data: Optional[Dict]):
+		self.valid = False
+		self._exact: Dict[str, Tuple[str, str]] = {}
+		self._folded: Dict[str, Tuple[str, str]] = {}
+		self._cache: Dict[str, Tuple[str, Optional[Form]]] = {}
 
-	if canon is None or canon == '':
-		env.log(f"Error: Encountered None canon value with {general_name}")
-		canon = general_name
+		if not json_data or "blocks" not in json_data:
+			return
+		blocks = json_data["blocks"]
+		mapping_keys = [
+			"block_mapping_mc", "block_mapping_jmc", "block_mapping_mineways"]
+		if not all(key in blocks for key in mapping_keys):
+			return
+		self.valid = True
+
+		# Insert lowest priority first, so higher priority mappings overwrite.
+		for form, key in [
+				("mineways", "block_mapping_mineways"),
+				("jmc2obj", "block_mapping_jmc"),
+				("mc", "block_mapping_mc")]:
+			for name, canon in blocks[key].items():
+				self._exact[name] = (canon, form)
+		for form, key in [
+				("mineways", "block_mapping_mineways"),
+				("jmc2obj", "block_mapping_jmc")]:
+			for name, canon in blocks[key].items():
+				self._folded[name] = (canon, form)
+
+	def resolve(self, name: str) -> Tuple[str, Optional[Form]]:
+		"""Return the canonical name and form for a raw material name."""
+		res = self._cache.get(name)
+		if res is not None:
+			return res
+		res = self._resolve(name)
+		if len(self._cache) >= self.max_cache_size:
+			del self._cache[next(iter(self._cache))]
+		self._cache[name] = res
+		return res
+
+	def _resolve(self, name: str) -> Tuple[str, Optional[Form]]:
+		general_name = util.nameGeneralize(name)
+
+		# Special case to allow material names, e.g. in meshswap, to end in .emit
+		# while still mapping to canonical names, to pick up features like
+		# animated textures. Cross check that name isn't exactly .emit to avoid
+		# None return.
+		if ".emit" in general_name and general_name != ".emit":
+			general_name = general_name.replace(".emit", "")
+
+		if not self.valid:
+			env.log("Missing key values in json")
+			return general_name, None
 
-	return canon, form
+		# The below workaround is to account for the jmc2obj v113+ which changes
+		# how mappings and assignments work.
+		if general_name.startswith("minecraft_block-"):
+			# minecraft_block-name maps to textures/block/name.png,
+			# other options over block are: entity, models, etc.
+			jmc_prefix = True
+			general_name = name[len("minecraft_block-"):]
+		else:
+			jmc_prefix = False
+
+		# Patch naming to avoid issues.
+		if general_name == "water":
+			# Improves connection with older exports, without getting
+			# mixed up with the new "water": "painting/water" texture.
+			general_name = "water_still"
+
+		match = self._exact.get(general_name)
+		if match is None:
+			match = self._folded.get(general_name.lower())
+
+		if match is not None:
+			canon, form = match
+			if form == "mc" and jmc_prefix:
+				form = "jmc2obj"
+		else:
+			env.log("Canonical name not matched: %s", general_name, vv_only=True)
+			canon = general_name
+			form = None
 
+		if canon is None or canon == '':
+			env.log(f"Error: Encountered None canon value with {general_name}")
+			canon = general_name
 
-def find_from_texturepack(blockname: str, resource_folder: Optional[Path]=None) -> Path:
-	"""Given a blockname (and resource folder), find image filepath.
+		return canon, form
 
-	Finds textures following any pack which should have this structure, and
-	the input folder or default resource folder could target at any of the
-	following sublevels above the <subfolder> level.
-	//pack_name/assets/minecraft/textures/<subfolder>/<blockname.png>
-	"""
-	if not resource_folder:
-		# default to internal pack
-		resource_folder = bpy.path.abspath(bpy.context.scene.mcprep_texturepack_path)
 
-	if not os.path.isdir(resource_folder):
-		env.log("Error, resource folder does not exist")
-		return
+@env.span("generate.get_mc_canonical_name")
+def get_mc_canonical_name(name: str) -> Tuple[str, Optional[Form]]:
+	"""Convert a material name to standard MC name.
 
+	Returns:
+		canonical name, or fallback to generalized name (never returns None)
+		form (mc, jmc, or mineways)
+	"""
+	resolver = env.canon_resolver
+	if resolver is None:
+		if not env.json_data:
+			res = util.load_mcprep_json()
+			if not res:
+				return util.nameGeneralize(name), None
+		resolver = CanonicalNameResolver(env.json_data)
+		env.canon_resolver = resolver
+	return resolver.resolve(name)
+
+
+# Extensions and /textures subfolders checked for a block name, in the order
+# of priority used when multiple matches exist.
+TEXTURE_EXTENSIONS = [".png", ".jpg", ".jpeg"]
+TEXTURE_SUBFOLDERS = [
+	"",
+	# Both singular and plural shown below as it has varied historically.
+	"blocks", "block", "items", "item", "entity", "models", "model"]
+
+
+def get_pack_textures_folder(resource_folder: str) -> Optional[str]:
+	"""Returns the /textures folder of a resource pack, None if not found."""
 	# Check multiple paths, picking the first match (order is important),
 	# goal of picking out the /textures folder.
 	check_dirs = [
@@ -149,54 +199,230 @@ def find_from_texturepack(blockname: str, resource_folder: Optional[Path]=None)
 		os.path.join(resource_folder, "assets", "minecraft", "textures")]
 	for path in check_dirs:
 		if os.path.isdir(path):
-			resource_folder = path
-			break
-
-	search_paths = [
-		resource_folder,
-		# Both singular and plural shown below as it has varied historically.
-		os.path.join(resource_folder, "blocks"),
-		os.path.join(resource_folder, "block"),
-		os.path.join(resource_folder, "items"),
-		os.path.join(resource_folder, "item"),
-		os.path.join(resource_folder, "entity"),
-		os.path.join(resource_folder, "models"),
-		os.path.join(resource_folder, "model"),
-	]
-	res = None
+			return path
+	return None
+
+
+class TexturePackIndex:
+	"""Filename index of a resource pack, built from a single folder walk.
+
+	Finds textures following any pack which should have this structure, and
+	the resource folder could target at any of the following sublevels above
+	the <subfolder> level.
+	//pack_name/assets/minecraft/textures/<subfolder>/<blockname.png>
+	"""
+	# Minimum seconds between checking the folder mtimes for changes.
+	recheck_interval = 2.0
+
+	def __init__(self, resource_folder: str, textures_folder: str):
+		self.resource_folder = resource_folder
+		self.textures_folder = textures_folder
+
+		# Relative paths use forward slashes, e.g. block/stone.png. Lookups
+		# match the exact case first, then fall back to the lowercase paths
+		# like the os.path.isfile checks did on Windows and macOS.
+		self._files: Dict[str, str] = {}
+		self._files_lower: Dict[str, str] = {}
+		self._stems: Dict[str, str] = {}
+		self._stems_lower: Dict[str, str] = {}
+		self._dir_mtimes: Dict[str, float] = {}
+		self._last_check = time.time()
+		self._scan()
+
+	def _scan(self) -> None:
+		"""Walk the textures folder once, recording files and folder mtimes."""
+		try:
+			self._dir_mtimes[self.resource_folder] = os.stat(
+				self.resource_folder).st_mtime
+		except OSError:
+			return
+
+		folders = [("", self.textures_folder)]
+		while folders:
+			rel_dir, path = folders.pop()
+			env.count("stat_calls")
+			try:
+				self._dir_mtimes[path] = os.stat(path).st_mtime
+				with os.scandir(path) as scan:
+					entries = list(scan)
+			except OSError as e:
+				env.log(f"Could not scan resource folder {path}: {e}")
+				continue
+			for entry in entries:
+				rel_path = rel_dir + entry.name
+				if entry.is_dir():
+					folders.append((rel_path + "/", entry.path))
+				elif entry.is_file():
+					self._files[rel_path] = entry.path
+					# Prefer an exact lowercase name if several differ by case
+					lower = rel_path.lower()
+					if lower not in self._files_lower or rel_path == lower:
+						self._files_lower[lower] = entry.path
+
+		self._stems = self._resolve_stems(self._files)
+		self._stems_lower = self._resolve_stems(self._files_lower)
+
+	@staticmethod
+	def _resolve_stems(files: Dict[str, str]) -> Dict[str, str]:
+		"""Pre-resolve plain block names using the subfolder/extension priority."""
+		folder_rank = {name: i for i, name in enumerate(TEXTURE_SUBFOLDERS)}
+		ext_rank = {ext: i for i, ext in enumerate(TEXTURE_EXTENSIONS)}
+		best: Dict[str, Tuple[Tuple[int, int], str]] = {}
+		for rel_path, path in files.items():
+			folder, _, filename = rel_path.rpartition("/")
+			stem, ext = os.path.splitext(filename)
+			if folder not in folder_rank or ext not in ext_rank:
+				continue
+			rank = (folder_rank[folder], ext_rank[ext])
+			if stem not in best or rank < best[stem][0]:
+				best[stem] = (rank, path)
+		return {stem: path for stem, (_, path) in best.items()}
+
+	def is_stale(self) -> bool:
+		"""Check if any scanned folder changed, throttled by recheck_interval."""
+		now = time.time()
+		if now - self._last_check < self.recheck_interval:
+			return False
+		self._last_check = now
+		env.count("stat_calls", len(self._dir_mtimes))
+		for path, mtime in self._dir_mtimes.items():
+			try:
+				if os.stat(path).st_mtime != mtime:
+					return True
+			except OSError:
+				return True
+		return False
+
+	def find(self, blockname: str) -> Optional[str]:
+		"""Return the image filepath for a blockname, or None if not found."""
+		res = self._find(blockname, self._files, self._stems)
+		if res is None:
+			res = self._find(
+				blockname.lower(), self._files_lower, self._stems_lower)
+		return res
+
+	@staticmethod
+	def _find(
+		blockname: str, files: Dict[str, str], stems: Dict[str, str]
+	) -> Optional[str]:
+		"""Look up a blockname in one of the exact or lowercase indexes."""
+		# first see if subpath included is found, prioritize use of that
+		if "/" in blockname:
+			for newpath in [blockname, os.path.basename(blockname)]:
+				for ext in TEXTURE_EXTENSIONS:
+					res = files.get(newpath + ext)
+					if res:
+						return res
+
+			# fallback (more common case), wide-search for
+			for folder in TEXTURE_SUBFOLDERS:
+				prefix = folder + "/" if folder else ""
+				for ext in TEXTURE_EXTENSIONS:
+					res = files.get(prefix + blockname + ext)
+					if res:
+						return res
+		else:
+			res = stems.get(blockname)
+			if res:
+				return res
+
+		# Mineways fallback
+		for suffix in ["-Alpha", "-RGB", "-RGBA"]:
+			if blockname.lower() == blockname:
+				suffix = suffix.lower()
+			if blockname.endswith(suffix):
+				res = files.get(f"mineways_assets/mineways{suffix}.png")
+				if res:
+					return res
+		return None
+
+
+def get_texturepack_index(resource_folder: Union[str, Path]) -> Optional[TexturePackIndex]:
+	"""Get the cached index for a resource folder, rebuilding if changed.
+
+	Returns None if the resource folder does not exist, or has no /textures
+	folder to index, see find_in_folder.
+	"""
+	key = str(resource_folder)
+	index = env.texturepack_index_cache.get(key)
+	if index is not None and not index.is_stale():
+		env.count("cache_hits")
+		return index
+	env.count("cache_misses")
+	env.count("stat_calls")
+	textures_folder = None
+	if os.path.isdir(key):
+		textures_folder = get_pack_textures_folder(key)
+	if textures_folder is None:
+		env.texturepack_index_cache.pop(key, None)
+		return None
+	env.log(f"Indexing resource folder: {key}", vv_only=True)
+	index = TexturePackIndex(key, textures_folder)
+	env.texturepack_index_cache[key] = index
+	return index
+
+
+def find_in_folder(blockname: str, folder: str) -> Optional[str]:
+	"""Find a block image directly on disk, for folders without /textures.
+
+	Such folders could be anything, so these are only checked by path rather
+	than walked and indexed.
+	"""
+	search_paths = [folder] + [
+		os.path.join(folder, subfolder) for subfolder in TEXTURE_SUBFOLDERS[1:]]
 
 	# first see if subpath included is found, prioritize use of that
-	extensions = [".png", ".jpg", ".jpeg"]
 	if "/" in blockname:
 		newpath = blockname.replace("/", os.path.sep)
-		for ext in extensions:
-			if os.path.isfile(os.path.join(resource_folder, newpath + ext)):
-				res = os.path.join(resource_folder, newpath + ext)
-				return res
-		newpath = os.path.basename(blockname)  # case where goes into other subpaths
-		for ext in extensions:
-			if os.path.isfile(os.path.join(resource_folder, newpath + ext)):
-				res = os.path.join(resource_folder, newpath + ext)
-				return res
+		for name in [newpath, os.path.basename(blockname)]:
+			for ext in TEXTURE_EXTENSIONS:
+				env.count("stat_calls")
+				if os.path.isfile(os.path.join(folder, name + ext)):
+					return os.path.join(folder, name + ext)
 
 	# fallback (more common case), wide-search for
 	for path in search_paths:
+		env.count("stat_calls")
 		if not os.path.isdir(path):
 			continue
-		for ext in extensions:
+		for ext in TEXTURE_EXTENSIONS:
 			check_path = os.path.join(path, blockname + ext)
+			env.count("stat_calls")
 			if os.path.isfile(check_path):
-				res = os.path.join(path, blockname + ext)
-				return res
+				return check_path
+
 	# Mineways fallback
 	for suffix in ["-Alpha", "-RGB", "-RGBA"]:
 		if blockname.endswith(suffix):
-			res = os.path.join(
-				resource_folder, "mineways_assets", f"mineways{suffix}.png")
+			res = os.path.join(folder, "mineways_assets", f"mineways{suffix}.png")
+			env.count("stat_calls")
 			if os.path.isfile(res):
 				return res
+	return None
 
-	return res
+
+@env.span("generate.find_from_texturepack")
+def find_from_texturepack(blockname: str, resource_folder: Optional[Path]=None) -> Path:
+	"""Given a blockname (and resource folder), find image filepath.
+
+	Finds textures following any pack which should have this structure, and
+	the input folder or default resource folder could target at any of the
+	following sublevels above the <subfolder> level.
+	//pack_name/assets/minecraft/textures/<subfolder>/<blockname.png>
+
+	Lookups use a cached TexturePackIndex of the folder, see above.
+	"""
+	if not resource_folder:
+		# default to internal pack
+		resource_folder = bpy.path.abspath(bpy.context.scene.mcprep_texturepack_path)
+
+	index = get_texturepack_index(resource_folder)
+	if index is not None:
+		return index.find(blockname)
+	if not os.path.isdir(resource_folder):
+		env.log("Error, resource folder does not exist")
+		return
+	return find_in_folder(blockname, str(resource_folder))
 
 
 def detect_form(materials: List[Material]) -> Optional[Form]:
@@ -304,12 +530,33 @@ class PrepOptions:
 	use_emission: bool
 
 
-def matprep_cycles(mat: Material, options: PrepOptions) -> Optional[bool]:
+def get_material_generator(
+	options: PrepOptions, use_node_group: bool=False
+) -> Callable[[Material, PrepOptions], Optional[bool]]:
+	"""Returns the matgen function matprep_cycles would build a material with."""
+	# TODO: Update different options for water before enabling this
+	# if use_reflections and checklist(canon, "water"):
+	#     res = matgen_special_water(mat, passes)
+	# if use_reflections and checklist(canon, "glass"):
+	#	res = matgen_special_glass(mat, passes)
+	if use_node_group:
+		return matgen_cycles_group
+	elif options.pack_format == PackFormat.SIMPLE:
+		return matgen_cycles_simple
+	elif options.use_principled:
+		return matgen_cycles_principled
+	return matgen_cycles_original
+
+
+@env.span("generate.matprep_cycles")
+def matprep_cycles(mat: Material, options: PrepOptions, use_node_group: bool=False) -> Optional[bool]:
 	"""Determine how to prep or generate the cycles materials.
 
 	Args:
 		mat: the existing material
 		options: All PrepOptions for this configuration, see class definition
+		use_node_group: Reference a shared node group per pack format instead
+			of generating the full node tree into the material
 
 	Returns:
 		int: 0 only if successful, otherwise None or other
@@ -321,18 +568,8 @@ def matprep_cycles(mat: Material, options: PrepOptions) -> Optional[bool]:
 	canon, _ = get_mc_canonical_name(matGen)
 	options.use_emission = checklist(canon, "emit") or "emit" in mat.name.lower()
 
-	# TODO: Update different options for water before enabling this
-	# if use_reflections and checklist(canon, "water"):
-	#     res = matgen_special_water(mat, passes)
-	# if use_reflections and checklist(canon, "glass"):
-	#	res = matgen_special_glass(mat, passes)
-	if options.pack_format == PackFormat.SIMPLE:
-		res = matgen_cycles_simple(mat, options)
-	elif options.use_principled:
-		res = matgen_cycles_principled(mat, options)
-	else:
-		res = matgen_cycles_original(mat, options)
-	return res
+	matgen = get_material_generator(options, use_node_group)
+	return matgen(mat, options)
 
 
 def set_texture_pack(
@@ -562,10 +799,60 @@ def get_textures(material: Material) -> Dict[str, Image]:
 	return passes
 
 
+# valid extentsions and ending names for pass types
+PASS_EXTENSIONS = [".png", ".jpg", ".jpeg", ".tiff"]
+PASS_SUFFIXES = {
+	"normal": [" n", "_n", "-n", " normal", "_norm", "_nrm", " normals"],
+	"specular": [" s", "_s", "-s", " specular", "_spec"],
+	"displace": [" d", "_d", "-d", " displace", "_disp", " bump", " b", "_b", "-b"],
+}
+
+
+def build_pass_index(img_dir: Path) -> Dict[str, Dict[str, Path]]:
+	"""Map each lowercase diffuse name in a folder to its additional passes.
+
+	Later files in the listing take precedence, as find_additional_passes
+	did when matching each file in turn.
+	"""
+	index = {}
+	with os.scandir(img_dir) as entries:
+		for entry in entries:
+			this_base, ext = os.path.splitext(entry.name)
+			if ext.lower() not in PASS_EXTENSIONS or not entry.is_file():
+				continue
+			this_base = this_base.lower()
+			for pass_name, suffixes in PASS_SUFFIXES.items():
+				for suffix in suffixes:
+					if this_base.endswith(suffix):
+						base = this_base[:-len(suffix)]
+						index.setdefault(base, {})[pass_name] = os.path.join(
+							img_dir, entry.name)
+	return index
+
+
+def get_pass_index(img_dir: Path) -> Dict[str, Dict[str, Path]]:
+	"""Returns the cached pass index of a folder, rebuilt if it changed."""
+	env.count("stat_calls")
+	try:
+		mtime = os.stat(img_dir).st_mtime_ns
+	except OSError:
+		return {}
+	cached = env.pass_index_cache.get(img_dir)
+	if cached and cached[0] == mtime:
+		env.count("cache_hits")
+		return cached[1]
+	env.count("cache_misses")
+	index = build_pass_index(img_dir)
+	env.pass_index_cache[img_dir] = (mtime, index)
+	return index
+
+
+@env.span("generate.find_additional_passes")
 def find_additional_passes(image_file: Path) -> Dict[str, Image]:
 	"""Find relevant passes like normal and spec in same folder as image."""
 	abs_img_file = bpy.path.abspath(image_file)
-	env.log(f"\tFind additional passes for: {image_file}", vv_only=True)
+	env.log("\tFind additional passes for: %s", image_file, vv_only=True)
+	env.count("stat_calls")
 	if not os.path.isfile(abs_img_file):
 		return {}
 
@@ -573,37 +860,8 @@ def find_additional_passes(image_file: Path) -> Dict[str, Image]:
 	img_base = os.path.basename(abs_img_file)
 	base_name = os.path.splitext(img_base)[0]  # remove extension
 
-	# valid extentsions and ending names for pass types
-	exts = [".png", ".jpg", ".jpeg", ".tiff"]
-	normal = [" n", "_n", "-n", " normal", "_norm", "_nrm", " normals"]
-	spec = [" s", "_s", "-s", " specular", "_spec"]
-	disp = [" d", "_d", "-d", " displace", "_disp", " bump", " b", "_b", "-b"]
 	res = {"diffuse": image_file}
-
-	# find lowercase base name matching with valid extentions
-	filtered_files = []
-	for f in os.listdir(img_dir):
-		if not f.lower().startswith(base_name.lower()):
-			continue
-		if not os.path.isfile(os.path.join(img_dir, f)):
-			continue
-		if os.path.splitext(f)[-1].lower() not in exts:
-			continue
-		filtered_files.append(f)
-
-	# now do narrow matching based on each extention name type
-	for filtered in filtered_files:
-		this_base = os.path.splitext(filtered)[0]
-		for npass in normal:
-			if this_base.lower() == (base_name + npass).lower():
-				res["normal"] = os.path.join(img_dir, filtered)
-		for spass in spec:
-			if this_base.lower() == (base_name + spass).lower():
-				res["specular"] = os.path.join(img_dir, filtered)
-		for dpass in disp:
-			if this_base.lower() == (base_name + dpass).lower():
-				res["displace"] = os.path.join(img_dir, filtered)
-
+	res.update(get_pass_index(img_dir).get(base_name.lower(), {}))
 	return res
 
 
@@ -614,21 +872,38 @@ def replace_missing_texture(image: Image) -> bool:
 	should handle accordingly
 	"""
 
-	if image is None:
+	canon = get_missing_texture_name(image)
+	if not canon:
+		return False
+	# TODO: detect for pass structure like normal and still look for right pass
+	image_path = find_from_texturepack(canon)
+	if not image_path:
 		return False
+	image.filepath = image_path
+	# image.reload() # not needed?
+	# pack?
+
+	return True  # updated image block
+
+
+def get_missing_texture_name(image: Image) -> Optional[str]:
+	"""Returns the canonical name to look up if the image data is missing."""
+	if image is None:
+		return None
+	env.count("stat_calls")
 	if image.source == 'SEQUENCE' and os.path.isfile(bpy.path.abspath(image.filepath)):
 		# technically the next statement should prevail, but this filecheck
 		# addresses animated textures who show up without any size/pixel data
 		# just after a reload (even though functional)
-		return False
+		return None
 	if image.size[0] != 0 and image.size[1] != 0:
 		# Non zero means currently loaded, but could be lost on reload
 		if image.packed_file:
 			# only assume safe if packed...
-			return False
+			return None
 		elif os.path.isfile(bpy.path.abspath(image.filepath)):
 			# ... or the filepath is present.
-			return False
+			return None
 	env.log(f"Missing datablock detected: {image.name}")
 
 	name = image.name
@@ -637,19 +912,217 @@ def replace_missing_texture(image: Image) -> bool:
 	elif len(name) > 5 and name[-5] == ".":
 		name = name[:-5]  # cuts off e.g. .jpeg
 	canon, _ = get_mc_canonical_name(name)
-	# TODO: detect for pass structure like normal and still look for right pass
-	image_path = find_from_texturepack(canon)
-	if not image_path:
+	return canon
+
+
+def _map_tasks(func: Callable, items: List[Any], workers: int) -> List[Any]:
+	"""Run func over items, in a thread pool if workers > 0."""
+	if workers > 0 and len(items) > 1:
+		with ThreadPoolExecutor(max_workers=workers) as pool:
+			return list(pool.map(func, items))
+	return [func(item) for item in items]
+
+
+@env.span("generate.analyze_materials")
+def analyze_materials(
+	mats: List[Material],
+	use_extra_maps: bool,
+	find_missing: bool,
+	workers: int=0,
+	pending_pack: Optional[str]=None
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, float]]:
+	"""Gather the file system and image work for prepping materials up front.
+
+	Folder scans and file hashes (used by is_image_grayscale, for desaturated
+	blocks without a saved result) don't touch bpy data, so these run in a
+	thread pool. Nothing is changed on the materials
+	here, see apply_material_analysis.
+
+	Args:
+		mats: the existing materials
+		use_extra_maps: whether to look for normal and specular passes
+		find_missing: whether to look up missing images in the texture pack
+		workers: threads for folder scans and hashing, 0 for none
+		pending_pack: texture pack about to be swapped in, for dry runs. Used
+			in place of the scene's pack, and extra passes are looked up next
+			to the pack image each material would be swapped to.
+	Returns:
+		Dict of material name to dict of its "passes" images, extra passes
+			to "load" and "missing" passes to replace, with their file paths
+		Dict of seconds spent per phase (gather, scan, resolve)
+	"""
+	timings = {}
+	results = {}
+
+	# Read everything needed from the bpy data, on the main thread.
+	t0 = time.time()
+	resource_folder = bpy.path.abspath(
+		pending_pack or bpy.context.scene.mcprep_texturepack_path)
+	diffuse_paths = {}
+	missing_names = {}
+	hash_paths = set()
+	for mat in mats:
+		passes = get_textures(mat)
+		if not use_extra_maps:
+			# Clear out extra passes if not needed/requested
+			for pass_name in passes:
+				if pass_name != "diffuse":
+					passes[pass_name] = None
+		results[mat.name] = {"passes": passes, "load": {}, "missing": {}}
+
+		image_diff = passes.get("diffuse")
+		if image_diff:
+			canon, _ = get_mc_canonical_name(util.nameGeneralize(mat.name))
+			# bpy. makes rel to file, os. resolves any os.pardir refs.
+			abspath = os.path.abspath(bpy.path.abspath(image_diff.filepath))
+			if pending_pack:
+				abspath = find_from_texturepack(canon, resource_folder) or abspath
+			if use_extra_maps:
+				diffuse_paths[mat.name] = abspath
+			# Only hash what is_image_grayscale will actually need to hash.
+			if (not image_diff.packed_file
+					and checklist(canon, "desaturated")
+					and not has_grayscale_result(image_diff)):
+				hash_paths.add(bpy.path.abspath(image_diff.filepath))
+
+		if find_missing:
+			names = {}
+			for pass_name, image in passes.items():
+				canon = get_missing_texture_name(image)
+				if canon:
+					names[pass_name] = canon
+			if names:
+				missing_names[mat.name] = names
+	timings["gather"] = time.time() - t0
+
+	# Index folders and hash files, each only once.
+	t0 = time.time()
+	tasks = [
+		(get_pass_index, path) for path in
+		{os.path.dirname(path) for path in diffuse_paths.values()}]
+	if missing_names:
+		tasks.append((get_texturepack_index, resource_folder))
+	tasks.extend((get_file_hash, path) for path in hash_paths)
+	_map_tasks(lambda task: task[0](task[1]), tasks, workers)
+	timings["scan"] = time.time() - t0
+
+	# Look up each material's files from the now cached indexes.
+	t0 = time.time()
+	for mat_name, abspath in diffuse_paths.items():
+		passes = results[mat_name]["passes"]
+		other_passes = find_additional_passes(abspath)
+		for pass_name in other_passes:
+			if pass_name not in passes or not passes.get(pass_name):
+				results[mat_name]["load"][pass_name] = other_passes[pass_name]
+	for mat_name, names in missing_names.items():
+		for pass_name, canon in names.items():
+			image_path = find_from_texturepack(canon, resource_folder)
+			if image_path:
+				results[mat_name]["missing"][pass_name] = image_path
+	timings["resolve"] = time.time() - t0
+	return results, timings
+
+
+def apply_material_analysis(mat: Material, analysis: Dict[str, Any]) -> Dict[str, Image]:
+	"""Load and replace the images found by analyze_materials.
+
+	Returns the passes dict to use in PrepOptions.
+	"""
+	passes = analysis["passes"]
+	for pass_name, path in analysis["load"].items():
+		# Need to update the according tagged node with tex.
+		passes[pass_name] = bpy.data.images.load(path, check_existing=True)
+		env.count("images_loaded")
+	for pass_name, path in analysis["missing"].items():
+		image = passes.get(pass_name)
+		if image is None:
+			continue
+		image.filepath = path
+		mat["texture_swapped"] = True  # used to apply saturation
+	return passes
+
+
+def get_file_hash(path: Path) -> Optional[str]:
+	"""Returns a content hash of a file on disk, if it can be read.
+
+	Hashes are cached per path until the file's size or mtime changes.
+	"""
+	if not path:
+		return None
+	env.count("stat_calls", 2)
+	if not os.path.isfile(path):
+		return None
+	path = str(path)
+	try:
+		stat = os.stat(path)
+		cached = env.file_hash_cache.get(path)
+		if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+			env.count("cache_hits")
+			return cached[2]
+		env.count("cache_misses")
+		with open(path, 'rb') as img_file:
+			file_hash = hashlib.md5(img_file.read()).hexdigest()
+	except OSError:
+		return None
+	env.file_hash_cache[path] = (stat.st_size, stat.st_mtime_ns, file_hash)
+	return file_hash
+
+
+def get_image_hash(image: Image) -> Optional[str]:
+	"""Returns a content hash of the image's packed or on-disk file, if any."""
+	if image.packed_file:
+		return hashlib.md5(image.packed_file.data).hexdigest()
+	return get_file_hash(bpy.path.abspath(image.filepath))
+
+
+def get_image_stamp(image: Image) -> Optional[str]:
+	"""Returns a cheap signature of an image's packed or on-disk file.
+
+	Changes when the packed data size or the file's size or mtime change, to
+	tell if a saved result is outdated without hashing the file.
+	"""
+	if image.packed_file:
+		return f"packed:{image.packed_file.size}"
+	path = bpy.path.abspath(image.filepath)
+	if not path:
+		return None
+	env.count("stat_calls")
+	try:
+		stat = os.stat(path)
+	except OSError:
+		return None
+	return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def has_grayscale_result(image: Image) -> bool:
+	"""Returns true if the image has a grayscale result for its current file."""
+	if 'grayscale' not in image:
 		return False
-	image.filepath = image_path
-	# image.reload() # not needed?
-	# pack?
+	stamp = image.get('grayscale_stamp')
+	return stamp is not None and stamp == get_image_stamp(image)
 
-	return True  # updated image block
+
+def set_grayscale_cache(
+	image: Image, is_grayscale: bool, img_hash: Optional[str], stamp: Optional[str]
+) -> None:
+	"""Save a grayscale result on the image and for the session."""
+	image['grayscale'] = is_grayscale
+	if stamp is not None:
+		image['grayscale_stamp'] = stamp
+	if img_hash is not None:
+		image['grayscale_hash'] = img_hash
+		env.grayscale_cache[img_hash] = is_grayscale
 
 
+@env.span("generate.is_image_grayscale")
 def is_image_grayscale(image: Image) -> bool:
-	"""Returns true if image data is all grayscale, false otherwise"""
+	"""Returns true if image data is all grayscale, false otherwise
+
+	Results are cached on the image as image['grayscale'], along with a size
+	and mtime stamp of the image file to detect changes. Results are also kept
+	per file hash for the session, so re-imported images of the same file skip
+	the check. Files are only hashed when there is no valid cached result.
+	"""
 
 	def rgb_to_saturation(r, g, b) -> float:
 		"""Converter 0-1 rgb values back to 0-1 saturation value"""
@@ -662,70 +1135,135 @@ def is_image_grayscale(image: Image) -> bool:
 
 	if not image:
 		return None
-	env.log(f"Checking image for grayscale {image.name}", vv_only=True)
+	env.log("Checking image for grayscale %s", image.name, vv_only=True)
+	stamp = get_image_stamp(image)
 	if 'grayscale' in image:  # cache
-		env.log(f"\tGrayscale cached {image['grayscale']}", vv_only=True)
-		return image['grayscale']
+		cached_stamp = image.get('grayscale_stamp')
+		if cached_stamp is not None:
+			valid = cached_stamp == stamp
+		else:
+			# Set before changes were tracked, or only the hash was saved
+			cached_hash = image.get('grayscale_hash')
+			valid = cached_hash is None or cached_hash == get_image_hash(image)
+			if valid and stamp is not None:
+				image['grayscale_stamp'] = stamp
+		if valid:
+			env.log("\tGrayscale cached %s", image['grayscale'], vv_only=True)
+			env.count("cache_hits")
+			return image['grayscale']
+
+	img_hash = get_image_hash(image)
+	if img_hash is not None and img_hash in env.grayscale_cache:
+		is_grayscale = env.grayscale_cache[img_hash]
+		set_grayscale_cache(image, is_grayscale, img_hash, stamp)
+		env.log("\tGrayscale cached by hash %s", is_grayscale, vv_only=True)
+		env.count("cache_hits")
+		return is_grayscale
+
+	env.count("cache_misses")
 	if not image.pixels:
 		env.log("Not an image / no pixels", vv_only=True)
 		return None
 
-	# setup sampling to limit number of processed pixels
-	max_samples = 1024  # A 32 by 32 image. May be higher with rounding.
-	pxl_count = len(image.pixels) / image.channels
-	aspect = image.size[0] / image.size[1]
-	datablock_copied = False
-
-	if pxl_count > max_samples:
-		imgcp = image.copy()  # Duplicate the datablock
-
-		# Find new pixel sizes keeping aspect ratio, equation of:
-		# 1024 = nwith * nheight
-		# 1024 = (nheight * aspect) * nheight
-		# nheight = sqrtoot(1024 / aspect)
-		nheight = (1024 / aspect)**0.5
-		imgcp.scale(int(nheight * aspect), int(nheight))
-		pxl_count = imgcp.size[0] * imgcp.size[1]
-		datablock_copied = True
-	else:
-		imgcp = image
-
 	# Pixel by pixel saturation checks, with some wiggle room thresholds
 	thresh = 0.1  # treat saturated if any more than 10%
 
 	# max pixels above thresh to return as saturated,
 	# 15% is chosen as ~double the % of "yellow" pixels in vanilla jungle leaves
-	max_thresh = 0.15 * pxl_count
-
-	# running count to check against
-	pixels_saturated = 0
-
-	is_grayscale = True  # True until proven false.
-
-	# check all pixels until exceeded threshold.
-	for ind in range(int(pxl_count))[::]:
-		ind = ind * imgcp.channels  # could be rgb or rgba
-		if imgcp.channels > 3 and imgcp.pixels[ind + 3] == 0:
-			continue  # skip alpha pixels during check
-		this_saturated = rgb_to_saturation(
-			imgcp.pixels[ind],
-			imgcp.pixels[ind + 1],
-			imgcp.pixels[ind + 2])
-		if this_saturated > thresh:
-			pixels_saturated += 1
-		if pixels_saturated >= max_thresh:
-			is_grayscale = False
-			env.log("Image not grayscale: {image.name}", vv_only=True)
-			break
-
-	if datablock_copied:  # Cleanup if image was copied to scale down size.
-		bpy.data.images.remove(imgcp)
-
-	image['grayscale'] = is_grayscale  # set cache
+	max_thresh_fac = 0.15
+
+	if np is not None:
+		is_grayscale = _is_pixels_grayscale_np(image, thresh, max_thresh_fac)
+	else:
+		is_grayscale = None
+
+	if is_grayscale is None:
+		# setup sampling to limit number of processed pixels
+		max_samples = 1024  # A 32 by 32 image. May be higher with rounding.
+		pxl_count = len(image.pixels) / image.channels
+		aspect = image.size[0] / image.size[1]
+		datablock_copied = False
+
+		if pxl_count > max_samples:
+			imgcp = image.copy()  # Duplicate the datablock
+
+			# Find new pixel sizes keeping aspect ratio, equation of:
+			# 1024 = nwith * nheight
+			# 1024 = (nheight * aspect) * nheight
+			# nheight = sqrtoot(1024 / aspect)
+			nheight = (1024 / aspect)**0.5
+			imgcp.scale(int(nheight * aspect), int(nheight))
+			pxl_count = imgcp.size[0] * imgcp.size[1]
+			datablock_copied = True
+		else:
+			imgcp = image
+
+		max_thresh = max_thresh_fac * pxl_count
+
+		# running count to check against
+		pixels_saturated = 0
+
+		is_grayscale = True  # True until proven false.
+
+		# check all pixels until exceeded threshold.
+		for ind in range(int(pxl_count))[::]:
+			ind = ind * imgcp.channels  # could be rgb or rgba
+			if imgcp.channels > 3 and imgcp.pixels[ind + 3] == 0:
+				continue  # skip alpha pixels during check
+			this_saturated = rgb_to_saturation(
+				imgcp.pixels[ind],
+				imgcp.pixels[ind + 1],
+				imgcp.pixels[ind + 2])
+			if this_saturated > thresh:
+				pixels_saturated += 1
+			if pixels_saturated >= max_thresh:
+				is_grayscale = False
+				env.log("Image not grayscale: {image.name}", vv_only=True)
+				break
+
+		if datablock_copied:  # Cleanup if image was copied to scale down size.
+			bpy.data.images.remove(imgcp)
+
+	set_grayscale_cache(image, is_grayscale, img_hash, stamp)
 	env.log(f"Image grayscale: {image.name}: {is_grayscale}", vv_only=True)
 	return is_grayscale
 
 
+def _is_pixels_grayscale_np(
+	image: Image, thresh: float, max_thresh_fac: float) -> Optional[bool]:
+	"""Array based grayscale check of is_image_grayscale.
+
+	Reads all pixels at once, and then checks at most max_samples evenly
+	strided pixels of the full resolution image. Returns None if the pixels
+	could not be read, to fall back to the per pixel check.
+	"""
+	max_samples = 262144  # A 512 by 512 image.
+	channels = image.channels
+	pxl_count = image.size[0] * image.size[1]
+	if channels < 3 or pxl_count == 0:
+		return None
+
+	pixels = np.empty(pxl_count * channels, dtype=np.float32)
+	try:
+		image.pixels.foreach_get(pixels)
+	except (RuntimeError, TypeError) as e:
+		env.log(f"Could not read pixels of {image.name}: {e}", vv_only=True)
+		return None
+	pixels = pixels.reshape(-1, channels)
+	if pxl_count > max_samples:
+		pixels = pixels[::-(-pxl_count // max_samples)]
+
+	rgb = pixels[:, :3]
+	mx = rgb.max(axis=1)
+	mn = rgb.min(axis=1)
+	# Same as (mx - mn) / mx > thresh, without dividing by zero for black.
+	saturated = (mx > 0) & ((mx - mn) > thresh * mx)
+	if channels > 3:
+		saturated &= pixels[:, 3] != 0  # skip alpha pixels during check
+
+	return bool(np.count_nonzero(saturated) < max_thresh_fac * len(pixels))
+
+
 def set_saturation_material(mat: Material) -> None:
 	"""Update material to be saturated or not"""
 	if not mat:
@@ -815,6 +1353,19 @@ def get_node_socket(node: Node, is_input: bool = True) -> list:
 		outputs = [i for i in range(len(node.outputs))]
 	return inputs if is_input else outputs
 
+
+def is_diffuse_usable(image_diff: Optional[Image]) -> bool:
+	"""Whether the diffuse image is valid to generate a material from."""
+	if not image_diff:
+		return False
+	elif image_diff.size[0] == 0 or image_diff.size[1] == 0:
+		if image_diff.source != 'SEQUENCE':
+			return False
+		if not os.path.isfile(bpy.path.abspath(image_diff.filepath)):
+			return False
+	return True
+
+
 # -----------------------------------------------------------------------------
 # Generating node groups
 # -----------------------------------------------------------------------------
@@ -1715,6 +2266,331 @@ def matgen_cycles_original(mat: Material, options: PrepOptions):
 	return 0
 
 
+# Base name of the shared shader node group per pack format, see matgen_cycles_group
+SHADER_GROUP_NAMES = {
+	PackFormat.SIMPLE: "MCprep Simple Shader",
+	PackFormat.SPECULAR: "MCprep Specular Shader",
+	PackFormat.SEUS: "MCprep SEUS Shader",
+}
+
+# Full configuration a shared shader node group is built for
+ShaderGroupKey = Tuple[PackFormat, bool, bool, bool]
+
+
+def get_shader_group_key(options: PrepOptions) -> ShaderGroupKey:
+	"""Returns the (pack format, reflections, emission, solid) group config."""
+	pack_format = options.pack_format
+	if pack_format not in SHADER_GROUP_NAMES:
+		pack_format = PackFormat.SIMPLE
+	return (
+		pack_format,
+		bool(options.use_reflections),
+		bool(options.use_emission_nodes and options.use_emission),
+		options.only_solid is True)
+
+
+def get_shader_group_name(key: ShaderGroupKey) -> str:
+	"""Returns the node group name for a shared shader group config."""
+	pack_format, use_reflections, use_emission, only_solid = key
+	name = SHADER_GROUP_NAMES[pack_format]
+	if use_reflections:
+		name += " Reflective"
+	if use_emission:
+		name += " Emissive"
+	if only_solid:
+		name += " Solid"
+	return name
+
+
+def new_group_socket(
+	tree: bpy.types.NodeTree, name: str, in_out: str, socket_type: str, default: Any=None
+) -> None:
+	"""Add a socket to a node group's interface, 4.0+ or earlier."""
+	if hasattr(tree, "interface"):
+		socket = tree.interface.new_socket(
+			name=name, in_out=in_out, socket_type=socket_type)
+	elif in_out == "INPUT":
+		socket = tree.inputs.new(socket_type, name)
+	else:
+		socket = tree.outputs.new(socket_type, name)
+	if default is not None:
+		socket.default_value = default
+
+
+def get_shader_node_group(key: ShaderGroupKey) -> bpy.types.NodeTree:
+	"""Get or create the shared shader node group for a full prep config.
+
+	Group inputs are the pass images plus the few per block parameters, so
+	each material only needs image nodes and the group node. Reflections,
+	emission and solid are baked into the group, so each config gets its own
+	group and materials only differ by their images and per block values.
+	Groups are found by their MCPREP_shader_group property, not their name.
+	"""
+	pack_format, use_reflections, use_emission, only_solid = key
+	name = get_shader_group_name(key)
+	for group in bpy.data.node_groups:
+		if group.bl_idname != "ShaderNodeTree":
+			continue
+		if group.get("MCPREP_shader_group") == name:
+			return group
+
+	group = bpy.data.node_groups.new(name, "ShaderNodeTree")
+	group["MCPREP_shader_group"] = name
+	new_group_socket(group, "Color", "INPUT", "NodeSocketColor", (1, 1, 1, 1))
+	if not only_solid:
+		new_group_socket(group, "Alpha", "INPUT", "NodeSocketFloat", 1.0)
+	new_group_socket(group, "Roughness", "INPUT", "NodeSocketFloat", 0.7)
+	new_group_socket(group, "Metallic", "INPUT", "NodeSocketFloat", 0.0)
+	if use_emission:
+		new_group_socket(group, "Emission", "INPUT", "NodeSocketFloat", 1.0)
+	if pack_format != PackFormat.SIMPLE:
+		new_group_socket(group, "Normal", "INPUT", "NodeSocketColor", (0.5, 0.5, 1, 1))
+		new_group_socket(group, "Use Normal", "INPUT", "NodeSocketFloat", 0.0)
+		if use_reflections:
+			new_group_socket(group, "Specular", "INPUT", "NodeSocketColor", (0, 0, 0, 1))
+			new_group_socket(group, "Use Specular", "INPUT", "NodeSocketFloat", 0.0)
+	new_group_socket(group, "Shader", "OUTPUT", "NodeSocketShader")
+
+	nodes = group.nodes
+	links = group.links
+	group_in = create_node(nodes, "NodeGroupInput", location=(-900, 0))
+	group_out = create_node(nodes, "NodeGroupOutput", location=(700, 0))
+	principled = create_node(
+		nodes, "ShaderNodeBsdfPrincipled", location=(300, 0), distribution='GGX')
+	specular_name = "Specular IOR Level" if util.min_bv((4, 0, 0)) else "Specular"
+	emission_name = "Emission Color" if util.min_bv((4, 0, 0)) else "Emission"
+	inputs = [inp.name for inp in principled.inputs]
+
+	def math_node(operation: str, location: Tuple[int, int], *values: float) -> Node:
+		node = create_node(
+			nodes, "ShaderNodeMath", location=location, operation=operation)
+		for i, value in enumerate(values):
+			if value is not None:
+				node.inputs[i].default_value = value
+		return node
+
+	def mix_value(a_socket, b_socket, fac_socket, location) -> bpy.types.NodeSocket:
+		"""Returns a + fac * (b - a) with math nodes, for any blender version."""
+		sub = math_node("SUBTRACT", location)
+		mult = math_node("MULTIPLY", (location[0] + 160, location[1]))
+		add = math_node("ADD", (location[0] + 320, location[1]))
+		links.new(b_socket, sub.inputs[0])
+		links.new(a_socket, sub.inputs[1])
+		links.new(sub.outputs[0], mult.inputs[0])
+		links.new(fac_socket, mult.inputs[1])
+		links.new(mult.outputs[0], add.inputs[0])
+		links.new(a_socket, add.inputs[1])
+		return add.outputs[0]
+
+	links.new(group_in.outputs["Color"], principled.inputs["Base Color"])
+	if not only_solid:
+		links.new(group_in.outputs["Alpha"], principled.inputs["Alpha"])
+	links.new(principled.outputs["BSDF"], group_out.inputs["Shader"])
+	roughness = group_in.outputs["Roughness"]
+	metallic = group_in.outputs["Metallic"]
+	emission = group_in.outputs["Emission"] if use_emission else None
+
+	if pack_format == PackFormat.SIMPLE:
+		# Specular causes issues with how blocks look, so let's disable it.
+		principled.inputs[specular_name].default_value = 0
+	else:
+		# Normal map, with the green channel inverted as in texgen_specular
+		normal_inv = create_node(
+			nodes, "ShaderNodeRGBCurve", location=(-600, -500))
+		normal_inv.mapping.curves[1].points[0].location = (0, 1)
+		normal_inv.mapping.curves[1].points[1].location = (1, 0)
+		normal_map = create_node(nodes, "ShaderNodeNormalMap", location=(-300, -500))
+		links.new(group_in.outputs["Normal"], normal_inv.inputs["Color"])
+		links.new(normal_inv.outputs["Color"], normal_map.inputs["Color"])
+		links.new(group_in.outputs["Use Normal"], normal_map.inputs["Strength"])
+		links.new(normal_map.outputs["Normal"], principled.inputs["Normal"])
+
+	if pack_format != PackFormat.SIMPLE and use_reflections:
+		use_spec = group_in.outputs["Use Specular"]
+		spec_inv = create_node(nodes, "ShaderNodeInvert", location=(-600, -200))
+		if pack_format == PackFormat.SEUS:
+			separate = create_node(
+				nodes, "ShaderNodeSeparateRGB", location=(-800, -200))
+			links.new(group_in.outputs["Specular"], separate.inputs["Image"])
+			links.new(separate.outputs["R"], spec_inv.inputs["Color"])
+			metallic = mix_value(
+				metallic, separate.outputs["G"], use_spec, (-300, -300))
+			if use_emission:
+				emission_map = math_node("MULTIPLY", (-300, 300))
+				links.new(separate.outputs["B"], emission_map.inputs[0])
+				links.new(use_spec, emission_map.inputs[1])
+				emission_add = math_node("ADD", (0, 300))
+				emission_add.use_clamp = True
+				links.new(emission, emission_add.inputs[0])
+				links.new(emission_map.outputs[0], emission_add.inputs[1])
+				emission = emission_add.outputs[0]
+		else:
+			links.new(group_in.outputs["Specular"], spec_inv.inputs["Color"])
+			spec_default = principled.inputs[specular_name].default_value
+			spec_value = math_node("MULTIPLY", (-300, -100), None, 1.0)
+			links.new(group_in.outputs["Specular"], spec_value.inputs[0])
+			spec_level = math_node("ADD", (-300, 100), spec_default, 0.0)
+			spec_level = mix_value(
+				spec_level.outputs[0], spec_value.outputs[0], use_spec, (-100, -100))
+			links.new(spec_level, principled.inputs[specular_name])
+		roughness = mix_value(
+			roughness, spec_inv.outputs["Color"], use_spec, (-300, -700))
+
+	links.new(roughness, principled.inputs["Roughness"])
+	links.new(metallic, principled.inputs["Metallic"])
+	if use_emission:
+		links.new(group_in.outputs["Color"], principled.inputs[emission_name])
+		if 'Emission Strength' in inputs:  # Later 2.9 versions only.
+			links.new(emission, principled.inputs['Emission Strength'])
+	elif 'Emission Strength' in inputs:
+		principled.inputs['Emission Strength'].default_value = 0
+	return group
+
+
+def matgen_cycles_group(mat: Material, options: PrepOptions) -> Optional[bool]:
+	"""Generate a thin material using the shared node group of its format.
+
+	Only the image nodes and per block values of the group node are local to
+	the material, the rest of the shader is shared across materials.
+	"""
+	matGen = util.nameGeneralize(mat.name)
+	canon, form = get_mc_canonical_name(matGen)
+
+	image_diff = options.passes["diffuse"]
+	image_norm = options.passes.get("normal")
+	image_spec = options.passes.get("specular")
+
+	if not image_diff:
+		print(f"Could not find diffuse image, halting generation: {mat.name}")
+		return
+	elif not is_diffuse_usable(image_diff):
+		return
+
+	key = get_shader_group_key(options)
+	pack_format = key[0]
+	group = get_shader_node_group(key)
+
+	mat.use_nodes = True
+	animated_data = copy_texture_animation_pass_settings(mat)
+	nodes = mat.node_tree.nodes
+	links = mat.node_tree.links
+	nodes.clear()
+
+	nodeTexDiff = create_node(
+		nodes, "ShaderNodeTexImage",
+		name="Diffuse Texture",
+		label="Diffuse Texture",
+		location=(-380, 140),
+		interpolation='Closest',
+		image=image_diff)
+	nodeSaturateMix = create_node(
+		nodes, "ShaderNodeMixRGB",
+		name="Add Color",
+		label="Add Color",
+		location=(-80, 140),
+		blend_type='MULTIPLY',
+		mute=True,
+		hide=True)
+	nodeGroup = create_node(
+		nodes, "ShaderNodeGroup",
+		name="MCprep Shader",
+		label="MCprep Shader",
+		location=(120, 0),
+		node_tree=group)
+	nodeOut = create_node(
+		nodes, "ShaderNodeOutputMaterial", location=(420, 0))
+
+	# Get MixRGB sockets
+	saturateMixIn = get_node_socket(nodeSaturateMix)
+	saturateMixOut = get_node_socket(nodeSaturateMix, is_input=False)
+	nodeSaturateMix.inputs[saturateMixIn[0]].default_value = 1.0
+
+	links.new(nodeTexDiff.outputs["Color"], nodeSaturateMix.inputs[saturateMixIn[1]])
+	links.new(nodeSaturateMix.outputs[saturateMixOut[0]], nodeGroup.inputs["Color"])
+	links.new(nodeGroup.outputs["Shader"], nodeOut.inputs[0])
+
+	# Sets default reflective and metallic values
+	roughness = 0.7
+	metallic = 0
+	if options.use_reflections and checklist(canon, "reflective"):
+		roughness = 0
+	if options.use_reflections and checklist(canon, "metallic"):
+		metallic = 1
+		roughness = max(roughness, 0.2)
+	nodeGroup.inputs["Roughness"].default_value = roughness
+	nodeGroup.inputs["Metallic"].default_value = metallic
+
+	if pack_format != PackFormat.SIMPLE:
+		nodeTexNorm = create_node(
+			nodes, "ShaderNodeTexImage",
+			name="Normal Texture",
+			label="Normal Texture",
+			location=(-380, -500))
+		nodeTexSpec = create_node(
+			nodes, "ShaderNodeTexImage",
+			name="Specular Texture",
+			label="Specular Texture",
+			location=(-380, -180),
+			interpolation='Closest')
+		links.new(nodeTexNorm.outputs["Color"], nodeGroup.inputs["Normal"])
+		if options.use_reflections:
+			links.new(nodeTexSpec.outputs["Color"], nodeGroup.inputs["Specular"])
+
+		if image_norm:
+			nodeTexNorm.image = image_norm
+			nodeGroup.inputs["Use Normal"].default_value = 1
+		else:
+			nodeTexNorm.mute = True
+		if image_spec:
+			nodeTexSpec.image = image_spec
+		else:
+			nodeTexSpec.mute = True
+		if image_spec and options.use_reflections:
+			nodeGroup.inputs["Use Specular"].default_value = 1
+
+		# Update to use non-color data for spec and normal
+		for node in [nodeTexSpec, nodeTexNorm]:
+			res = util.apply_noncolor_data(node)
+			if res is not None:
+				env.log(f"TypeError on {res.line} in {res.file}: {res.err_type}")
+		nodeTexSpec["MCPREP_specular"] = True
+		nodeTexNorm["MCPREP_normal"] = True
+
+	if options.only_solid is True or checklist(canon, "solid"):
+		if hasattr(mat, "blend_method"):
+			mat.blend_method = 'OPAQUE'  # eevee setting
+	else:
+		# non-solid (potentially, not necessarily though)
+		links.new(nodeTexDiff.outputs["Alpha"], nodeGroup.inputs["Alpha"])
+		if hasattr(mat, "blend_method"):
+			mat.blend_method = 'HASHED'
+		if hasattr(mat, "shadow_method"):
+			mat.shadow_method = 'HASHED'
+
+	# Graystyle Blending
+	if not checklist(canon, "desaturated"):
+		pass
+	elif not is_image_grayscale(image_diff):
+		pass
+	else:
+		env.log(f"Texture desaturated: {canon}", vv_only=True)
+		desat_color = env.json_data['blocks']['desaturated'][canon]
+		if len(desat_color) < len(nodeSaturateMix.inputs[saturateMixIn[2]].default_value):
+			desat_color.append(1.0)
+		nodeSaturateMix.inputs[saturateMixIn[2]].default_value = desat_color
+		nodeSaturateMix.mute = False
+		nodeSaturateMix.hide = False
+
+	# annotate special nodes for finding later
+	nodeTexDiff["MCPREP_diffuse"] = True
+	nodeSaturateMix["SATURATE"] = True
+
+	# reapply animation data if any to generated nodes
+	apply_texture_animation_pass_settings(mat, animated_data)
+
+	return 0
+
+
 def matgen_special_water(mat: Material, passes: Dict[str, Image]) -> Optional[bool]:
 	"""Generate special water material"""
 
@@ -197,7 +197,7 @@ class MCPREP_OT_combine_materials(bpy.types.Operator):
 			elif mat.name not in name_cat[base]:
 				name_cat[base].append(mat.name)
 			else:
-				env.log("Skipping, already added material", True)
+				env.log("Skipping, already added material", vv_only=True)
 
 		# Pre 2.78 solution, deep loop.
 		if bpy.app.version < (2, 78):
@@ -404,6 +404,7 @@ class MCPREP_OT_replace_missing_textures(bpy.types.Operator):
 			return {'CANCELLED'}
 
 		count = 0
+		animate_list = []
 		for mat in mat_list:
 			updated = False
 			passes = generate.get_textures(mat)
@@ -420,10 +421,12 @@ class MCPREP_OT_replace_missing_textures(bpy.types.Operator):
 				count += 1
 				env.log(f"Updated {mat.name}")
 				if self.animateTextures:
-					sequences.animate_single_material(
-						mat,
-						context.scene.render.engine,
-						export_location=sequences.ExportLocation.ORIGINAL)
+					animate_list.append(mat)
+		if animate_list:
+			sequences.animate_materials(
+				animate_list,
+				context.scene.render.engine,
+				export_location=sequences.ExportLocation.ORIGINAL)
 		if count == 0:
 			self.report(
 				{'INFO'},
@@ -18,10 +18,12 @@
 
 
 import os
+import time
+from typing import Dict, Optional
 
 import bpy
 from bpy_extras.io_utils import ImportHelper
-from bpy.types import Context
+from bpy.types import Context, Material
 
 from . import generate
 from . import sequences
@@ -124,6 +126,13 @@ class McprepMaterialProps():
 		description="Make emmisive materials emit light",
 		default=True
 	)
+	useNodeGroups: bpy.props.BoolProperty(
+		name="Share node groups",
+		description=(
+			"Build materials around one shared shader node group per pack "
+			"format, keeping only the images local to each material"),
+		default=False
+	)
 
 
 def draw_mats_common(self, context: Context) -> None:
@@ -133,6 +142,7 @@ def draw_mats_common(self, context: Context) -> None:
 	if engine == 'CYCLES' or engine == 'BLENDER_EEVEE':
 		col.prop(self, "packFormat")
 		col.prop(self, "usePrincipledShader")
+		col.prop(self, "useNodeGroups")
 	col.prop(self, "useReflections")
 	col.prop(self, "makeSolid")
 
@@ -164,7 +174,74 @@ def draw_mats_common(self, context: Context) -> None:
 	row.prop(self, "useEmission")
 
 
-class MCPREP_OT_prep_materials(bpy.types.Operator, McprepMaterialProps):
+# Counters copied per material into timing reports, see MCprepEnv.count
+REPORT_COUNTERS = ["stat_calls", "images_loaded", "cache_hits", "cache_misses"]
+
+
+class McprepReportProps():
+	"""Dry run and timing report options for material operators."""
+	dryRun: bpy.props.BoolProperty(
+		name="Dry run",
+		description=(
+			"Only report what would change, without modifying any "
+			"materials or images"),
+		default=False)
+	timingReport: bpy.props.BoolProperty(
+		name="Timing report",
+		description=(
+			"Write per material timings, file checks, image loads and "
+			"cache hits as json into a text datablock"),
+		default=False)
+
+	def draw_report_props(self) -> None:
+		row = self.layout.row()
+		row.prop(self, "dryRun")
+		row.prop(self, "timingReport")
+
+	# Counters at the start of the report, None if not already collecting
+	report_counters = None
+
+	def begin_report(self) -> Optional[Dict]:
+		"""Start collecting counters if a report was requested."""
+		if not self.dryRun and not self.timingReport:
+			return None
+		if env.counters is None:
+			self.report_counters = None
+			env.counters = {}
+		else:  # Already instrumenting, leave that running.
+			self.report_counters = dict(env.counters)
+		return {
+			"operator": self.bl_idname,
+			"dry_run": self.dryRun,
+			"blender": bpy.app.version_string,
+			"timings": {},
+			"materials": {}}
+
+	def add_report_material(
+		self, report: Dict, mat: Material, t0: float,
+		counters: Dict[str, int], changes: Dict) -> None:
+		"""Record one material's time and counters since t0 and counters."""
+		entry = {"seconds": time.time() - t0}
+		current = env.counters or {}
+		for name in REPORT_COUNTERS:
+			entry[name] = current.get(name, 0) - counters.get(name, 0)
+		entry["changes"] = changes
+		report["materials"][mat.name] = entry
+
+	def end_report(self, report: Dict) -> bpy.types.Text:
+		"""Stop collecting counters and write the report to a text block."""
+		start = self.report_counters or {}
+		report["counters"] = {
+			name: value - start.get(name, 0)
+			for name, value in (env.counters or {}).items()}
+		if self.report_counters is None:
+			env.counters = None
+		name = f"{self.bl_idname.replace('.', '_')}_report.json"
+		return util.write_json_text(name, report)
+
+
+class MCPREP_OT_prep_materials(
+	bpy.types.Operator, McprepMaterialProps, McprepReportProps):
 	"""Fixes materials and textures on selected objects for Minecraft rendering"""
 	bl_idname = "mcprep.prep_materials"
 	bl_label = "MCprep Materials"
@@ -173,6 +250,10 @@ class MCPREP_OT_prep_materials(bpy.types.Operator, McprepMaterialProps):
 	skipUsage: bpy.props.BoolProperty(
 		default=False,
 		options={'HIDDEN'})
+	# Pack a dry run of swap_texture_pack would swap to, instead of the scene's
+	texturepackPath: bpy.props.StringProperty(
+		default="",
+		options={'HIDDEN', 'SKIP_SAVE'})
 
 	def invoke(self, context, event):
 		return context.window_manager.invoke_props_dialog(
@@ -180,11 +261,13 @@ class MCPREP_OT_prep_materials(bpy.types.Operator, McprepMaterialProps):
 
 	def draw(self, context):
 		draw_mats_common(self, context)
+		self.draw_report_props()
 
 	track_function = "materials"
 	track_param = None
 	track_exporter = None
 	@tracking.report_error
+	@env.span("prep.prep_materials")
 	def execute(self, context):
 
 		# get list of selected objects
@@ -205,7 +288,9 @@ class MCPREP_OT_prep_materials(bpy.types.Operator, McprepMaterialProps):
 		engine = context.scene.render.engine
 		count = 0
 		count_lib_skipped = 0
+		animate_list = []
 
+		prep_list = []
 		for mat in mat_list:
 			if not mat:
 				env.log(
@@ -215,62 +300,90 @@ class MCPREP_OT_prep_materials(bpy.types.Operator, McprepMaterialProps):
 			elif mat.library:
 				count_lib_skipped += 1
 				continue
+			prep_list.append(mat)
 
-			passes = generate.get_textures(mat)
-			if not self.useExtraMaps or self.packFormat == "simple":
-				# Clear out extra passes if not needed/requested
-				for pass_name in passes:
-					if pass_name != "diffuse":
-						passes[pass_name] = None
-			elif passes.get("diffuse"):
-				# Otherwise, attempt to get or load extra passes. Needed if
-				# swap texturepack hasn't been used yet, otherwise would need
-				# to prep twice (even if the base diff texture was already
-				# loaded from that pack).
-				diff_filepath = passes["diffuse"].filepath
-				# bpy. makes rel to file, os. resolves any os.pardir refs.
-				abspath = os.path.abspath(bpy.path.abspath(diff_filepath))
-				other_passes = generate.find_additional_passes(abspath)
-				for pass_name in other_passes:
-					if pass_name not in passes or not passes.get(pass_name):
-						# Need to update the according tagged node with tex.
-						passes[pass_name] = bpy.data.images.load(
-							other_passes[pass_name],
-							check_existing=True)
-
-			if self.autoFindMissingTextures:
-				for pass_name in passes:
-					res = generate.replace_missing_texture(passes[pass_name])
-					if res > 0:
-						mat["texture_swapped"] = True  # used to apply saturation
-
-			if engine == 'CYCLES' or engine == 'BLENDER_EEVEE':
-				options = generate.PrepOptions(
-					passes,
-					self.useReflections,
-					self.usePrincipledShader,
-					self.makeSolid,
-					generate.PackFormat[self.packFormat.upper()],
-					self.useEmission,
-					False  # This is for an option set in matprep_cycles
-				)
+		if prep_list and engine not in ('CYCLES', 'BLENDER_EEVEE'):
+			self.report(
+				{'ERROR'},
+				"Only Cycles and Eevee are supported")
+			return {'CANCELLED'}
+
+		report = self.begin_report()
+
+		# Find extra passes and missing textures for all materials first. Extra
+		# passes are needed if swap texturepack hasn't been used yet, otherwise
+		# would need to prep twice (even if the base diff texture was already
+		# loaded from that pack).
+		analysis, timings = generate.analyze_materials(
+			prep_list,
+			use_extra_maps=self.useExtraMaps and self.packFormat != "simple",
+			find_missing=self.autoFindMissingTextures,
+			workers=min(4, os.cpu_count() or 1),
+			pending_pack=self.texturepackPath if self.dryRun else None)
+		timings = {"analyze": sum(timings.values())}
+
+		t0 = time.time()
+		for mat in prep_list:
+			if report is not None:
+				mat_t0 = time.time()
+				mat_counters = dict(env.counters or {})
+
+			if self.dryRun:
+				passes = analysis[mat.name]["passes"]
+			else:
+				passes = generate.apply_material_analysis(mat, analysis[mat.name])
+
+			options = generate.PrepOptions(
+				passes,
+				self.useReflections,
+				self.usePrincipledShader,
+				self.makeSolid,
+				generate.PackFormat[self.packFormat.upper()],
+				self.useEmission,
+				False  # This is for an option set in matprep_cycles
+			)
+			if self.dryRun:
+				res = 0 if passes.get("diffuse") else None
+			else:
 				res = generate.matprep_cycles(
 					mat=mat,
-					options=options
+					options=options,
+					use_node_group=self.useNodeGroups
 				)
-				if res == 0:
-					count += 1
-			else:
-				self.report(
-					{'ERROR'},
-					"Only Cycles and Eevee are supported")
-				return {'CANCELLED'}
+			if res == 0:
+				count += 1
 
 			if self.animateTextures:
-				sequences.animate_single_material(
-					mat,
-					context.scene.render.engine,
-					export_location=sequences.ExportLocation.ORIGINAL)
+				animate_list.append(mat)
+
+			if report is not None:
+				matgen = generate.get_material_generator(options, self.useNodeGroups)
+				self.add_report_material(report, mat, mat_t0, mat_counters, {
+					"prepped": res == 0,
+					"generator": matgen.__name__,
+					"load": analysis[mat.name]["load"],
+					"missing": analysis[mat.name]["missing"]})
+		timings["apply"] = time.time() - t0
+		env.log(
+			"Prep materials timings: " + ", ".join(
+				f"{stage} {secs:.3f}s" for stage, secs in timings.items()))
+
+		if report is not None:
+			report["timings"] = timings
+			text = self.end_report(report)
+
+		if self.dryRun:
+			if not self.skipUsage:
+				self.report(
+					{"INFO"},
+					f"Dry run: would modify {count} materials, see {text.name}")
+			return {'FINISHED'}
+
+		if animate_list:
+			sequences.animate_materials(
+				animate_list,
+				context.scene.render.engine,
+				export_location=sequences.ExportLocation.ORIGINAL)
 
 		# Sync materials.
 		if self.syncMaterials is True:
@@ -296,9 +409,13 @@ class MCPREP_OT_prep_materials(bpy.types.Operator, McprepMaterialProps):
 		elif count_lib_skipped > 0:
 			self.report(
 				{"INFO"},
-				f"Modified {count} materials, skipped {count_lib_skipped} linked ones.")
+				f"Modified {count} materials, skipped {count_lib_skipped} linked ones "
+				f"(analyze {timings['analyze']:.2f}s, apply {timings['apply']:.2f}s)")
 		elif count > 0:
-			self.report({"INFO"}, f"Modified  {count} materials")
+			self.report(
+				{"INFO"},
+				f"Modified {count} materials "
+				f"(analyze {timings['analyze']:.2f}s, apply {timings['apply']:.2f}s)")
 		else:
 			self.report(
 				{"ERROR"},
@@ -379,7 +496,7 @@ class MCPREP_OT_materials_help(bpy.types.Operator):
 
 
 class MCPREP_OT_swap_texture_pack(
-	bpy.types.Operator, ImportHelper, McprepMaterialProps):
+	bpy.types.Operator, ImportHelper, McprepMaterialProps, McprepReportProps):
 	"""Swap current textures for that of a texture pack folder"""
 	bl_idname = "mcprep.swap_texture_pack"
 	bl_label = "Swap Texture Pack"
@@ -432,17 +549,20 @@ class MCPREP_OT_swap_texture_pack(
 		if self.prepMaterials:
 			col.prop(self, "packFormat")
 			col.prop(self, "usePrincipledShader")
+			col.prop(self, "useNodeGroups")
 			col.prop(self, "useReflections")
 			col.prop(self, "autoFindMissingTextures")
 			col.prop(self, "syncMaterials")
 			col.prop(self, "improveUiSettings")
 			col.prop(self, "combineMaterials")
+		self.draw_report_props()
 
 	track_function = "texture_pack"
 	track_param = None
 	track_exporter = None
 
 	@tracking.report_error
+	@env.span("prep.swap_texture_pack")
 	def execute(self, context):
 		addon_prefs = util.get_user_preferences(context)
 
@@ -472,21 +592,60 @@ class MCPREP_OT_swap_texture_pack(
 
 		self.track_exporter = addon_prefs.MCprep_exporter_type
 
-		# set the scene's folder for the texturepack being swapped
-		context.scene.mcprep_texturepack_path = folder
-
 		env.log(f"Materials detected: {len(mat_list)}")
+		report = self.begin_report()
 		res = 0
+		t0 = time.time()
 		for mat in mat_list:
-			self.preprocess_material(mat)
-			res += generate.set_texture_pack(mat, folder, self.useExtraMaps)
-			if self.animateTextures:
-				sequences.animate_single_material(
-					mat,
-					context.scene.render.engine,
-					export_location=sequences.ExportLocation.ORIGINAL)
-			# may be a double call if was animated tex
-			generate.set_saturation_material(mat)
+			if report is not None:
+				mat_t0 = time.time()
+				mat_counters = dict(env.counters or {})
+
+			changes = {}
+			if self.dryRun:
+				mc_name, _ = generate.get_mc_canonical_name(mat.name)
+				changes["image"] = generate.find_from_texturepack(mc_name, folder)
+				swapped = changes["image"] is not None
+			else:
+				self.preprocess_material(mat)
+				swapped = generate.set_texture_pack(mat, folder, self.useExtraMaps)
+				generate.set_saturation_material(mat)
+			res += swapped
+
+			if report is not None:
+				changes["swapped"] = bool(swapped)
+				self.add_report_material(report, mat, mat_t0, mat_counters, changes)
+
+		if report is not None:
+			report["timings"] = {"swap": time.time() - t0}
+			text = self.end_report(report)
+		if self.dryRun:
+			if self.prepMaterials:
+				bpy.ops.mcprep.prep_materials(
+					autoFindMissingTextures=self.autoFindMissingTextures,
+					usePrincipledShader=self.usePrincipledShader,
+					useReflections=self.useReflections,
+					useExtraMaps=self.useExtraMaps,
+					makeSolid=self.makeSolid,
+					packFormat=self.packFormat,
+					useNodeGroups=self.useNodeGroups,
+					dryRun=True,
+					texturepackPath=folder,
+					skipUsage=True)
+			self.report(
+				{'INFO'},
+				f"Dry run: would swap {res} materials, see {text.name}")
+			return {'FINISHED'}
+
+		# set the scene's folder for the texturepack being swapped
+		context.scene.mcprep_texturepack_path = folder
+
+		if self.animateTextures:
+			# may be a double call of set_saturation_material if animated tex
+			sequences.animate_materials(
+				mat_list,
+				context.scene.render.engine,
+				export_location=sequences.ExportLocation.ORIGINAL)
 
 		if self.prepMaterials:
 			bpy.ops.mcprep.prep_materials(
@@ -501,6 +660,8 @@ class MCPREP_OT_swap_texture_pack(
 				makeSolid=self.makeSolid,
 				syncMaterials=self.syncMaterials,
 				packFormat=self.packFormat,
+				useNodeGroups=self.useNodeGroups,
+				timingReport=self.timingReport,
 				skipUsage=True)
 
 		if invalid_uv:
@@ -624,7 +785,8 @@ class MCPREP_OT_load_material(bpy.types.Operator, McprepMaterialProps):
 			)
 			res = generate.matprep_cycles(
 				mat=mat,
-				options=options
+				options=options,
+				use_node_group=self.useNodeGroups
 			)
 		else:
 			return False, "Only Cycles and Eevee supported"
@@ -17,16 +17,26 @@
 # ##### END GPL LICENSE BLOCK #####
 
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Tuple, Dict
+from typing import Optional, Tuple, Dict, List, Union
 import enum
 import errno
 import json
 import os
 import re
+import shutil
+import struct
+import time
 
 import bpy
-from bpy.types import Context, Material, Image, Texture
+from bpy.types import Material, Image, Texture
+
+# Bundled with Blender, but keep the pure python fallbacks working without it.
+try:
+	import numpy as np
+except ImportError:
+	np = None
 
 from . import generate
 from . import uv_tools
@@ -60,6 +70,103 @@ def animate_single_material(
 		Bool (if actually updated or not),
 		Str (error text if any handled, e.g. OS permission error)
 	"""
+	results, _ = animate_materials([mat], engine, export_location, clear_cache)
+	return results[mat.name]
+
+
+@env.span("sequences.animate_materials")
+def animate_materials(
+	mats: List[Material],
+	engine: Engine,
+	export_location: ExportLocation,
+	clear_cache: bool=False,
+	workers: int=0
+) -> Tuple[Dict[str, Tuple[bool, bool, Optional[str]]], Dict[str, float]]:
+	"""Animates textures for a list of materials, including all passes.
+
+	Each texture folder is listed once for all materials using it, and each
+	sequence is exported once even if used by multiple materials.
+
+	Args:
+		mats: the existing materials
+		engine: target render engine
+		export_location: enum of {original, texturepack, local}
+		clear_cache: whether to pre-remove existing sequence if existing
+		workers: threads to encode exported png frames with, 0 for none
+	Returns:
+		Dict of material name to the same results as animate_single_material,
+		Dict of seconds spent per phase (resolve, scan, export, apply)
+	"""
+	timings = {}
+	results = {}
+
+	# Resolve which texture pack image each material would animate from.
+	t0 = time.time()
+	jobs = {}  # (source_path, image_path, form) to list of materials
+	for mat in mats:
+		source = get_animation_source(mat)
+		if not isinstance(source, dict):
+			results[mat.name] = source
+			continue
+		key = (source["source_path"], source["image_path"], source["form"])
+		jobs.setdefault(key, []).append((mat, source))
+	timings["resolve"] = time.time() - t0
+
+	# Find the additional passes, each texture folder is indexed once.
+	t0 = time.time()
+	pass_dicts = {}
+	for key in jobs:
+		pass_dicts[key] = generate.find_additional_passes(key[1])
+	timings["scan"] = time.time() - t0
+
+	# Export (or reuse) each sequence once.
+	t0 = time.time()
+	tile_dicts = {}
+	break_err = None
+	for key in jobs:
+		if break_err:
+			break
+		source_path, image_path, form = key
+		tile_path_dict, err = generate_material_sequence(
+			source_path, image_path, form, export_location, clear_cache,
+			img_pass_dict=pass_dicts[key], workers=workers)
+		if err:
+			env.log("Error occured during sequence generation:")
+			env.log(err)
+			break_err = err
+			for mat, _ in jobs[key]:
+				results[mat.name] = (True, False, err)
+			continue
+		tile_dicts[key] = tile_path_dict
+	timings["export"] = time.time() - t0
+
+	# Wire up the sequences into each material.
+	t0 = time.time()
+	for key, mat_sources in jobs.items():
+		if key not in tile_dicts:
+			continue
+		for mat, source in mat_sources:
+			results[mat.name] = apply_material_sequence(
+				mat, engine, source["canon"], tile_dicts[key])
+	timings["apply"] = time.time() - t0
+
+	for mat in mats:
+		if mat.name not in results:  # Not reached due to an earlier error.
+			results[mat.name] = (False, False, break_err)
+
+	env.log(
+		"Animate textures timings: " + ", ".join(
+			f"{phase} {secs:.3f}s" for phase, secs in timings.items()))
+	return results, timings
+
+
+def get_animation_source(mat: Material) -> Union[Dict[str, str], Tuple[bool, bool, None]]:
+	"""Find the texture pack image and mcmeta to animate a material from.
+
+	Returns:
+		Dict of canon, form, image_path and source_path if animate-able,
+		otherwise the final animate_single_material result for the material.
+	"""
 	mat_gen = util.nameGeneralize(mat.name)
 	canon, form = generate.get_mc_canonical_name(mat_gen)
 	affectable = False
@@ -97,14 +204,17 @@ def animate_single_material(
 	if not source_path:
 		source_path = image_path_canon
 		env.log("Fallback to using image canon path instead of source path")
-	tile_path_dict, err = generate_material_sequence(
-		source_path, image_path_canon, form, export_location, clear_cache)
-	if err:
-		env.log("Error occured during sequence generation:")
-		env.log(err)
-		return affectable, False, err
+	return {
+		"canon": canon, "form": form,
+		"image_path": image_path_canon, "source_path": source_path}
+
+
+def apply_material_sequence(
+	mat: Material, engine: Engine, canon: str, tile_path_dict: Dict[str, Path]
+) -> Tuple[bool, bool, None]:
+	"""Set exported sequences onto the matching pass nodes of a material."""
 	if tile_path_dict == {}:
-		return affectable, False, None
+		return True, False, None
 
 	affected_materials = 0
 	for pass_name in tile_path_dict:
@@ -130,7 +240,7 @@ def animate_single_material(
 			affected_materials += 1
 
 	generate.set_saturation_material(mat)
-	return affectable, affected_materials > 0, None
+	return True, affected_materials > 0, None
 
 
 def is_image_tiled(image_block: Image) -> bool:
@@ -144,7 +254,15 @@ def is_image_tiled(image_block: Image) -> bool:
 		return True
 
 
-def generate_material_sequence(source_path: Path, image_path: Path, form: Optional[Form], export_location: ExportLocation, clear_cache: bool) -> Tuple[Dict[str, Path], Optional[str]]:
+def generate_material_sequence(
+	source_path: Path,
+	image_path: Path,
+	form: Optional[Form],
+	export_location: ExportLocation,
+	clear_cache: bool,
+	img_pass_dict: Optional[Dict[str, Path]]=None,
+	workers: int=0
+) -> Tuple[Dict[str, Path], Optional[str]]:
 	"""Performs frame by frame export of sequences to location based on input.
 
 	Returns Dictionary of the image paths to the first tile of each
@@ -156,6 +274,8 @@ def generate_material_sequence(source_path: Path, image_path: Path, form: Option
 		form: jmc2obj, mineways, or none
 		export_location: enum of type of location output
 		clear_cache: whether to delete and re-export frames, even if existing found
+		img_pass_dict: passes found for image_path, if already looked up
+		workers: threads to encode exported png frames with, 0 for none
 	Returns:
 		tile_path_dict: list of filepaths
 		err: Error if any handled
@@ -165,7 +285,8 @@ def generate_material_sequence(source_path: Path, image_path: Path, form: Option
 	image_dict = {}
 
 	# gets available passes from current texturepack for given name
-	img_pass_dict = generate.find_additional_passes(image_path)
+	if img_pass_dict is None:
+		img_pass_dict = generate.find_additional_passes(image_path)
 
 	seq_path_base = None  # defaults to folder in resource pack
 	if export_location == "local":
@@ -263,10 +384,35 @@ def generate_material_sequence(source_path: Path, image_path: Path, form: Option
 					else:
 						raise Exception(exc)
 
+		# a partial export, e.g. from an interrupted run, is not a valid cache
+		expected = get_expected_tiles(passfile, pass_name)
+		if cached and not clear_cache and expected:
+			if not all(tile in cached for tile in expected):
+				env.log(f"Partial sequence found, re-exporting {pass_name}")
+				for tile in cached:
+					try:
+						os.remove(os.path.join(seq_path, tile))
+					except OSError as exc:
+						if exc.errno == errno.EACCES:
+							return {}, perm_denied
+						raise Exception(exc)
+				cached = []
+
 		# generate the sequences
 		params = []  # TODO: get from json file
 		if clear_cache or not cached:
-			first_tile = export_image_to_sequence(passfile, params, seq_path, form)
+			first_tile = None
+			cache_dir = get_frame_cache_dir()
+			cache_key = generate.get_file_hash(passfile) if cache_dir else None
+			if cache_key and not clear_cache:
+				first_tile = restore_cached_frames(
+					cache_dir, cache_key, seq_path, pass_name)
+			if not first_tile:
+				first_tile = export_image_to_sequence(
+					passfile, params, seq_path, form, workers)
+				if first_tile and cache_key:
+					store_cached_frames(
+						cache_dir, cache_key, seq_path, pass_name, passfile)
 		else:
 			first_tile = os.path.join(seq_path, sorted(cached)[0])
 
@@ -276,13 +422,182 @@ def generate_material_sequence(source_path: Path, image_path: Path, form: Option
 	return image_dict, None
 
 
-def export_image_to_sequence(image_path: Path, params: Tuple[str, int, bool], output_folder: Path=None, form: Optional[Form]=None) -> Path:
+# -----------------------------------------------------------------------------
+# Frame cache, to reuse exported sequences across blend files
+# -----------------------------------------------------------------------------
+
+# Written into each cache entry folder, keyed by source image content hash
+FRAME_MANIFEST = "manifest.json"
+
+
+def get_frame_cache_dir() -> Optional[Path]:
+	"""Returns the frame cache folder from preferences, if one is set."""
+	addon_prefs = util.get_user_preferences()
+	if not addon_prefs or not getattr(addon_prefs, "frame_cache_path", ""):
+		return None
+	return bpy.path.abspath(addon_prefs.frame_cache_path)
+
+
+def read_png_size(path: Path) -> Optional[Tuple[int, int]]:
+	"""Returns the width and height from a png header, without loading it."""
+	try:
+		with open(path, "rb") as png:
+			header = png.read(24)
+	except OSError:
+		return None
+	if len(header) < 24 or header[:8] != b"\x89PNG\r\n\x1a\n" or header[12:16] != b"IHDR":
+		return None
+	return struct.unpack(">II", header[16:24])
+
+
+def get_expected_tiles(image_path: Path, pass_name: str) -> Optional[List[str]]:
+	"""Returns the tile file names an export of this image would produce.
+
+	Only available for png files, where the size can be read from the header.
+	"""
+	size = read_png_size(image_path)
+	if not size or not size[0] or size[1] % size[0]:
+		return None
+	ext = os.path.splitext(image_path)[-1]
+	return [
+		f"{pass_name}_{i + 1:04}{ext}" for i in range(size[1] // size[0])]
+
+
+def read_frame_manifest(entry_dir: Path) -> Optional[Dict]:
+	"""Returns the manifest of a cache entry if all of its frames are intact."""
+	try:
+		with open(os.path.join(entry_dir, FRAME_MANIFEST)) as mf:
+			manifest = json.load(mf)
+	except (OSError, ValueError):
+		return None
+	for name, size in manifest.get("files", {}).items():
+		path = os.path.join(entry_dir, name)
+		if not os.path.isfile(path) or os.path.getsize(path) != size:
+			return None
+	if len(manifest.get("files", {})) != manifest.get("frames"):
+		return None
+	if manifest.get("bytes") != sum(manifest.get("files", {}).values()):
+		return None
+	return manifest
+
+
+def write_frame_manifest(entry_dir: Path, manifest: Dict) -> None:
+	tmp_path = os.path.join(entry_dir, f"{FRAME_MANIFEST}.tmp")
+	with open(tmp_path, "w") as mf:
+		json.dump(manifest, mf)
+	os.replace(tmp_path, os.path.join(entry_dir, FRAME_MANIFEST))
+
+
+def restore_cached_frames(
+	cache_dir: Path, key: str, seq_path: Path, pass_name: str
+) -> Optional[Path]:
+	"""Copy cached frames for this source hash into seq_path, if cached.
+
+	Returns:
+		Path to the first tile, or None if no valid cache entry found.
+	"""
+	entry_dir = os.path.join(cache_dir, key)
+	manifest = read_frame_manifest(entry_dir)
+	if not manifest:
+		if os.path.isdir(entry_dir):
+			env.log(f"Removing stale frame cache entry {key}")
+			shutil.rmtree(entry_dir, ignore_errors=True)
+		return None
+
+	first_tile = None
+	try:
+		for i, name in enumerate(sorted(manifest["files"])):
+			ext = os.path.splitext(name)[-1]
+			out_path = os.path.join(seq_path, f"{pass_name}_{i + 1:04}{ext}")
+			shutil.copyfile(os.path.join(entry_dir, name), out_path)
+			if not first_tile:
+				first_tile = out_path
+		manifest["last_used"] = time.time()
+		write_frame_manifest(entry_dir, manifest)
+	except OSError as err:
+		env.log(f"Failed to restore cached frames for {pass_name}: {err}")
+		return None
+
+	env.log(f"Restored {manifest['frames']} frames of {pass_name} from cache")
+	return bpy.path.abspath(first_tile)
+
+
+def store_cached_frames(
+	cache_dir: Path, key: str, seq_path: Path, pass_name: str, source: Path
+) -> None:
+	"""Copy a freshly exported sequence into the frame cache."""
+	tiles = get_expected_tiles(source, pass_name)
+	if not tiles:
+		tiles = sorted(
+			tile for tile in os.listdir(seq_path)
+			if os.path.isfile(os.path.join(seq_path, tile))
+			and tile.startswith(pass_name))
+
+	entry_dir = os.path.join(cache_dir, key)
+	files = {}
+	try:
+		os.makedirs(entry_dir, exist_ok=True)
+		for i, tile in enumerate(tiles):
+			name = f"frame_{i + 1:04}{os.path.splitext(tile)[-1]}"
+			shutil.copyfile(os.path.join(seq_path, tile), os.path.join(entry_dir, name))
+			files[name] = os.path.getsize(os.path.join(entry_dir, name))
+		size = read_png_size(os.path.join(seq_path, tiles[0])) if tiles else None
+		write_frame_manifest(entry_dir, {
+			"source": source,
+			"frames": len(files),
+			"resolution": list(size) if size else None,
+			"files": files,
+			"bytes": sum(files.values()),
+			"last_used": time.time()})
+	except OSError as err:
+		env.log(f"Failed to add {pass_name} to frame cache: {err}")
+		shutil.rmtree(entry_dir, ignore_errors=True)
+		return
+
+	addon_prefs = util.get_user_preferences()
+	max_mb = getattr(addon_prefs, "frame_cache_max_mb", 0) if addon_prefs else 0
+	if max_mb:
+		prune_frame_cache(cache_dir, max_mb * 1024 * 1024)
+
+
+def prune_frame_cache(cache_dir: Path, max_bytes: int) -> None:
+	"""Remove least recently used cache entries until under max_bytes."""
+	entries = []
+	with os.scandir(cache_dir) as cache_entries:
+		for entry in cache_entries:
+			if not entry.is_dir():
+				continue
+			manifest = read_frame_manifest(entry.path)
+			if not manifest:
+				shutil.rmtree(entry.path, ignore_errors=True)
+				continue
+			entries.append(
+				(manifest.get("last_used", 0), manifest["bytes"], entry.path))
+
+	total = sum(entry[1] for entry in entries)
+	for _, size, path in sorted(entries):
+		if total <= max_bytes:
+			break
+		env.log(f"Pruning frame cache entry {os.path.basename(path)}")
+		shutil.rmtree(path, ignore_errors=True)
+		total -= size
+
+
+def export_image_to_sequence(
+	image_path: Path,
+	params: Tuple[str, int, bool],
+	output_folder: Path=None,
+	form: Optional[Form]=None,
+	workers: int=0
+) -> Path:
 	"""Convert image tiles into image sequence files.
 
 	image_path: image filepath source
 	params: Settings from the json file or otherwise on *how* to animate it
 		e.g. ["linear", 2, false] = linear animation, 2 seconds long, and _?
 	form: jmc2obj, Mineways, or None (default)
+	workers: If above 0, png frames are encoded in this many threads instead
+		of being saved one by one through blender.
 	Returns:
 		Full path of first image on success.
 	Does not auto load new images (or keep temporary ones created around)
@@ -312,48 +627,27 @@ def export_image_to_sequence(image_path: Path, params: Tuple[str, int, bool], ou
 		if exc.errno != errno.EEXIST:
 			raise
 
+	if form == "mineways":
+		raise Exception("No Animate Textures Mineways support yet")
+
 	# ind = self.get_sequence_int_index(first_img)
 	# base_name = first_img[:-ind]
 	# start_img = int(first_img[-ind:])
 
-	pxlen = len(image.pixels)
-	first_img = None
+	out_paths = []
 	for i in range(tiles):
-		env.log(f"Exporting sequence tile {i}")
 		tile_name = f"{basename}_{i + 1:04}"
-		out_path = os.path.join(output_folder, tile_name + ext)
-		if not first_img:
-			first_img = out_path
+		out_paths.append(os.path.join(output_folder, tile_name + ext))
 
-		revi = tiles - i - 1  # To reverse index, based on MC tile order.
-
-		# new image for copying pixels over to
-		if form != "mineways":
-			img_tile = bpy.data.images.new(
-				f"{basename}-seq-temp",
-				image.size[0], image.size[0], alpha=(image.channels == 4))
-			img_tile.filepath = out_path
-
-			if len(img_tile.pixels) * tiles != len(image.pixels):
-				raise Exception("Mis-match of tile size and source sequence")
-			start = int(pxlen / tiles * revi)
-			end = int(pxlen / tiles * (revi + 1))
-			img_tile.pixels = image.pixels[start:end]
-
-			# Could have OS issues here in form of RuntimeError.
-			img_tile.save()
+	if np is not None:
+		export_tiles_np(image, out_paths, workers)
+	else:
+		export_tiles_loop(image, out_paths)
 
-			# verify it now exists
-			if not os.path.isfile(out_path):
-				raise Exception("Did not successfully save tile frame from sequence")
-			img_tile.user_clear()
-			if img_tile.users == 0:
-				bpy.data.images.remove(img_tile)
-			else:
-				env.log(f"Couldn't remove tile, shouldn't keep: {img_tile.name}")
-		else:
-			img_tile = None
-			raise Exception("No Animate Textures Mineways support yet")
+	# verify they now exist
+	for out_path in out_paths:
+		if not os.path.isfile(out_path):
+			raise Exception("Did not successfully save tile frame from sequence")
 
 	env.log(f"Finished exporting frame sequence: {basename}")
 	image.user_clear()
@@ -362,7 +656,83 @@ def export_image_to_sequence(image_path: Path, params: Tuple[str, int, bool], ou
 	else:
 		env.log(f"Couldn't remove image block, shouldn't keep: {image.name}")
 
-	return bpy.path.abspath(first_img)
+	return bpy.path.abspath(out_paths[0])
+
+
+def new_sequence_tile(image: Image, tiles: int) -> Image:
+	"""Create the temporary image to copy a single tile's pixels into."""
+	img_tile = bpy.data.images.new(
+		f"{os.path.splitext(image.name)[0]}-seq-temp",
+		image.size[0], image.size[0], alpha=(image.channels == 4))
+	if len(img_tile.pixels) * tiles != len(image.pixels):
+		bpy.data.images.remove(img_tile)
+		raise Exception("Mis-match of tile size and source sequence")
+	return img_tile
+
+
+def remove_sequence_tile(img_tile: Image) -> None:
+	img_tile.user_clear()
+	if img_tile.users == 0:
+		bpy.data.images.remove(img_tile)
+	else:
+		env.log(f"Couldn't remove tile, shouldn't keep: {img_tile.name}")
+
+
+def export_tiles_np(image: Image, out_paths: List[Path], workers: int=0) -> None:
+	"""Save each tile of the image to out_paths, top tile first.
+
+	Reads the source pixels once, then each frame is a view into that buffer.
+	"""
+	tiles = len(out_paths)
+	pixels = np.empty(len(image.pixels), dtype=np.float32)
+	image.pixels.foreach_get(pixels)
+	# Reverse index, based on MC tile order (blender pixel rows go bottom up).
+	frames = pixels.reshape(tiles, -1)[::-1]
+
+	channels = frames.shape[1] // (image.size[0] * image.size[0])
+	use_png = all(
+		os.path.splitext(path)[-1].lower() == ".png" for path in out_paths)
+	if workers > 0 and use_png and channels in (3, 4):
+		env.log(f"Encoding {tiles} sequence tiles with {workers} workers")
+		size = image.size[0]
+		with ThreadPoolExecutor(max_workers=workers) as pool:
+			jobs = [
+				pool.submit(util.write_png, path, frames[i].reshape(size, size, channels))
+				for i, path in enumerate(out_paths)]
+			for job in jobs:
+				job.result()  # Raise any error from the worker
+		return
+
+	img_tile = new_sequence_tile(image, tiles)
+	try:
+		for i, out_path in enumerate(out_paths):
+			env.log("Exporting sequence tile %d", i)
+			img_tile.filepath = out_path
+			img_tile.pixels.foreach_set(frames[i])
+			# Could have OS issues here in form of RuntimeError.
+			img_tile.save()
+	finally:
+		remove_sequence_tile(img_tile)
+
+
+def export_tiles_loop(image: Image, out_paths: List[Path]) -> None:
+	"""Save each tile of the image to out_paths, without numpy."""
+	tiles = len(out_paths)
+	pxlen = len(image.pixels)
+	for i, out_path in enumerate(out_paths):
+		env.log("Exporting sequence tile %d", i)
+		revi = tiles - i - 1  # To reverse index, based on MC tile order.
+
+		# new image for copying pixels over to
+		img_tile = new_sequence_tile(image, tiles)
+		img_tile.filepath = out_path
+		start = int(pxlen / tiles * revi)
+		end = int(pxlen / tiles * (revi + 1))
+		img_tile.pixels = image.pixels[start:end]
+
+		# Could have OS issues here in form of RuntimeError.
+		img_tile.save()
+		remove_sequence_tile(img_tile)
 
 
 def get_sequence_int_index(base_name: str) -> int:
@@ -479,10 +849,17 @@ class MCPREP_OT_prep_animated_textures(bpy.types.Operator):
 		self.affectable_materials = 0
 		self.affected_materials = 0
 		self.break_err = None
-		for mat in mats:
-			self.process_single_material(context, mat)
-			if self.break_err:
-				break
+		results, _ = animate_materials(
+			mats, context.scene.render.engine,
+			self.export_location, self.clear_cache,
+			workers=min(4, os.cpu_count() or 1))
+		for affectable, affected, err in results.values():
+			if err:
+				self.break_err = err
+			if affectable:
+				self.affectable_materials += 1
+			if affected:
+				self.affected_materials += 1
 
 		invalid_uv, affected_objs = uv_tools.detect_invalid_uvs_from_objs(objs)
 
@@ -514,19 +891,6 @@ class MCPREP_OT_prep_animated_textures(bpy.types.Operator):
 			self.track_param = context.scene.render.engine
 			return {'FINISHED'}
 
-	def process_single_material(self, context: Context, mat: Material):
-		"""Run animate textures for single material, and fix UVs and saturation"""
-		affectable, affected, err = animate_single_material(
-			mat, context.scene.render.engine,
-			self.export_location, self.clear_cache)
-		if err:
-			self.break_err = err
-			return
-		if affectable:
-			self.affectable_materials += 1
-		if affected:
-			self.affected_materials += 1
-
 
 # -----------------------------------------------------------------------------
 # Registration
@@ -17,17 +17,27 @@
 # ##### END GPL LICENSE BLOCK #####
 
 
+from concurrent.futures import ThreadPoolExecutor, wait
+import http.client
+import json
 import os
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Dict, Optional, List, Tuple
 import shutil
-import urllib.request
+import threading
+import urllib.parse
 
 import bpy
 from bpy_extras.io_utils import ImportHelper
 from bpy.app.handlers import persistent
 from bpy.types import Context, Material
 
+# Bundled with Blender, needed to convert pre 1.8 skins.
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
 from . import generate
 from .. import tracking
 from .. import util
@@ -41,6 +51,14 @@ swap_all_imgs_desc = (
 	"nodes (not image blocks) named MCPREP_SKIN_SWAP"
 )
 
+SKIN_DOWNLOAD_URL = "http://minotar.net/skin/"
+SKIN_DOWNLOAD_CACHE_VERSION = 1
+SKIN_DOWNLOAD_TIMEOUT = 20
+SKIN_DOWNLOAD_REDIRECTS = 5
+
+# Per worker thread connections, reused across downloads from the same host.
+_skin_connections = threading.local()
+
 # -----------------------------------------------------------------------------
 # Support functions
 # -----------------------------------------------------------------------------
@@ -150,30 +168,103 @@ def loadSkinFile(
 	return 0
 
 
-def convert_skin_layout(image_file: Path) -> bool:
-	"""Convert skin to 1.8+ layout if old format detected
+def check_legacy_skin_size(width: int, height: int) -> bool:
+	"""Returns True if the image size is a pre 1.8 skin layout to convert."""
+	if width == height:
+		return False
+	elif width != height * 2:
+		# some image that isn't the normal 64x32 of old skin formats
+		env.log("Unknown skin image format, not converting layout")
+		return False
+	elif width % 64:
+		env.log("Non-regular scaling of skin image, can't process")
+		return False
+	return True
+
+
+def convert_skin_pixels(pixels: "np.ndarray") -> "np.ndarray":
+	"""Remap pre 1.8 skin pixels into the 1.8+ double height layout.
+
+	Takes and returns (height, width, channels) arrays in blender's bottom-up
+	row order. The old skin becomes the upper half, and the leg and arm are
+	block copied into the lower half, at any skin scale.
+	"""
+	height, width, channels = pixels.shape
+	block = width // 4  # 16 pixels at the 64x32 scale
+	arm = width * 5 // 8  # Arm starts 40 pixels in at the 64x32 scale
+	new_pixels = np.zeros((height * 2, width, channels), dtype=pixels.dtype)
+	new_pixels[height:] = pixels
+	# Leg from the first quarter into the second, arm into the third.
+	new_pixels[:block, block:block * 2] = pixels[:block, :block]
+	new_pixels[:block, block * 2:block * 3] = pixels[:block, arm:arm + block]
+	return new_pixels
+
+
+def convert_skin_file(image_file: Path) -> Optional[bool]:
+	"""Convert a png skin to the 1.8+ layout directly on disk.
+
+	Returns None if the file can't be converted without blender, e.g. not a
+	png or numpy unavailable. Doesn't use bpy, so can run in worker threads.
+	"""
+	if np is None or os.path.splitext(image_file)[-1].lower() != ".png":
+		return None
+	pixels = util.read_png(image_file)
+	if pixels is None:
+		return None
+	height, width, _ = pixels.shape
+	if not check_legacy_skin_size(width, height):
+		return False
+	env.log("Old image format detected, converting to post 1.8 layout")
+	util.write_png(image_file, convert_skin_pixels(pixels))
+	env.log("Saved out post 1.8 converted skin file")
+	return True
+
 
-	Could be improved using numpy, but avoiding the dependency.
+def convert_skin_files(image_files: List[Path], workers: int = 0) -> List[Path]:
+	"""Convert any pre 1.8 skins of image_files, returning those converted.
+
+	Png skins are converted in a thread pool if workers > 0, other files go
+	through blender on the main thread afterwards.
 	"""
+	if workers > 0 and len(image_files) > 1:
+		with ThreadPoolExecutor(max_workers=workers) as pool:
+			results = list(pool.map(convert_skin_file, image_files))
+	else:
+		results = [convert_skin_file(image_file) for image_file in image_files]
+
+	converted = []
+	for image_file, res in zip(image_files, results):
+		if res is None:
+			res = convert_skin_image(image_file)
+		if res:
+			converted.append(image_file)
+	return converted
+
+
+def convert_skin_layout(image_file: Path) -> bool:
+	"""Convert skin to 1.8+ layout if old format detected"""
+	res = convert_skin_file(image_file)
+	if res is None:
+		res = convert_skin_image(image_file)
+	return res
+
 
+def convert_skin_image(image_file: Path) -> bool:
+	"""Convert skin to 1.8+ layout through blender image datablocks."""
 	if not os.path.isfile(image_file):
 		env.log(f"Error! Image file does not exist: {image_file}")
 		return False
+	if np is None:
+		env.log("Numpy is not available, can't convert skin layout")
+		return False
 
 	img = bpy.data.images.load(image_file)
-	if img.size[0] == img.size[1]:
-		return False
-	elif img.size[0] != img.size[1] * 2:
-		# some image that isn't the normal 64x32 of old skin formats
-		env.log("Unknown skin image format, not converting layout")
-		return False
-	elif img.size[0] / 64 != int(img.size[0] / 64):
-		env.log("Non-regular scaling of skin image, can't process")
+	if not check_legacy_skin_size(img.size[0], img.size[1]):
+		bpy.data.images.remove(img)
 		return False
 
 	env.log("Old image format detected, converting to post 1.8 layout")
 
-	scale = int(img.size[0] / 64)
 	has_alpha = img.channels == 4
 	new_image = bpy.data.images.new(
 		name=os.path.basename(image_file),
@@ -181,59 +272,27 @@ def convert_skin_layout(image_file: Path) -> bool:
 		height=img.size[1] * 2,
 		alpha=has_alpha)
 
-	# copy pixels of old format into top half of new format, and save to file
-	# and copy the right arm and leg pixels to the lower half
-	upper_half = list(img.pixels)
-	lower_half_quarter = [0] * int(len(new_image.pixels) / 4)
-	lower_half = []
-	failout = False
-
-	# Copy over the arm and leg to lower half, accounting for image scale
-	# Take it in strips of 16 units at a time per row
-	block_width = int(img.size[0] * img.channels / 4)  # quarter of image width
-	for i in range(int(len(lower_half_quarter) / block_width)):
-		# pixel row rounds down, row 0 = bottom row
-		row = int(i * block_width / (64 * scale * img.channels))
-		# virtual column, not pixel column
-		col = (i * block_width) % (64 * scale * img.channels)
-		# 0-3 index, L->R order: blank, leg, arm, blank
-		block = int(col / 64)
-		if block == 0 or block == 3:
-			lower_half += [0] * block_width
-		elif block == 1:
-			# Here we are copying the leg from block 1/4 (src) into block 2/4
-			start = row * block_width * 4
-			end = row * block_width * 4 + block_width
-			lower_half += upper_half[int(start):int(end)]
-		elif block == 2:
-			# Here we are copying the arm from block 2.5 (src) into block 3/4
-			start = row * block_width * 4 + block_width * 2.5
-			end = (row * block_width * 4) + block_width + (block_width * 2.5)
-			lower_half += upper_half[int(start):int(end)]
-		else:
-			env.log("Bad math! Should never go above 4 blocks")
-			failout = True
-			break
-
-	# Do final combinations of quarters and halves
-	if not failout:
-		lower_half += lower_half_quarter
-		new_pixels = lower_half + upper_half
-		new_image.pixels = new_pixels
-		new_image.filepath_raw = image_file
-		new_image.save()
-		env.log("Saved out post 1.8 converted skin file")
+	pixels = np.empty(len(img.pixels), dtype=np.float32)
+	img.pixels.foreach_get(pixels)
+	pixels = pixels.reshape(img.size[1], img.size[0], -1)
+	new_pixels = convert_skin_pixels(pixels)
+	new_channels = len(new_image.pixels) // (img.size[0] * img.size[1] * 2)
+	if new_channels != img.channels:
+		padded = np.ones(new_pixels.shape[:2] + (new_channels,), dtype=np.float32)
+		shared = min(new_channels, img.channels)
+		padded[..., :shared] = new_pixels[..., :shared]
+		new_pixels = padded
+	new_image.pixels.foreach_set(new_pixels.ravel())
+	new_image.filepath_raw = image_file
+	new_image.save()
+	env.log("Saved out post 1.8 converted skin file")
 
 	# cleanup files
 	img.user_clear()
 	new_image.user_clear()
 	bpy.data.images.remove(img)
 	bpy.data.images.remove(new_image)
-
-	if not failout:
-		return True
-	else:
-		return False
+	return True
 
 
 def getMatsFromSelected(selected: List[bpy.types.Object], new_material: bool=False) -> Tuple[List[Material], List[bpy.types.Object]]:
@@ -294,40 +353,196 @@ def getMatsFromSelected(selected: List[bpy.types.Object], new_material: bool=Fal
 	return mat_ret, linked_objs
 
 
-def download_user(self, context: Context, username: str) -> Optional[Path]:
+def get_skin_download_url(context: Context) -> str:
+	"""Returns the url base that usernames are appended to for downloads."""
+	prefs = util.get_user_preferences(context)
+	url = getattr(prefs, "skin_download_url", "") if prefs else ""
+	return url or SKIN_DOWNLOAD_URL
+
+
+def load_skin_download_cache() -> Dict[str, Dict]:
+	"""Load the on-disk cache of skin download headers, if not already loaded."""
+	if env.skin_download_cache is not None:
+		return env.skin_download_cache
+	env.skin_download_cache = {}
+	path = env.skin_download_cache_path
+	if not os.path.isfile(path):
+		return env.skin_download_cache
+	try:
+		with open(path) as data_file:
+			data = json.load(data_file)
+	except Exception as err:
+		env.log(f"Failed to read skin download cache: {err}")
+		return env.skin_download_cache
+	if data.get("version") != SKIN_DOWNLOAD_CACHE_VERSION:
+		return env.skin_download_cache
+	env.skin_download_cache = data.get("skins", {})
+	return env.skin_download_cache
+
+
+def save_skin_download_cache() -> None:
+	"""Write the skin download cache back to disk, replacing the prior file."""
+	if env.skin_download_cache is None:
+		return
+	path = env.skin_download_cache_path
+	tmp_path = f"{path}.tmp"
+	data = {
+		"version": SKIN_DOWNLOAD_CACHE_VERSION,
+		"skins": env.skin_download_cache}
+	try:
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(tmp_path, 'w') as data_file:
+			json.dump(data, data_file)
+		os.replace(tmp_path, path)
+	except OSError as err:
+		env.log(f"Could not save skin download cache: {err}")
+
+
+def get_skin_connection(scheme: str, netloc: str) -> http.client.HTTPConnection:
+	"""Returns this thread's open connection to a host, creating it if needed."""
+	if not hasattr(_skin_connections, "conns"):
+		_skin_connections.conns = {}
+	key = (scheme, netloc)
+	conn = _skin_connections.conns.get(key)
+	if conn is None:
+		if scheme == "https":
+			conn = http.client.HTTPSConnection(netloc, timeout=SKIN_DOWNLOAD_TIMEOUT)
+		else:
+			conn = http.client.HTTPConnection(netloc, timeout=SKIN_DOWNLOAD_TIMEOUT)
+		_skin_connections.conns[key] = conn
+	return conn
+
+
+def close_skin_connection(scheme: str, netloc: str) -> None:
+	"""Close and forget this thread's connection to a host."""
+	conns = getattr(_skin_connections, "conns", {})
+	conn = conns.pop((scheme, netloc), None)
+	if conn is not None:
+		conn.close()
+
+
+def fetch_skin(
+	url: str, saveloc: Path, meta: Optional[Dict] = None
+) -> Tuple[str, Optional[Dict]]:
+	"""Download a skin to saveloc, unless unchanged since meta was saved.
+
+	Sends the ETag and Last-Modified of the prior download so the server can
+	skip resending unchanged skins. Doesn't use bpy, so can run in worker
+	threads.
+
+	Returns:
+		A status of "downloaded", "unchanged", "missing" or "error", and the
+		cache metadata to keep for this skin.
+	"""
+	headers = {"User-Agent": "MCprep"}
+	if meta and meta.get("url") == url and os.path.isfile(saveloc):
+		if meta.get("etag"):
+			headers["If-None-Match"] = meta["etag"]
+		if meta.get("last_modified"):
+			headers["If-Modified-Since"] = meta["last_modified"]
+
+	target = url
+	for _ in range(SKIN_DOWNLOAD_REDIRECTS + 1):
+		parts = urllib.parse.urlsplit(target)
+		path = parts.path or "/"
+		if parts.query:
+			path += "?" + parts.query
+		for retry in (False, True):
+			conn = get_skin_connection(parts.scheme, parts.netloc)
+			try:
+				conn.request("GET", path, headers=headers)
+				resp = conn.getresponse()
+				break
+			except (OSError, http.client.HTTPException) as err:
+				# The server may have closed an idle connection, retry once.
+				close_skin_connection(parts.scheme, parts.netloc)
+				if retry:
+					print(f"Error occured while downloading skin {url}: {err}")
+					return "error", meta
+
+		location = resp.getheader("Location")
+		if resp.status in (301, 302, 303, 307, 308) and location:
+			resp.read()
+			target = urllib.parse.urljoin(target, location)
+			continue
+		break
+
+	try:
+		if resp.status == 304:
+			resp.read()
+			return "unchanged", meta
+		elif resp.status != 200:
+			resp.read()
+			print(f"Could not download skin {url}: {resp.status} {resp.reason}")
+			return "missing" if resp.status == 404 else "error", meta
+
+		tmp_path = f"{saveloc}.part"
+		with open(tmp_path, 'wb') as skin_file:
+			while True:
+				chunk = resp.read(64 * 1024)
+				if not chunk:
+					break
+				skin_file.write(chunk)
+		os.replace(tmp_path, saveloc)
+	except (OSError, http.client.HTTPException) as err:
+		close_skin_connection(parts.scheme, parts.netloc)
+		print(f"Error occured while downloading skin {url}: {err}")
+		return "error", meta
+
+	return "downloaded", {
+		"url": url,
+		"etag": resp.getheader("ETag"),
+		"last_modified": resp.getheader("Last-Modified")}
+
+
+def download_skin_task(
+	url: str, saveloc: Path, meta: Optional[Dict], convert: bool
+) -> Tuple[str, Optional[Dict], Optional[bool]]:
+	"""Worker thread task to fetch one skin and convert it on disk if needed.
+
+	The last item is the convert_skin_file result, None if the skin still
+	needs converting through blender on the main thread.
+	"""
+	status, meta = fetch_skin(url, saveloc, meta)
+	converted = False
+	if convert and status == "downloaded":
+		converted = convert_skin_file(saveloc)
+	return status, meta, converted
+
+
+def download_user(
+	self, context: Context, username: str, convert: bool = True) -> Optional[Path]:
 	"""Download user skin from online.
 
 	Reusable function from within two common operators for downloading skin.
 	Example link: http://minotar.net/skin/theduckcow
+	Set convert to False to leave layout conversion to the caller.
 	"""
 	env.log(f"Downloading skin: {username}")
 
-	src_link = "http://minotar.net/skin/"
+	src_link = get_skin_download_url(context)
 	saveloc = os.path.join(
 		bpy.path.abspath(context.scene.mcprep_skin_path),
 		username.lower() + ".png")
 
-	try:
-		if env.very_verbose:
-			print(f"Download starting with url: {src_link} - {username.lower()}")
-			print(f"to save location: {saveloc}")
-		urllib.request.urlretrieve(src_link + username.lower(), saveloc)
-	except urllib.error.HTTPError as e:
-		print(e)
+	if env.very_verbose:
+		print(f"Download starting with url: {src_link} - {username.lower()}")
+		print(f"to save location: {saveloc}")
+	cache = load_skin_download_cache()
+	status, meta = fetch_skin(
+		src_link + username.lower(), saveloc, cache.get(saveloc))
+	if status == "missing":
 		self.report({"ERROR"}, "Could not find username")
 		return None
-	except urllib.error.URLError as e:
-		print(e)
+	elif status == "error":
 		self.report({"ERROR"}, "URL error, check internet connection")
 		return None
-	except Exception as e:
-		print(f"Error occured while downloading skin: {e}")
-		self.report({"ERROR"}, f"Error occured while downloading skin: {e}")
-		return None
+	cache[saveloc] = meta
+	save_skin_download_cache()
 
 	# convert to 1.8 skin as needed (double height)
 	converted = False
-	if self.convert_layout:
+	if convert and self.convert_layout:
 		converted = convert_skin_layout(saveloc)
 	if converted:
 		self.track_param = "username + 1.8 convert"
@@ -741,7 +956,7 @@ class MCPREP_OT_download_username_list(bpy.types.Operator):
 		self.layout.prop(self, "username_list", text="")
 		self.layout.prop(self, "skip_redownload")
 		self.layout.label(
-			text="and then press OK; blender may pause briefly to download")
+			text="and then press OK; skins download in the background")
 
 	track_function = "skin"
 	track_param = "username_list"
@@ -756,28 +971,135 @@ class MCPREP_OT_download_username_list(bpy.types.Operator):
 
 		# Currently loaded
 		skins = [str(skin[0]).lower() for skin in env.skin_list]
-		issue_skins = []
-		for username in user_list:
-			if username.lower() not in skins or not self.skip_redownload:
-				saveloc = download_user(self, context, username)
-				if not saveloc:
-					issue_skins.append(username)
+		src_link = get_skin_download_url(context)
+		skin_path = bpy.path.abspath(context.scene.mcprep_skin_path)
+		cache = load_skin_download_cache()
 
+		self._pool = ThreadPoolExecutor(max_workers=min(8, len(user_list)))
+		self._jobs = {}
+		self._skipped = []
+		for username in user_list:
+			if username.lower() in skins and self.skip_redownload:
+				self._skipped.append(username)
+				continue
+			env.log(f"Downloading skin: {username}")
+			saveloc = os.path.join(skin_path, username.lower() + ".png")
+			future = self._pool.submit(
+				download_skin_task,
+				src_link + username.lower(),
+				saveloc,
+				cache.get(saveloc),
+				self.convert_layout)
+			self._jobs[future] = (username, saveloc)
+		self._pool.shutdown(wait=False)
+		self._download_count = len(self._jobs)
+		self._issue_skins = []
+		self._unconverted = []
+
+		if context.window is None:
+			# No event loop to return to, such as in background mode.
+			wait(self._jobs)
+			self.collect_downloads()
+			return self.finish_downloads(context)
+
+		wm = context.window_manager
+		self._timer = wm.event_timer_add(0.1, window=context.window)
+		wm.modal_handler_add(self)
+		return {'RUNNING_MODAL'}
+
+	def modal(self, context, event):
+		if event.type == 'ESC':
+			for future in self._jobs:
+				future.cancel()
+		elif event.type != 'TIMER':
+			return {'PASS_THROUGH'}
+
+		self.collect_downloads()
+		if self._jobs:
+			context.workspace.status_text_set(
+				f"Downloading skins: {self._download_count - len(self._jobs)} of "
+				f"{self._download_count} (Esc to stop)")
+			return {'PASS_THROUGH'}
+
+		context.window_manager.event_timer_remove(self._timer)
+		context.workspace.status_text_set(None)
+		return self.finish_downloads(context)
+
+	def collect_downloads(self) -> None:
+		"""Record the results of finished download jobs."""
+		cache = load_skin_download_cache()
+		for future in [job for job in self._jobs if job.done()]:
+			username, saveloc = self._jobs.pop(future)
+			if future.cancelled():
+				self._issue_skins.append(username)
+				continue
+			status, meta, converted = future.result()
+			if status in ("missing", "error"):
+				self._issue_skins.append(username)
+				continue
+			cache[saveloc] = meta
+			if converted is None:
+				self._unconverted.append(saveloc)
+
+	def finish_downloads(self, context: Context) -> set:
+		"""Convert what the workers could not and reload the skin list."""
+		save_skin_download_cache()
+		for saveloc in self._unconverted:
+			convert_skin_image(saveloc)
 		bpy.ops.mcprep.reload_skins()
 
-		if issue_skins and len(issue_skins) == len(user_list):
-			self.report({"ERROR"}, "Failed to download any skins, see console.")
+		issue_skins = self._issue_skins
+		count = self._download_count
+		skipped = ""
+		if self._skipped:
+			skipped = f", skipped {len(self._skipped)} already local"
+		if issue_skins and len(issue_skins) == count:
+			self.report(
+				{"ERROR"}, f"Failed to download any skins{skipped}, see console.")
 			return {'CANCELLED'}
-		elif issue_skins and len(issue_skins) < len(user_list):
+		elif issue_skins and len(issue_skins) < count:
 			self.report(
 				{"WARNING"},
-				f"Could not download {len(issue_skins)} of {len(user_list)} skins, see console")
+				f"Could not download {len(issue_skins)} of {count} skins{skipped}, see console")
 			return {'FINISHED'}
 		else:
-			self.report({"INFO"}, f"Downloaded {len(user_list)} skins")
+			self.report({"INFO"}, f"Downloaded {count} skins{skipped}")
 			return {'FINISHED'}
 
 
+class MCPREP_OT_convert_skin_folder(bpy.types.Operator):
+	"""Convert all pre 1.8 layout skins in a folder to the 1.8+ layout"""
+	bl_idname = "mcprep.convert_skin_folder"
+	bl_label = "Convert legacy skins"
+	bl_description = (
+		"Convert all pre 1.8 skins in the skin folder to the newer layout "
+		"(will overwrite files)")
+
+	folder: bpy.props.StringProperty(
+		name="Folder",
+		description="Folder of skins to convert, defaults to the skin folder",
+		default="",
+		subtype="DIR_PATH")
+
+	@tracking.report_error
+	def execute(self, context):
+		folder = bpy.path.abspath(self.folder or context.scene.mcprep_skin_path)
+		if not os.path.isdir(folder):
+			self.report({'ERROR'}, "Skin directory does not exist")
+			return {'CANCELLED'}
+
+		files = [
+			os.path.join(folder, fname) for fname in sorted(os.listdir(folder))
+			if fname.split(".")[-1].lower() in ["png", "jpg", "jpeg", "tiff"]
+			and os.path.isfile(os.path.join(folder, fname))]
+		converted = convert_skin_files(files, workers=min(4, os.cpu_count() or 1))
+
+		bpy.ops.mcprep.reload_skins()
+		self.report(
+			{'INFO'}, f"Converted {len(converted)} of {len(files)} skins")
+		return {'FINISHED'}
+
+
 # -----------------------------------------------------------------------------
 # Registration
 # -----------------------------------------------------------------------------
@@ -790,6 +1112,7 @@ classes = (
 	MCPREP_OT_apply_skin,
 	MCPREP_OT_apply_username_skin,
 	MCPREP_OT_download_username_list,
+	MCPREP_OT_convert_skin_folder,
 	# MCPREP_OT_skin_fix_eyes,
 	MCPREP_OT_add_skin,
 	MCPREP_OT_remove_skin,
@@ -54,8 +54,7 @@ def reload_material_sync_library(context: Context) -> None:
 		env.material_sync_cache = []
 		return
 
-	with bpy.data.libraries.load(sync_file) as (data_from, _):
-		env.material_sync_cache = list(data_from.materials)
+	env.material_sync_cache = util.get_blend_contents(sync_file).materials
 	env.log("Updated sync cache", vv_only=True)
 
 
@@ -21,7 +21,13 @@ import bpy
 from bpy.types import Context
 
 import time
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+# Bundled with Blender, but keep the pure python fallbacks working without it.
+try:
+	import numpy as np
+except ImportError:
+	np = None
 
 from ..conf import env
 from . import generate
@@ -58,33 +64,64 @@ def get_uv_bounds_per_material(obj: bpy.types.Object) -> Dict[str, list]:
 	# TODO: add other key for max_uvsize, to detect cases like lava and water
 	# where multiple materials are in one but UVs split over multiple blocks.
 	# In the meantime, threshold of 0.25 set by parent function is a sweetspot
-	for poly in obj.data.polygons:
-		m_index = poly.material_index
-		mslot = obj.material_slots[m_index]
+	polygons = obj.data.polygons
+
+	if np is None:
+		for poly in polygons:
+			m_index = poly.material_index
+			mslot = obj.material_slots[m_index]
+			if not mslot or not mslot.material:
+				continue
+			mkey = mslot.material.name
+			for loop_ind in poly.loop_indices:
+				uvx, uvy = active_uv.data[loop_ind].uv
+				res[mkey][0] = min(res[mkey][0], uvx)
+				res[mkey][1] = max(res[mkey][1], uvx)
+				res[mkey][2] = min(res[mkey][2], uvy)
+				res[mkey][3] = max(res[mkey][3], uvy)
+		return res
+
+	face_count = len(polygons)
+	loop_starts = np.empty(face_count, dtype=np.int32)
+	loop_totals = np.empty(face_count, dtype=np.int32)
+	mat_indices = np.empty(face_count, dtype=np.int32)
+	polygons.foreach_get("loop_start", loop_starts)
+	polygons.foreach_get("loop_total", loop_totals)
+	polygons.foreach_get("material_index", mat_indices)
+	uvs = np.empty(len(active_uv.data) * 2, dtype=np.float32)
+	active_uv.data.foreach_get("uv", uvs)
+	uvs = uvs.reshape(-1, 2)
+
+	# Gather the loops in face order, as loop_mats below is built per face.
+	offsets = np.repeat(
+		loop_starts - np.cumsum(loop_totals) + loop_totals, loop_totals)
+	uvs = uvs[np.arange(len(offsets)) + offsets]
+
+	# Material slot of every loop, then group loops by slot to reduce each.
+	loop_mats = np.repeat(mat_indices, loop_totals)
+	order = np.argsort(loop_mats, kind="stable")
+	slots, group_starts = np.unique(loop_mats[order], return_index=True)
+	if not len(slots):
+		return res
+	uvs = uvs[order]
+	uv_min = np.minimum.reduceat(uvs, group_starts, axis=0)
+	uv_max = np.maximum.reduceat(uvs, group_starts, axis=0)
+
+	for slot, (minx, miny), (maxx, maxy) in zip(slots, uv_min, uv_max):
+		if slot >= len(obj.material_slots):
+			continue
+		mslot = obj.material_slots[slot]
 		if not mslot or not mslot.material:
 			continue
-
-		# TODO: Consider breaking early after reaching the first N hits of a
-		# given material face within the same object, to avoid slowdown for
-		# very large worlds. Butm early tests show that UV check is still small
-		# compared to overall process time of either swap tex or anim tex.
-
-		mkey = mslot.material.name
-		for loop_ind in poly.loop_indices:
-			# a loop could be an edge or face
-			# loop = obj.data.loops[i] # This polygon/edge
-			uvx, uvy = active_uv.data[loop_ind].uv
-			if uvx < res[mkey][0]:  # min x
-				res[mkey][0] = uvx
-			if uvx > res[mkey][1]:  # max x
-				res[mkey][1] = uvx
-			if uvy < res[mkey][2]:  # min y
-				res[mkey][2] = uvy
-			if uvy > res[mkey][3]:  # max y
-				res[mkey][3] = uvy
+		bounds = res[mslot.material.name]
+		bounds[0] = min(bounds[0], float(minx))
+		bounds[1] = max(bounds[1], float(maxx))
+		bounds[2] = min(bounds[2], float(miny))
+		bounds[3] = max(bounds[3], float(maxy))
 	return res
 
 
+@env.span("uv_tools.detect_invalid_uvs_from_objs")
 def detect_invalid_uvs_from_objs(obj_list: List[bpy.types.Object]) -> Tuple[bool, List[bpy.types.Object]]:
 	"""Detect all-in one combined images from concentrated UV layouts.
 
@@ -314,6 +351,88 @@ class MCPREP_OT_select_alpha_faces(bpy.types.Operator):
 				env.log(f"No alpha channel for: {image.name}")
 				continue
 			textures.append(image)
+
+		if np is None:
+			return self.select_alpha_loop(ob, threshold, textures)
+
+		mesh = ob.data
+		face_count = len(mesh.polygons)
+		loop_starts = np.empty(face_count, dtype=np.int32)
+		loop_totals = np.empty(face_count, dtype=np.int32)
+		mat_indices = np.empty(face_count, dtype=np.int32)
+		selected = np.empty(face_count, dtype=bool)
+		mesh.polygons.foreach_get("loop_start", loop_starts)
+		mesh.polygons.foreach_get("loop_total", loop_totals)
+		mesh.polygons.foreach_get("material_index", mat_indices)
+		mesh.polygons.foreach_get("select", selected)
+
+		if not mesh.uv_layers.active:
+			return "No active UV map found"
+		uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+		mesh.uv_layers.active.data.foreach_get("uv", uvs)
+		uvs = uvs.reshape(-1, 2) % 1  # TODO: fix this wraparound hack
+
+		# don't select edges or vertices
+		faces = np.flatnonzero(loop_totals >= 3)
+		if not len(faces):
+			return
+		for fnd in np.unique(mat_indices[faces]):
+			if fnd >= len(textures) or not textures[fnd]:
+				env.log("Could not get image from face's material")
+				return "Could not get image from face's material"
+
+		# UV bounds of every face, relative to the image coordinates
+		uv_min = np.minimum.reduceat(uvs, loop_starts, axis=0)[faces]
+		uv_max = np.maximum.reduceat(uvs, loop_starts, axis=0)[faces]
+
+		for fnd in np.unique(mat_indices[faces]):
+			image = textures[fnd]
+			mat_faces = mat_indices[faces] == fnd
+			width, height = image.size
+			table = self.alpha_summed_area_table(image)
+
+			# Pixel rows and columns covered by each face, as half open ranges.
+			xmin = np.clip(np.round(uv_min[mat_faces, 0] * width), 0, width)
+			xmax = np.clip(np.round(uv_max[mat_faces, 0] * width), 0, width)
+			ymin = np.clip(np.round(uv_min[mat_faces, 1] * height), 0, height)
+			ymax = np.clip(np.round(uv_max[mat_faces, 1] * height), 0, height)
+			xmin = xmin.astype(np.int64)
+			ymin = ymin.astype(np.int64)
+			xmax = np.maximum(xmax.astype(np.int64), xmin)
+			ymax = np.maximum(ymax.astype(np.int64), ymin)
+
+			# assuming faces are roughly rectangular, sum pixels a face covers
+			asum = (
+				table[ymax, xmax] - table[ymin, xmax]
+				- table[ymax, xmin] + table[ymin, xmin])
+			acount = np.maximum((xmax - xmin) * (ymax - ymin), 1)
+			ratio = asum / acount
+			selected[faces[mat_faces]] = ratio < float(threshold)
+			env.log(
+				f"\tSelected {np.count_nonzero(ratio < float(threshold))} of "
+				f"{len(ratio)} faces using {image.name}", vv_only=True)
+
+		mesh.polygons.foreach_set("select", selected)
+		return
+
+	def alpha_summed_area_table(self, image):
+		"""Returns the summed area table of the image's alpha channel.
+
+		Padded with a leading row and column of zeros, so that the alpha sum
+		of rows r0 to r1 and columns c0 to c1 (exclusive) is:
+		table[r1, c1] - table[r0, c1] - table[r1, c0] + table[r0, c0]
+		"""
+		width, height = image.size
+		pixels = np.empty(width * height * 4, dtype=np.float32)
+		image.pixels.foreach_get(pixels)
+		alpha = pixels[3::4].reshape(height, width).astype(np.float64)
+
+		table = np.zeros((height + 1, width + 1), dtype=np.float64)
+		table[1:, 1:] = alpha.cumsum(axis=0).cumsum(axis=1)
+		return table
+
+	def select_alpha_loop(self, ob, threshold, textures: List[Optional[bpy.types.Image]]):
+		"""Per face and pixel fallback of select_alpha, when numpy is missing."""
 		data = [None for tex in textures]
 
 		uv = ob.data.uv_layers.active
@@ -77,8 +77,7 @@ def reload_material_vivy_library(context: Context) -> None:
 		env.vivy_cache = []
 		return
 
-	with bpy.data.libraries.load(str(sync_file)) as (data_from, _):
-		env.vivy_cache = list(data_from.materials)
+	env.vivy_cache = util.get_blend_contents(str(sync_file)).materials
 	env.log("Updated Vivy cache", vv_only=True)
 
 def material_in_vivy_library(material: str, context: Context) -> bool:
@@ -38,7 +38,7 @@ from .spawner import mcmodel
 from .spawner import meshswap
 from .spawner import mobs
 from .spawner import spawn_util
-from .conf import env
+from .conf import env, get_user_data_dir
 # from .import_bridge import bridge
 
 # blender 2.8 icon selections
@@ -399,11 +399,31 @@ class McprepPreference(bpy.types.AddonPreferences):
 			"with material prepping"),
 		subtype='DIR_PATH',
 		default=f"{scriptdir}/MCprep_resources/resourcepacks/mcprep_default/")
+	frame_cache_path: bpy.props.StringProperty(
+		name="Frame cache folder",
+		description=(
+			"Folder to keep exported animated texture frames in, for reuse "
+			"across blend files. Leave empty to not use a frame cache"),
+		subtype='DIR_PATH',
+		default=os.path.join(get_user_data_dir(), "frame_cache", ""))
+	frame_cache_max_mb: bpy.props.IntProperty(
+		name="Frame cache size (MB)",
+		description=(
+			"Maximum size of the frame cache, least recently used sequences "
+			"are removed first. 0 means no limit"),
+		min=0,
+		default=512)
 	skin_path: bpy.props.StringProperty(
 		name="Skin path",
 		description="Folder for skin textures, used in skin swapping",
 		subtype='DIR_PATH',
 		default=f"{scriptdir}/MCprep_resources/skins/")
+	skin_download_url: bpy.props.StringProperty(
+		name="Skin download url",
+		description=(
+			"Url that usernames are appended to when downloading skins, "
+			"e.g. to use a local server for testing"),
+		default="http://minotar.net/skin/")
 	effects_path: bpy.props.StringProperty(
 		name="Effects path",
 		description="Folder for effects blend files and assets",
@@ -578,6 +598,13 @@ class McprepPreference(bpy.types.AddonPreferences):
 			col = split.column()
 			p = col.operator("mcprep.openfolder", text="Open texture pack folder")
 			p.folder = self.custom_texturepack_path
+			split = util.layout_split(box, factor=factor_width)
+			col = split.column()
+			col.label(text="Animated frame cache")
+			col = split.column()
+			col.prop(self, "frame_cache_path", text="")
+			col = split.column()
+			col.prop(self, "frame_cache_max_mb", text="Max MB")
 
 			row = layout.row()
 			row.scale_y = 0.7
@@ -615,6 +642,11 @@ class McprepPreference(bpy.types.AddonPreferences):
 			col = split.column()
 			p = col.operator("mcprep.openfolder", text="Open skin folder")
 			p.folder = self.skin_path
+			split = util.layout_split(box, factor=factor_width)
+			col = split.column()
+			col.label(text="Skin download url")
+			col = split.column()
+			col.prop(self, "skin_download_url", text="")
 
 			row = layout.row()
 			row.scale_y = 0.7
@@ -635,6 +667,15 @@ class McprepPreference(bpy.types.AddonPreferences):
 			row = layout.row()
 			row.prop(self, "verbose")
 			row.prop(self, "feature_set")
+			row = layout.row()
+			profiling = env.spans is not None
+			row.operator(
+				"mcprep.toggle_instrumentation",
+				text="Stop profiling" if profiling else "Start profiling",
+				depress=profiling)
+			sub = row.row()
+			sub.enabled = profiling
+			sub.operator("mcprep.instrumentation_report")
 
 			if self.feature_set != "supported":
 				row = layout.row()
@@ -1032,6 +1073,7 @@ class MCPREP_PT_skins(bpy.types.Panel):
 			b_row.operator("mcprep.add_skin")
 			b_row.operator("mcprep.remove_skin")
 			b_row.operator("mcprep.download_username_list")
+			b_row.operator("mcprep.convert_skin_folder")
 			b_row.operator("mcprep.reload_skins")
 			if context.mode == "OBJECT" and skinname:
 				row = b_row.row(align=True)
@@ -815,8 +815,7 @@ def load_geonode_effect_list(context: Context) -> None:
 		else:
 			env.log(f"Loading nodegroups from blend for geonode effects: {bfile}")
 			# Read nodegroup names from blend file directly.
-			with bpy.data.libraries.load(bfile) as (data_from, _):
-				row_items = list(data_from.node_groups)
+			row_items = util.get_blend_contents(bfile).node_groups
 
 		for itm in row_items:
 			if spawn_util.SKIP_COLL in itm.lower():  # mcskip
@@ -868,8 +867,7 @@ def load_area_particle_effects(context : Context) -> None:
 	]
 
 	for bfile in blends:
-		with bpy.data.libraries.load(bfile) as (data_from, _):
-			particles = list(data_from.particles)
+		particles = util.get_blend_contents(bfile).particles
 
 		for itm in particles:
 			effect = mcprep_props.effects_list.add()
@@ -898,8 +896,8 @@ def load_collection_effects(context: Context) -> None:
 	]
 
 	for bfile in blends:
-		with bpy.data.libraries.load(bfile) as (data_from, _):
-			collections = spawn_util.filter_collections(data_from)
+		contents = util.get_blend_contents(bfile)
+		collections = spawn_util.filter_collections(contents)
 
 		for itm in collections:
 			effect = mcprep_props.effects_list.add()
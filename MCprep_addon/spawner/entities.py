@@ -61,9 +61,8 @@ def get_entity_cache(context: Context, clear: bool=False) -> Dict[str, List[str]
 		env.log("Entity path must be a .blend file")
 		return entity_cache
 
-	with bpy.data.libraries.load(entity_path) as (data_from, _):
-		grp_list = spawn_util.filter_collections(data_from)
-		entity_cache["groups"] = grp_list
+	contents = util.get_blend_contents(entity_path)
+	entity_cache["groups"] = spawn_util.filter_collections(contents)
 	return entity_cache
 
 
@@ -16,12 +16,14 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
+from array import array
+import hashlib
 import os
 import json
 from mathutils import Vector
 from math import sin, cos, radians
 from pathlib import Path
-from typing import Dict, Optional, Tuple, Union, Sequence
+from typing import Dict, List, Optional, Tuple, Union, Sequence
 
 import bpy
 import bmesh
@@ -38,6 +40,21 @@ TexFace = Dict[str, Dict[str, str]]
 Element = Sequence[Union[Dict[str, VectorType], TexFace]]
 Texture = Dict[str, str]
 
+# Corners of an element as (x, y, z) picks of 0 for "from" and 1 for "to".
+ELEMENT_CORNERS = (
+	(0, 1, 0), (1, 1, 0), (1, 0, 0), (0, 0, 0),
+	(0, 1, 1), (1, 1, 1), (1, 0, 1), (0, 0, 1))
+
+# Corner indices of each face, in the order of ELEMENT_FACE_DIRS.
+ELEMENT_FACES = (
+	(0, 1, 2, 3),  # north
+	(5, 4, 7, 6),  # south
+	(1, 0, 4, 5),  # up
+	(7, 6, 2, 3),  # down
+	(4, 0, 3, 7),  # west
+	(1, 5, 6, 2))  # east
+ELEMENT_FACE_DIRS = ("north", "south", "up", "down", "west", "east")
+
 # -----------------------------------------------------------------------------
 # Core MC model functions and implementation
 # -----------------------------------------------------------------------------
@@ -77,43 +94,39 @@ def rotate_around(
 	))
 
 
-def add_element(
+def element_verts(
 	elm_from: VectorType = [0, 0, 0],
 	elm_to: VectorType = [16, 16, 16],
 	rot_origin: VectorType = [8, 8, 8],
 	rot_axis: str = 'y',
 	rot_angle: float = 0
-) -> list:
-	"""Calculates and defines the verts, edge, and faces that to create."""
-	verts = [
-		rotate_around(
-			rot_angle, [elm_from[0], elm_to[1], elm_from[2]], rot_origin, rot_axis),
-		rotate_around(
-			rot_angle, [elm_to[0], elm_to[1], elm_from[2]], rot_origin, rot_axis),
-		rotate_around(
-			rot_angle, [elm_to[0], elm_from[1], elm_from[2]], rot_origin, rot_axis),
-		rotate_around(
-			rot_angle, [elm_from[0], elm_from[1], elm_from[2]], rot_origin, rot_axis),
-		rotate_around(
-			rot_angle, [elm_from[0], elm_to[1], elm_to[2]], rot_origin, rot_axis),
-		rotate_around(
-			rot_angle, [elm_to[0], elm_to[1], elm_to[2]], rot_origin, rot_axis),
-		rotate_around(
-			rot_angle, [elm_to[0], elm_from[1], elm_to[2]], rot_origin, rot_axis),
-		rotate_around(
-			rot_angle, [elm_from[0], elm_from[1], elm_to[2]], rot_origin, rot_axis),
-	]
-
-	edges = []
-	faces = [
-		[0, 1, 2, 3],  # north
-		[5, 4, 7, 6],  # south
-		[1, 0, 4, 5],  # up
-		[7, 6, 2, 3],  # down
-		[4, 0, 3, 7],  # west
-		[1, 5, 6, 2]]  # east
-
-	return verts, edges, faces
+) -> List[List[float]]:
+	"""Returns the corners of an element in blender space, see ELEMENT_CORNERS.
+
+	Same result as rotate_around per corner with the default offset and
+	scale, but the rotation is worked out once for the whole element.
+	rotate_around is kept as the reference for this in tests.
+	"""
+	r = -radians(rot_angle)
+	cos_r = cos(r)
+	sin_r = sin(r)
+	axis_i = ord(rot_axis) - 120  # 'x'=0, 'y'=1, 'z'=2
+	j = (1 + axis_i) % 3
+	k = (2 + axis_i) % 3
+	m = rot_origin[j]
+	n = rot_origin[k]
+	bounds = (elm_from, elm_to)
+
+	verts = []
+	for corner in ELEMENT_CORNERS:
+		pos = [bounds[corner[0]][0], bounds[corner[1]][1], bounds[corner[2]][2]]
+		a = pos[j] - m
+		b = pos[k] - n
+		pos[j] = cos_r * a + sin_r * b + m
+		pos[k] = -sin_r * a + cos_r * b + n
+		verts.append([
+			-(pos[0] - 8) * 0.0625, (pos[2] - 8) * 0.0625, pos[1] * 0.0625])
+	return verts
 
 
 def add_material(
@@ -184,15 +197,35 @@ def locate_image(
 		return os.path.realpath(os.path.join(directory, local_path) + ".png")
 
 
-def read_model(
-	context: Context, model_filepath: Path) -> Tuple[Element, Texture]:
-	"""Reads json file to get textures and elements needed for model.
+def get_model_mtime(model_filepath: Path) -> Optional[int]:
+	"""Returns the modified time of a model file, None if it doesn't exist."""
+	env.count("stat_calls")
+	try:
+		return os.stat(model_filepath).st_mtime_ns
+	except OSError:
+		return None
+
+
+def resolve_model(
+	model_filepath: Path, resource_folder: str, fallback_folder: str
+) -> Dict:
+	"""Returns the flattened elements and textures of a model and its parents.
 
-	This function is recursively called to also get the elements and textures
-	from the parent models the elements from the child will always overwrite
-	the parent's elements individual textures from the child will overwrite the
-	same texture from the parent.
+	Entries are cached per model path and pack roots, and reused until any
+	file up the parent chain changes, so shared parents like block/cube are
+	only read once. Missed higher priority parent paths are kept as deps too,
+	so adding an override to a pack also refreshes the entry. Entries must
+	not be modified.
 	"""
+	model_filepath = os.path.abspath(model_filepath)
+	key = (model_filepath, resource_folder, fallback_folder)
+	entry = env.model_cache.get(key)
+	if entry and all(get_model_mtime(dep) == mtime for dep, mtime in entry["deps"]):
+		env.count("cache_hits")
+		return entry
+	env.count("cache_misses")
+
+	mtime = get_model_mtime(model_filepath)
 	try:
 		with open(model_filepath, 'r') as f:
 			obj_data = json.load(f)
@@ -203,8 +236,6 @@ def read_model(
 		print(e)
 		raise ModelException("Could not read file, select valid json file") from e
 
-	addon_prefs = util.get_user_preferences(context)
-
 	# Go from:      pack/assets/minecraft/models/block/block.json
 	# to 5 dirs up: pack/
 	targets_folder = bpy.path.abspath(
@@ -213,12 +244,10 @@ def read_model(
 				os.path.dirname(
 					os.path.dirname(
 						os.path.dirname(model_filepath))))))
-	# Fallback directories, which should already be resource pack paths.
-	resource_folder = bpy.path.abspath(context.scene.mcprep_texturepack_path)
-	fallback_folder = bpy.path.abspath(addon_prefs.custom_texturepack_path)
 
 	elements: Optional[Element] = None
 	textures: Optional[Texture] = None
+	deps = [(model_filepath, mtime)]
 
 	parent = obj_data.get("parent")
 	if parent is not None:
@@ -236,21 +265,24 @@ def read_model(
 				namespace = parent.split(":")[0]
 				parent_filepath = parent.split(":")[1]
 
-			# resource_folder
+			# Prefer the active pack, then the fallback pack, then the pack
+			# the model itself is in.
 			models_dir = os.path.join(
 				"assets", namespace, "models", f"{parent_filepath}.json")
-			target_path = os.path.join(targets_folder, models_dir)
-			active_path = os.path.join(resource_folder, models_dir)
-			base_path = os.path.join(fallback_folder, models_dir)
-
-			if os.path.isfile(target_path):
-				elements, textures = read_model(context, target_path)
-			if os.path.isfile(active_path):
-				elements, textures = read_model(context, active_path)
-			elif os.path.isfile(base_path):
-				elements, textures = read_model(context, base_path)
+			for folder in (resource_folder, fallback_folder, targets_folder):
+				parent_path = os.path.join(folder, models_dir)
+				env.count("stat_calls")
+				if os.path.isfile(parent_path):
+					parent_entry = resolve_model(
+						parent_path, resource_folder, fallback_folder)
+					elements = parent_entry["elements"]
+					textures = parent_entry["textures"]
+					deps += parent_entry["deps"]
+					break
+				# Creating this file later would override the parent used now.
+				deps.append((parent_path, None))
 			else:
-				env.log(f"Failed to find mcmodel file {parent_filepath}")
+				env.log("Failed to find mcmodel file %s", parent_filepath)
 
 	current_elements: Element = obj_data.get("elements")
 	if current_elements is not None:
@@ -258,74 +290,199 @@ def read_model(
 
 	current_textures: Texture = obj_data.get("textures")
 	if current_textures is not None:
-		if textures is None:
-			textures = current_textures
-		else:
-			for img in current_textures:
-				textures[img] = current_textures[img]
+		# Child textures overwrite the same texture from the parent
+		textures = {**(textures or {}), **current_textures}
+
+	env.log("\nfile: %s", model_filepath, vv_only=True)
+
+	entry = {"elements": elements, "textures": textures, "deps": deps}
+	env.model_cache[key] = entry
+	return entry
+
+
+@env.span("mcmodel.read_model")
+def read_model(
+	context: Context, model_filepath: Path) -> Tuple[Element, Texture]:
+	"""Reads json file to get textures and elements needed for model.
+
+	Also gets the elements and textures from the parent models, the elements
+	from the child will always overwrite the parent's elements individual
+	textures from the child will overwrite the same texture from the parent.
+	"""
+	addon_prefs = util.get_user_preferences(context)
 
-	env.log(f"\nfile: {model_filepath}", vv_only=True)
-	# env.log("parent:" + str(parent))
-	# env.log("elements:" + str(elements))
-	# env.log("textures:" + str(textures))
+	# Fallback directories, which should already be resource pack paths.
+	resource_folder = bpy.path.abspath(context.scene.mcprep_texturepack_path)
+	fallback_folder = bpy.path.abspath(addon_prefs.custom_texturepack_path)
 
-	return elements, textures
+	entry = resolve_model(model_filepath, resource_folder, fallback_folder)
+	textures = entry["textures"]
+	if textures is not None:
+		textures = dict(textures)  # Callers may modify their copy
+	return entry["elements"], textures
+
+
+def get_model_material(
+	name: str, path: str, reuse: bool = False
+) -> Optional[Material]:
+	"""Returns a material for a texture path, reusing a prior one if allowed."""
+	if reuse:
+		mat = bpy.data.materials.get(env.model_materials.get(path, ""))
+		if mat is not None and mat.get("MCPREP_model_texture") == path:
+			env.count("cache_hits")
+			return mat
+		env.count("cache_misses")
+
+	mat = add_material(name, path, use_name=False)
+	if reuse and mat is not None:
+		mat["MCPREP_model_texture"] = path
+		env.model_materials[path] = mat.name
+	return mat
+
+
+def get_mesh_signature(mesh: bpy.types.Mesh) -> str:
+	"""Returns a hash of a mesh's geometry, uvs and materials, to detect edits."""
+	signature = hashlib.md5()
+	for items, attr, typecode, size in (
+		(mesh.vertices, "co", 'f', 3),
+		(mesh.loops, "vertex_index", 'i', 1),
+		(mesh.polygons, "loop_total", 'i', 1),
+		(mesh.polygons, "material_index", 'i', 1)
+	):
+		values = array(typecode, [0]) * (len(items) * size)
+		items.foreach_get(attr, values)
+		signature.update(values.tobytes())
+	for uv_layer in mesh.uv_layers:
+		values = array('f', [0]) * (len(uv_layer.data) * 2)
+		uv_layer.data.foreach_get("uv", values)
+		signature.update(values.tobytes())
+	for mat in mesh.materials:
+		signature.update(mat.name.encode() if mat else b"\0")
+	return signature.hexdigest()
+
+
+def get_model_mesh(
+	key: Tuple[str, str], elements: Element, textures: Texture
+) -> Optional[bpy.types.Mesh]:
+	"""Returns the mesh spawned before for a model, if still unchanged.
+
+	Meshes edited since they were spawned are not reused, so that edits to
+	one spawn don't carry over to later ones.
+	"""
+	registered = env.model_meshes.get(key)
+	if registered is None:
+		env.count("cache_misses")
+		return None
+	mesh = bpy.data.meshes.get(registered["mesh"])
+	if (mesh is None or mesh.get("MCPREP_model") != key[0]
+			or registered["elements"] != elements
+			or registered["textures"] != textures
+			or get_mesh_signature(mesh) != registered["signature"]):
+		env.count("cache_misses")
+		return None
+	env.count("cache_hits")
+	return mesh
 
 
 def add_model(
-	model_filepath: Path, obj_name: str = "MinecraftModel"
+	model_filepath: Path, obj_name: str = "MinecraftModel", reuse: bool = False
 ) -> Tuple[int, bpy.types.Object]:
-	"""Primary function for generating a model from json file."""
+	"""Primary function for generating a model from json file.
+
+	With reuse, the new object shares the mesh of a prior spawn of the same
+	model and resource pack, and materials are shared by texture path.
+	"""
 	collection = bpy.context.collection
 	view_layer = bpy.context.view_layer
 
-	# Called recursively!
 	# Can raise ModelException due to permission or corrupted file data.
 	elements, textures = read_model(bpy.context, model_filepath)
 
 	if elements is None:
 		return 1, None
 
-	mesh = bpy.data.meshes.new(obj_name)  # add a new mesh
+	key = (
+		os.path.abspath(model_filepath),
+		bpy.path.abspath(bpy.context.scene.mcprep_texturepack_path))
+	mesh = get_model_mesh(key, elements, textures) if reuse else None
+	if mesh is None:
+		mesh = bpy.data.meshes.new(obj_name)  # add a new mesh
+
+		materials = []
+		if textures:
+			for img in textures:
+				if img != "particle":
+					tex_pth = locate_image(bpy.context, textures, img, model_filepath)
+					mat = get_model_material(f"{obj_name}_{img}", tex_pth, reuse)
+					if f"#{img}" not in materials:
+						mesh.materials.append(mat)
+						materials.append(f"#{img}")
+
+		# Ignore model has overlay geometry, causing issue
+		merge = not (textures and textures.get("overlay"))
+		add_model_geometry(mesh, elements, materials, obj_name, merge)
+
+		if reuse:
+			mesh["MCPREP_model"] = key[0]
+			env.model_meshes[key] = {
+				"mesh": mesh.name,
+				"elements": elements,
+				"textures": textures,
+				"signature": get_mesh_signature(mesh)}
+
 	obj = bpy.data.objects.new(obj_name, mesh)  # add a new object using the mesh
 	collection.objects.link(obj)  # put the object into the scene (link)
 	view_layer.objects.active = obj  # set as the active object in the scene
 	obj.select_set(True)  # select object
+	return 0, obj
 
-	bm = bmesh.new()
-
-	mesh.uv_layers.new()
-	uv_layer = bm.loops.layers.uv.verify()
 
-	materials = []
-	if textures:
-		for img in textures:
-			if img != "particle":
-				tex_pth = locate_image(bpy.context, textures, img, model_filepath)
-				mat = add_material(f"{obj_name}_{img}", tex_pth, use_name=False)
-				obj_mats = obj.data.materials
-				if f"#{img}" not in materials:
-					obj_mats.append(mat)
-					materials.append(f"#{img}")
+def face_normal(verts: Sequence[Sequence[float]]) -> Tuple[float, float, float]:
+	"""Returns the unit normal of a quad, matching blender's face normals."""
+	d1 = [verts[0][i] - verts[2][i] for i in range(3)]
+	d2 = [verts[1][i] - verts[3][i] for i in range(3)]
+	normal = (
+		d1[1] * d2[2] - d1[2] * d2[1],
+		d1[2] * d2[0] - d1[0] * d2[2],
+		d1[0] * d2[1] - d1[1] * d2[0])
+	length = (normal[0] ** 2 + normal[1] ** 2 + normal[2] ** 2) ** 0.5
+	if length == 0:
+		return (0.0, 0.0, 0.0)
+	return (normal[0] / length, normal[1] / length, normal[2] / length)
+
+
+def add_model_geometry(
+	mesh: bpy.types.Mesh,
+	elements: Element,
+	materials: List[str],
+	obj_name: str,
+	merge: bool = True
+) -> None:
+	"""Fills an empty mesh with the faces of model elements.
+
+	All vertex, face, uv and material index arrays are assembled first and
+	then handed to blender at once, rather than adding geometry one vertex
+	and face at a time.
+	"""
+	verts = []
+	faces = []
+	uvs = []
+	mat_indices = []
 
 	for e in elements:
+		faces_data = e.get("faces")
+		if not faces_data:
+			continue
 		rotation = e.get("rotation")
 		if rotation is None:
 			# rotation default
 			rotation = {"angle": 0, "axis": "y", "origin": [8, 8, 8]}
-		element = add_element(
+		elm_verts = element_verts(
 			e['from'], e['to'], rotation['origin'], rotation['axis'], rotation['angle'])
-		verts = [bm.verts.new(v) for v in element[0]]  # add a new vert
-		uvs = [[1, 1], [0, 1], [0, 0], [1, 0]]
-		face_dir = ["north", "south", "up", "down", "west", "east"]
-		faces = e.get("faces")
-		for i in range(len(element[2])):
-			f = element[2][i]
-
-			if not faces:
-				continue
+		elm_faces = []
 
-			d_face = faces.get(face_dir[i])
+		for face_dir, f in zip(ELEMENT_FACE_DIRS, ELEMENT_FACES):
+			d_face = faces_data.get(face_dir)
 			if not d_face:
 				continue
 
@@ -355,43 +512,54 @@ def add_model(
 			# in blender its 0 to 1 the y-axis is inverted when compared to
 			# blender uvs, which is why it is subtracted from 1, essentially
 			# this converts the json uv points to the blender equivelent.
-			uvs = [
-				[uv_coords[2] / 16, 1 - (uv_coords[1] / 16)],  # [x2, y1]
-				[uv_coords[0] / 16, 1 - (uv_coords[1] / 16)],  # [x1, y1]
-				[uv_coords[0] / 16, 1 - (uv_coords[3] / 16)],  # [x1, y2]
-				[uv_coords[2] / 16, 1 - (uv_coords[3] / 16)]   # [x2, y2]
-			]
-
-			face = bm.faces.new(
-				(verts[f[0]], verts[f[1]], verts[f[2]], verts[f[3]])
+			face_uvs = (
+				(uv_coords[2] / 16, 1 - (uv_coords[1] / 16)),  # [x2, y1]
+				(uv_coords[0] / 16, 1 - (uv_coords[1] / 16)),  # [x1, y1]
+				(uv_coords[0] / 16, 1 - (uv_coords[3] / 16)),  # [x1, y2]
+				(uv_coords[2] / 16, 1 - (uv_coords[3] / 16))   # [x2, y2]
 			)
+			# uv coords order is determened by the rotation of the uv,
+			# e.g. if the uv is rotated by 180 degrees, the first index
+			# will be 2 then 3, 0, 1.
+			for j in range(4):
+				uvs.extend(face_uvs[(j + uv_idx) % 4])
 
-			face.normal_update()
-			
 			# Give slight offset by normal for overlay geometry
 			if face_mat == "#overlay":
-				bmesh.ops.translate(bm, verts=face.verts,
-						    vec=0.02 * face.normal)
-
-			for j in range(len(face.loops)):
-				# uv coords order is determened by the rotation of the uv,
-				# e.g. if the uv is rotated by 180 degrees, the first index
-				# will be 2 then 3, 0, 1.
-				face.loops[j][uv_layer].uv = uvs[(j + uv_idx) % len(uvs)]
+				normal = face_normal([elm_verts[i] for i in f])
+				for i in f:
+					for axis in range(3):
+						elm_verts[i][axis] += 0.02 * normal[axis]
 
 			# Assign the material on face
 			if face_mat is not None and face_mat in materials:
-				face.material_index = materials.index(face_mat)
+				mat_indices.append(materials.index(face_mat))
+			else:
+				mat_indices.append(0)
+			elm_faces.append(f)
+
+		# Only keep the corners used by this element's faces.
+		corner_map = {}
+		for f in elm_faces:
+			for i in f:
+				if i not in corner_map:
+					corner_map[i] = len(verts)
+					verts.append(elm_verts[i])
+			faces.append([corner_map[i] for i in f])
+
+	mesh.from_pydata(verts, [], faces)
+	uv_layer = mesh.uv_layers.new()
+	uv_layer.data.foreach_set("uv", uvs)
+	mesh.polygons.foreach_set("material_index", mat_indices)
+	mesh.update()
 
 	# Quick way to clean the model, hopefully it doesn't cause any UV issues
-	# Ignore model has overlay geometry, causing issue
-	if not textures.get("overlay"):
+	if merge:
+		bm = bmesh.new()
+		bm.from_mesh(mesh)
 		bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.005)
-
-	# make the bmesh the object's mesh
-	bm.to_mesh(mesh)
-	bm.free()
-	return 0, obj
+		bm.to_mesh(mesh)
+		bm.free()
 
 
 # -----------------------------------------------------------------------------
@@ -530,6 +698,12 @@ class MCPREP_OT_spawn_minecraft_model(bpy.types.Operator, ModelSpawnBase):
 		default="",
 		subtype="FILE_PATH",
 		options={'HIDDEN', 'SKIP_SAVE'})
+	reuse_data: bpy.props.BoolProperty(
+		name="Reuse mesh and materials",
+		description=(
+			"Spawn as a linked duplicate of this model's prior spawn, and "
+			"share materials between models using the same texture"),
+		default=True)
 
 	track_function = "model"
 	track_param = "list"
@@ -546,7 +720,8 @@ class MCPREP_OT_spawn_minecraft_model(bpy.types.Operator, ModelSpawnBase):
 			return {'CANCELLED'}
 
 		try:
-			r, obj = add_model(os.path.normpath(self.filepath), name)
+			r, obj = add_model(
+				os.path.normpath(self.filepath), name, reuse=self.reuse_data)
 			if r:
 				self.report(
 					{"ERROR"}, "The JSON model does not contain any geometry elements")
@@ -609,6 +784,7 @@ class MCPREP_OT_reload_models(bpy.types.Operator):
 
 	@tracking.report_error
 	def execute(self, context):
+		env.model_cache = {}
 		update_model_list(context)
 		return {'FINISHED'}
 
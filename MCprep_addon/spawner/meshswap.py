@@ -18,7 +18,7 @@
 
 
 from dataclasses import dataclass
-from typing import Dict, List, Union, Tuple
+from typing import Dict, List, Optional, Union, Tuple
 import math
 import mathutils
 import os
@@ -28,6 +28,12 @@ import time
 import bpy
 from bpy.types import Context, Collection
 
+# Bundled with Blender, but keep the pure python fallbacks working without it.
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
 from . import spawn_util
 from ..conf import env, VectorType
 from ..materials import generate
@@ -42,6 +48,10 @@ from .. import tracking
 meshswap_cache = {}
 meshswap_cache_path = None
 
+# Point attributes used for instancing meshswap blocks with geometry nodes.
+MESHSWAP_ROT_ATTR = "mcprep_rotation"
+MESHSWAP_SCALE_ATTR = "mcprep_scale"
+
 
 def get_meshswap_cache(context: Context, clear: bool=False) -> Dict[str, List[str]]:
 	"""Load groups/objects from meshswap lib if not cached, return key vars."""
@@ -66,16 +76,16 @@ def get_meshswap_cache(context: Context, clear: bool=False) -> Dict[str, List[st
 		env.log("Meshswap path must be a .blend file")
 		return meshswap_cache
 
-	with bpy.data.libraries.load(meshswap_path) as (data_from, _):
-		grp_list = spawn_util.filter_collections(data_from)
+	contents = util.get_blend_contents(meshswap_path)
+	grp_list = spawn_util.filter_collections(contents)
 
-		meshswap_cache["groups"] = grp_list
-		for obj in list(data_from.objects):
-			if obj in meshswap_cache["groups"]:
-				# env.log("Skipping meshwap obj already in cache: "+str(obj))
-				continue
-			# ignore list? e.g. Point.001,
-			meshswap_cache["objects"].append(obj)
+	meshswap_cache["groups"] = grp_list
+	for obj in contents.objects:
+		if obj in meshswap_cache["groups"]:
+			# env.log("Skipping meshwap obj already in cache: "+str(obj))
+			continue
+		# ignore list? e.g. Point.001,
+		meshswap_cache["objects"].append(obj)
 	return meshswap_cache
 
 
@@ -167,6 +177,102 @@ class FaceStruct:
 	l: VectorType  # For local_coord
 
 
+def _new_geometry_socket(tree: bpy.types.NodeTree, name: str, in_out: str) -> None:
+	"""Add a geometry socket to a node group's interface, 4.0+ or earlier."""
+	if hasattr(tree, "interface"):
+		tree.interface.new_socket(
+			name=name, in_out=in_out, socket_type="NodeSocketGeometry")
+	elif in_out == "INPUT":
+		tree.inputs.new("NodeSocketGeometry", name)
+	else:
+		tree.outputs.new("NodeSocketGeometry", name)
+
+
+def _named_attribute_output(
+	nodes: bpy.types.Nodes, name: str, location: Tuple[int, int]) -> bpy.types.NodeSocket:
+	"""Add a vector Named Attribute node, returning its attribute output."""
+	node = nodes.new("GeometryNodeInputNamedAttribute")
+	node.data_type = "FLOAT_VECTOR"
+	node.inputs["Name"].default_value = name
+	node.location = location
+	# Pre 4.0, there is one output per data type with only one enabled.
+	return [out for out in node.outputs if out.enabled][0]
+
+
+def get_instancer_asset(
+	tree: bpy.types.NodeTree) -> Optional[Union[bpy.types.Object, Collection]]:
+	"""Returns the object or collection an instancer node group places."""
+	for node in tree.nodes:
+		if node.bl_idname == "GeometryNodeCollectionInfo":
+			return node.inputs["Collection"].default_value
+		elif node.bl_idname == "GeometryNodeObjectInfo":
+			return node.inputs["Object"].default_value
+	return None
+
+
+def get_instancer_node_group(
+	asset: Union[bpy.types.Object, Collection]) -> bpy.types.NodeTree:
+	"""Get or create the geometry node group instancing an asset on points.
+
+	The asset (meshswap object or collection) is placed on every point of the
+	geometry, rotated and scaled by the MESHSWAP_ROT_ATTR and MESHSWAP_SCALE_ATTR
+	point attributes. Requires blender 3.2+ for named attributes.
+	"""
+	is_collection = isinstance(asset, bpy.types.Collection)
+	tree = None
+	for group in bpy.data.node_groups:
+		if group.bl_idname != "GeometryNodeTree":
+			continue
+		if group.get("MCPREP_instance_asset") == asset.name:
+			tree = group
+			break
+
+	if tree is None:
+		tree = bpy.data.node_groups.new(
+			f"MCprep instance {asset.name}", "GeometryNodeTree")
+		tree["MCPREP_instance_asset"] = asset.name
+		_new_geometry_socket(tree, "Geometry", "INPUT")
+		_new_geometry_socket(tree, "Geometry", "OUTPUT")
+	elif get_instancer_asset(tree) == asset:
+		return tree
+	else:
+		# Same asset name but a different datablock, e.g. a re-imported asset,
+		# so rebuild the group in place instead of adding another.
+		tree.nodes.clear()
+
+	nodes = tree.nodes
+	group_in = nodes.new("NodeGroupInput")
+	group_in.location = (-400, 0)
+	group_out = nodes.new("NodeGroupOutput")
+	group_out.location = (400, 0)
+
+	if is_collection:
+		info = nodes.new("GeometryNodeCollectionInfo")
+		info.inputs["Collection"].default_value = asset
+		info_out = info.outputs[0]
+	else:
+		info = nodes.new("GeometryNodeObjectInfo")
+		info.inputs["Object"].default_value = asset
+		if "As Instance" in info.inputs:
+			info.inputs["As Instance"].default_value = True
+		info_out = info.outputs["Geometry"]
+	# Keep the asset's own transform out of the placement, like obj_copy.
+	info.transform_space = "ORIGINAL"
+	info.location = (-200, -150)
+
+	rotation = _named_attribute_output(nodes, MESHSWAP_ROT_ATTR, (-200, -350))
+	scale = _named_attribute_output(nodes, MESHSWAP_SCALE_ATTR, (-200, -500))
+
+	on_points = nodes.new("GeometryNodeInstanceOnPoints")
+	on_points.location = (100, 0)
+	tree.links.new(group_in.outputs[0], on_points.inputs["Points"])
+	tree.links.new(info_out, on_points.inputs["Instance"])
+	tree.links.new(rotation, on_points.inputs["Rotation"])
+	tree.links.new(scale, on_points.inputs["Scale"])
+	tree.links.new(on_points.outputs["Instances"], group_out.inputs[0])
+	return tree
+
+
 # -----------------------------------------------------------------------------
 # Mesh swap operators
 # -----------------------------------------------------------------------------
@@ -441,6 +547,15 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 	countMax = 5  # count compared to this, frequency of refresh (number of objs)
 	runcount = 0  # current counter status of swapped meshes
 
+	# Per run caches, see import_swap_assets
+	swap_targets = {}
+	asset_flags = {}
+	object_templates = {}
+
+	# Mineways (single-tex export) double-tall blocks, which need each face
+	# checked against the instances found so far. See proccess_poly_orientations
+	double_tall_hack = ["Sunflower", "Iron_Door", "Wooden_Door"]
+
 	# properties for draw
 	meshswap_join: bpy.props.BoolProperty(
 		name="Join same blocks",
@@ -449,9 +564,12 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 			"Join together swapped blocks of the same type "
 			"(unless swapped with a group)"))
 	use_dupliverts: bpy.props.BoolProperty(
-		name="Use dupliverts (faster)",
-		default=True,
-		description="Use dupliverts to add meshes")
+		name="Use instancing (faster)",
+		default=False,
+		description=(
+			"Add one point cloud per swapped block type which instances the "
+			"block with geometry nodes, instead of one object per block. "
+			"Requires blender 3.2 or newer"))
 	link_groups: bpy.props.BoolProperty(
 		name="Link groups",
 		default=False,
@@ -484,8 +602,11 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 
 		layout.label(text="GENERAL SETTINGS")
 		row = layout.row()
-		# row.prop(self,"use_dupliverts") # coming soon
-		row.prop(self, "meshswap_join")
+		if util.min_bv((3, 2)):
+			row.prop(self, "use_dupliverts")
+		sub = row.row()
+		sub.enabled = not self.use_point_instances()
+		sub.prop(self, "meshswap_join")
 		row = layout.row()
 		row.prop(self, "link_groups")
 		row.prop(self, "prep_materials")
@@ -515,6 +636,7 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 	track_function = "meshswap"
 	track_exporter = None
 	@tracking.report_error
+	@env.span("meshswap.meshswap")
 	def execute(self, context):
 		tprep = time.time()
 		addon_prefs = util.get_user_preferences(context)
@@ -547,6 +669,9 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 		env.log(f"Meshswap to check over {denom} objects")
 		bpy.context.window_manager.progress_begin(0, 100)
 
+		# IMPORTS, all needed assets at once ahead of the loop
+		new_groups += self.import_swap_assets(context, objList)
+
 		tprep = time.time() - tprep
 		t0s = []  # start of loop
 		t1s = []  # between prep and face process
@@ -562,8 +687,8 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 			bpy.context.window_manager.progress_update(iter_index / denom)
 			swapGen: str = util.nameGeneralize(swap.name)
 			# swapGen = generate.get_mc_canonical_name(swap.name)
-			env.log(f"Simplified name: {swapGen}")
-			# IMPORTS, gets lists properties, etc
+			env.log("Simplified name: %s", swapGen)
+			# gets lists properties, etc
 			swapProps = self.checkExternal(context, swapGen)
 
 			# issue in swapProps, e.g. not a mesh or not in lib or some error
@@ -580,20 +705,24 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 			if not (swapProps['meshSwap'] or swapProps['groupSwap']):
 				continue
 
-			env.log(
-				f"Swapping '{swap.name}', simplified name '{swapGen}")
+			env.log("Swapping '%s', simplified name '%s'", swap.name, swapGen)
 
 			# loop through each face or "polygon" of mesh, throw out invalids
 			t1s[-1] = time.time()
 			offset = 0.5 if self.track_exporter == 'Mineways' else 0
-			facebook = self.get_face_list(swap, offset)
 
 			# removing duplicates and checking orientation
-			# structure of: "x-y-z":[[x,y,z], [xr, yr, zr]]
-			instance_configs = {}
-			for face in facebook:
-				# updates instance_configs
-				self.proccess_poly_orientations(face, swapProps, swapGen, instance_configs)
+			# structure of: key:[[x,y,z], rot_type]
+			instance_configs = None
+			if np is not None and swapGen not in self.double_tall_hack:
+				instance_configs = self.get_instance_configs(swap, swapProps, offset)
+			if instance_configs is None:
+				instance_configs = {}
+				facebook = self.get_face_list(swap, offset)
+				for face in facebook:
+					# updates instance_configs
+					self.proccess_poly_orientations(
+						face, swapProps, swapGen, instance_configs)
 
 			# Primary function for adding the actual instances
 			# Critical path process section!
@@ -602,15 +731,23 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 				context, swap, swapProps, instance_configs)
 			base = swapProps["object"]
 
-			# Having completed adding instances, remove the 'base copy'
-			if not grouped:
+			# Having completed adding instances, remove the 'base copy', unless
+			# still needed as the source of the point instances.
+			if not grouped and self.use_point_instances():
+				if base in selList:
+					selList.pop(selList.index(base))
+				exclude_vl = util.get_or_create_viewlayer(
+					context, util.SPAWNER_EXCLUDE)
+				exclude_vl.exclude = True
+				util.move_to_collection(base, exclude_vl.collection)
+			elif not grouped:
 				if base in dupedObj:
 					dupedObj.pop(dupedObj.index(base))
 				if base in selList:  # gaurd for stability, but shouldn't happen
 					selList.pop(selList.index(base))
 				util.obj_unlink_remove(base, True, context)
 
-			if grouped:
+			if grouped or self.use_point_instances():
 				new_objects += dupedObj  # list
 			elif dupedObj and self.meshswap_join:
 				# join meshes together, carefully removing old selected objects
@@ -659,6 +796,8 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 			t3s[-1] = time.time()
 
 		t4 = time.time()
+		self.clear_object_templates()
+
 		# final re-selection and deletion
 		if self.runcount > 0:
 			for rm in removeList:
@@ -770,27 +909,126 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 			facebook.append(FaceStruct(n, g, l))  # g is global, l is local
 		return facebook
 
-	def checkExternal(self, context: Context, name: str) -> Union[bool, Dict[str, str]]:
-		"""Called for each object in the loop as soon as possible."""
+	def get_face_arrays(
+		self, swap: bpy.types.Object, offset: float) -> Tuple["np.ndarray", "np.ndarray"]:
+		"""Batched get_face_list, returning arrays of the relevant faces.
 
-		groupSwap = False
-		meshSwap = False  # if object in both group and mesh swap, group will be used
-		edgeFlush = False  # blocks perfectly on edges, require rotation
-		edgeFloat = False  # floating off edge into air, require rotation ['vines','ladder','lilypad']
-		torchlike = False  # ['torch','redstone_torch_on','redstone_torch_off']
-		removable = False  # to be removed, hard coded.
-		doorlike = False  # appears like a door.
-
-		front_face_rotate = False
-		# rotate mesh with this material's face forward (+y local=default)
-		# for varied positions from exactly center on the block, 1 for Z random too
-		# 1= x,y,z random; 0= only x,y random; 2=rotation random only (vertical)
-		# variance = [ ['tall_grass',1], ['double_plant_grass_bottom',1],
-		# ['flower_yellow',0], ['flower_red',0] ]
-		variance = [False, 0]  # needs to be in this structure
-		new_groups = []  # list of newly added groups in this process
+		Offset is for Mineways to virtually shift all block centers to half ints
+
+		Returns arrays of shape (faces, 3) of the local normals and the local
+		face centers with the offset applied.
+		"""
+		polygons = swap.data.polygons
+		face_count = len(polygons)
+		centers = np.empty(face_count * 3, dtype=np.float32)
+		normals = np.empty(face_count * 3, dtype=np.float32)
+		areas = np.empty(face_count, dtype=np.float32)
+		polygons.foreach_get("center", centers)
+		polygons.foreach_get("normal", normals)
+		polygons.foreach_get("area", areas)
+
+		# hack to avoid too many torches show up, both jmc2obj and Mineways
+		keep = ~((areas > 0.015) & (areas < 0.016))
+		centers = centers.reshape(-1, 3)[keep].astype(np.float64) + offset
+		normals = normals.reshape(-1, 3)[keep].astype(np.float64)
+		return normals, centers
+
+	def get_instance_configs(
+		self, swap: bpy.types.Object, swapProps: Dict[str, str], offset: float
+	) -> Optional[Dict[int, Tuple[VectorType, int]]]:
+		"""Batched proccess_poly_orientations over all faces of an object.
+
+		Computes the block location and rotation type of every face with array
+		operations, then deduplicates instances by integer-packed block keys.
+		Does not handle the double_tall_hack blocks.
+
+		Returns:
+			Dict of packed block key to [location, rotation type] like
+			instance_configs, or None if locations exceed the packed key range.
+		"""
+		normals, centers = self.get_face_arrays(swap, offset)
+		if not len(centers):
+			return {}
+
+		# Reverses which block to count 'on edge' for so that the instances
+		# are placed in "front" of where it hangs, see proccess_poly_orientations
+		outside_hanging = 1 if swapProps['edgeFloat'] else -1
+		# check if face is on unit block boundary (local coord!), per
+		# util.face_on_edge
+		decimals = centers - np.floor(centers)
+		on_edge = (decimals[:, 0] > 0.4999) & (decimals[:, 0] < 0.501)
+		on_edge |= (decimals[:, 1] > 0.499) & (decimals[:, 1] < 0.501)
+		on_edge |= (decimals[:, 2] > 0.499) & (decimals[:, 2] < 0.501)
+		shift = normals * (0.1 * outside_hanging) * on_edge[:, None]
+		locs = np.round(centers + shift).astype(np.int64)
+
+		# Pack x, y, z into a single integer key of 21 bits each.
+		key_range = 1 << 20
+		if np.abs(locs).max() >= key_range:
+			env.log("Meshswap block locations out of range for packed keys")
+			return None
+		packed = locs + key_range
+		keys = (packed[:, 0] << 42) | (packed[:, 1] << 21) | packed[:, 2]
+
+		# check difference from rounding, this gets us the rotation!
+		x_diff = locs[:, 0] - centers[:, 0]
+		z_diff = locs[:, 2] - centers[:, 2]
+		below = (locs[:, 1] - centers[:, 1]) < 0
+
+		# append rotation, exporter dependent
+		if self.track_exporter not in ("jmc2obj", "Mineways"):
+			rot_types = np.zeros(len(keys), dtype=np.int64)
+		elif swapProps['torchlike']:  # needs fixing
+			high = 0.4 if self.track_exporter == "jmc2obj" else 0.6
+			rot_types = np.select([
+				(x_diff > .1) & (x_diff < high),
+				(z_diff > .1) & (z_diff < high),
+				(x_diff < -.1) & (x_diff > -high),
+				(z_diff < -.1) & (z_diff > -high)],
+				[1, 2, 3, 4], 0)
+		elif swapProps['edgeFloat'] or (
+				swapProps['doorlike'] and not swapProps['edgeFlush']):
+			rot_types = np.select(
+				[below, x_diff > 0.3, z_diff > 0.3, z_diff < -0.3],
+				[8, 7, 0, 6], 5)
+		else:
+			rot_types = np.zeros(len(keys), dtype=np.int64)
+
+		# Keep the first face per block, or the last one for edgeFloat blocks
+		# which overwrite, while ordering blocks by their first face.
+		_, first = np.unique(keys, return_index=True)
+		if swapProps['edgeFloat']:
+			_, last = np.unique(keys[::-1], return_index=True)
+			chosen = len(keys) - 1 - last
+		else:
+			chosen = first
+		chosen = chosen[np.argsort(first)]
+
+		# update the instance ref for each block
+		unoffset = -0.5 if self.track_exporter == 'Mineways' else 0
+		instance_configs = {}
+		for key, loc, rot_type in zip(
+				keys[chosen].tolist(),
+				(locs[chosen] + unoffset).tolist(),
+				rot_types[chosen].tolist()):
+			instance_configs[key] = [loc, rot_type]
+		env.log(
+			f"Found {len(instance_configs)} instances over {len(keys)} faces",
+			vv_only=True)
+		return instance_configs
+
+	def get_swap_target(self, context: Context, name: str) -> Union[bool, Dict[str, str]]:
+		"""Resolve which meshswap asset a simplified name maps to, if any.
+
+		Does not import anything, results are cached per name for this run.
+
+		Returns:
+			False if no match, {'removable': True} if the object should just be
+			removed, otherwise dict of importName, groupSwap and meshSwap.
+		"""
+		if name in self.swap_targets:
+			return self.swap_targets[name]
 
-		meshSwapPath = context.scene.meshswap_path
 		rmable = []
 		if self.track_exporter == "jmc2obj":
 			rmable = [
@@ -814,11 +1052,21 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 		else:
 			# need to select one of the exporters!
 			return False  # {'CANCELLED'}
+
+		target = self._resolve_swap_target(context, name, rmable)
+		self.swap_targets[name] = target
+		return target
+
+	def _resolve_swap_target(
+		self, context: Context, name: str, rmable: List[str]
+	) -> Union[bool, Dict[str, str]]:
 		# delete unnecessary ones first
 		if name in rmable:
-			removable = True
 			env.log("Removable!")
-			return {'removable': removable}
+			return {'removable': True}
+
+		groupSwap = False
+		meshSwap = False  # if object in both group and mesh swap, group will be used
 
 		# check the actual name against the library
 		name = generate.get_mc_canonical_name(name)[0]
@@ -844,110 +1092,191 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 		else:
 			return False  # if not present, continue
 
-		# now import
-		env.log(f"About to link, group {groupSwap} / mesh {meshSwap}?")
-		toLink = self.link_groups
-		for ob in context.selected_objects:
-			util.select_set(ob, False)
+		return {
+			'removable': False, 'importName': name,
+			'groupSwap': groupSwap, 'meshSwap': meshSwap}
 
-		# import: guaranteed to have same name as "appendObj" for the first
-		# instant afterwards.
+	def import_swap_assets(
+		self, context: Context, objList: List[bpy.types.Object]
+	) -> List[Collection]:
+		"""Append or link all meshswap assets needed for objList at once.
 
-		# Need to initialize to something, though this obj not used.
-		importedObj = None
+		Groups are added to the scene as before, while objects are kept as
+		unlinked templates which checkExternal copies per swapped object.
 
-		# for blender 2.8 compatibility
-		if hasattr(bpy.data, "groups"):
-			g_or_c = 'Group'
-		elif hasattr(bpy.data, "collections"):
-			g_or_c = 'Collection'
+		Returns:
+			List of newly added groups/collections.
+		"""
+		self.swap_targets = {}
+		self.asset_flags = {}
+		self.object_templates = {}
 
-		if groupSwap:
-			if name not in util.collections():
+		cache = get_meshswap_cache(context)
+		group_names = set()
+		object_names = set()
+		for swap in objList:
+			target = self.get_swap_target(context, util.nameGeneralize(swap.name))
+			if not target or target['removable']:
+				continue
+			name = target['importName']
+			if target['meshSwap']:
+				object_names.add(name)
+				continue
+			group_names.add(name)
+			# special cases, make another list for this? number of variants can vary..
+			if name == "torch" or name == "Torch":
+				for variant in [f"{name}.1", f"{name}.2"]:
+					if variant in cache["groups"]:
+						group_names.add(variant)
+
+		group_names = {name for name in group_names if name not in util.collections()}
+		if not group_names and not object_names:
+			return []
+
+		meshswap_path = bpy.path.abspath(context.scene.meshswap_path)
+		env.log(
+			f"Loading {len(group_names)} groups and {len(object_names)} objects "
+			"for meshswap")
 
-				# Get prelist of groups/collections to check against afterwards
-				pre_colls = list(util.collections())
+		# Group linking is optional, but objects are always appended.
+		loads = [(self.link_groups, group_names, set())]
+		if self.link_groups:
+			loads.append((False, set(), object_names))
+		else:
+			loads[0] = (False, group_names, object_names)
 
-				# special cases, make another list for this? number of variants can vary..
-				if name == "torch" or name == "Torch":
-					if f"{name}.1" not in pre_colls:
-						util.bAppendLink(os.path.join(meshSwapPath, g_or_c), f"{name}.1", toLink)
-					if f"{name}.2" not in pre_colls:
-						util.bAppendLink(os.path.join(meshSwapPath, g_or_c), f"{name}.2", toLink)
-				util.bAppendLink(os.path.join(meshSwapPath, g_or_c), name, toLink)
+		new_groups = []
+		for link, groups, objects in loads:
+			if not groups and not objects:
+				continue
+			with bpy.data.libraries.load(meshswap_path, link=link) as (data_from, data_to):
+				if hasattr(data_from, "groups"):
+					from_groups = data_from.groups
+				else:
+					from_groups = data_from.collections
+				groups_to = [name for name in from_groups if name in groups]
+				objects_to = [name for name in data_from.objects if name in objects]
+				if hasattr(data_to, "groups"):
+					data_to.groups = groups_to
+				else:
+					data_to.collections = groups_to
+				data_to.objects = objects_to
 
-				post_colls = list(util.collections())
-				new_groups += list(set(post_colls) - set(pre_colls))
+			loaded_groups = getattr(data_to, "groups", None) or data_to.collections
+			for grp in loaded_groups:
+				if grp is None:
+					continue
+				# Add to the scene like an append would, moved to the excluded
+				# layer after the swap.
+				layer_coll = context.view_layer.active_layer_collection
+				layer_coll.collection.children.link(grp)
+				new_groups.append(grp)
+			for obj in data_to.objects:
+				if obj is None:
+					continue
+				self.object_templates[util.nameGeneralize(obj.name)] = obj
+		return new_groups
 
-			# set properties
-			for item in util.collections()[name].items():
-				env.log(f"GROUP PROPS:{item}")
-				try:
-					x = item[1].name  # will NOT work if property UI
-				except:
-					x = item[0]  # the name of the property, [1] is the value
-					if x == 'variance':
-						variance = [True, item[1]]
-					elif x == 'edgeFloat':
-						edgeFloat = True
-					elif x == 'doorlike':
-						doorlike = True
-					elif x == 'edgeFlush':
-						edgeFlush = True
-					elif x == 'torchlike':
-						torchlike = True
-					elif x == 'removable':
-						removable = True
-					elif x == 'frontFaceRotate':
-						front_face_rotate = True
-		else:
-			util.bAppendLink(os.path.join(meshSwapPath, 'Object'), name, False)
-			# ## NOTICE: IF THERE IS A DISCREPENCY BETWEEN ASSETS FILE AND WHAT IT SAYS SHOULD
-			# ## BE IN FILE, EG NAME OF MESH TO SWAP CHANGED, INDEX ERROR IS THROWN HERE
-			# ## >> MAKE a more graceful error indication.
-			# filter out non-meshes in case of parent grouping or other pull-ins
-			# env.log("DEBUG - post importing {}, selected objects: {}".format(
-			# 	name, list(bpy.context.selected_objects)), vv_only=True)
+	def clear_object_templates(self) -> None:
+		"""Remove the unlinked object templates from import_swap_assets."""
+		for obj in self.object_templates.values():
+			try:
+				if obj.users != 0:
+					continue
+				mesh = obj.data
+				bpy.data.objects.remove(obj)
+				if isinstance(mesh, bpy.types.Mesh) and mesh.users == 0:
+					bpy.data.meshes.remove(mesh)
+			except ReferenceError:
+				pass
+		self.object_templates = {}
 
-			for ob in bpy.context.selected_objects:
-				# 2.79b specific hack to clear brought in empties with the mesh
-				# e.g. in case of animated deformation modifiers via object
-				if ob.type != 'MESH':
-					util.select_set(ob, False)
+	def get_asset_flags(self, id_block: bpy.types.ID) -> Dict[str, Union[bool, list]]:
+		"""Parse the meshswap custom property flags of a group or object.
+
+		Cached per asset for this run.
+		"""
+		key = (type(id_block).__name__, id_block.name)
+		if key in self.asset_flags:
+			return self.asset_flags[key]
+
+		# for varied positions from exactly center on the block, 1 for Z random too
+		# 1= x,y,z random; 0= only x,y random; 2=rotation random only (vertical)
+		# variance = [ ['tall_grass',1], ['double_plant_grass_bottom',1],
+		# ['flower_yellow',0], ['flower_red',0] ]
+		flags = {
+			'variance': [False, 0],  # needs to be in this structure
+			'edgeFlush': False,  # blocks perfectly on edges, require rotation
+			'edgeFloat': False,  # floating off edge into air, require rotation ['vines','ladder','lilypad']
+			'torchlike': False,  # ['torch','redstone_torch_on','redstone_torch_off']
+			'removable': False,  # to be removed, hard coded.
+			'doorlike': False,  # appears like a door.
+		}
+		for item in id_block.items():
 			try:
-				importedObj = bpy.context.selected_objects[0]
+				x = item[1].name  # will NOT work if property UI
 			except:
-				# in case nothing selected.. which happens even during selection?
+				x = item[0]  # the name of the property, [1] is the value
+				if x == 'variance':
+					flags['variance'] = [True, item[1]]
+				elif x in flags:
+					flags[x] = True
+		env.log("Props for %s: %s", id_block.name, flags, vv_only=True)
+		self.asset_flags[key] = flags
+		return flags
+
+	def checkExternal(self, context: Context, name: str) -> Union[bool, Dict[str, str]]:
+		"""Called for each object in the loop as soon as possible.
+
+		Assets must already be loaded via import_swap_assets.
+		"""
+		target = self.get_swap_target(context, name)
+		if not target:
+			return False
+		if target['removable']:
+			return {'removable': True}
+
+		name = target['importName']
+		groupSwap = target['groupSwap']
+		meshSwap = target['meshSwap']
+
+		env.log("About to link, group %s / mesh %s?", groupSwap, meshSwap)
+		for ob in context.selected_objects:
+			util.select_set(ob, False)
+
+		# Need to initialize to something, though this obj not used.
+		importedObj = None
+
+		if groupSwap:
+			group = util.collections().get(name)
+			if not group:
+				env.log(f"Meshswap group not found after import: {name}")
 				return False
+			flags = self.get_asset_flags(group)
+		else:
+			# ## NOTICE: IF THERE IS A DISCREPENCY BETWEEN ASSETS FILE AND WHAT IT SAYS SHOULD
+			# ## BE IN FILE, EG NAME OF MESH TO SWAP CHANGED, THE TEMPLATE IS MISSING
+			template = self.object_templates.get(name)
+			if not template or template.type != 'MESH':
+				return False
+			importedObj = template.copy()
+			# Each swap got its own freshly appended mesh before, so keep the
+			# template mesh to the template rather than sharing it.
+			importedObj.data = template.data.copy()
+			util.obj_link_scene(importedObj, context)
 			importedObj["MCprep_noSwap"] = 1
-			# now check properties
-			for item in importedObj.items():
-				try:
-					x = item[1].name  # will NOT work if property UI
-				except:
-					x = item[0]  # the name of the property, [1] is the value
-					if x == 'variance':
-						variance = [True, item[1]]
-					elif x == 'edgeFloat':
-						edgeFloat = True
-					elif x == 'doorlike':
-						doorlike = True
-					elif x == 'edgeFlush':
-						edgeFlush = True
-					elif x == 'torchlike':
-						torchlike = True
-					elif x == 'removable':
-						removable = True
-			for ob in context.selected_objects:
-				util.select_set(ob, False)
-		# #### HERE set the other properties, e.g. variance and edgefloat, now that the obj exists
-		env.log(f"groupSwap: {groupSwap}, meshSwap: {meshSwap}")
-		env.log(f"edgeFloat: {edgeFloat}, variance: {variance}, torchlike: {torchlike}")
+			flags = self.get_asset_flags(template)
+
+		env.log("groupSwap: %s, meshSwap: %s", groupSwap, meshSwap)
+		env.log(
+			"edgeFloat: %s, variance: %s, torchlike: %s",
+			flags['edgeFloat'], flags['variance'], flags['torchlike'])
 		return {
 			'importName': name, 'object': importedObj, 'meshSwap': meshSwap,
-			'groupSwap': groupSwap, 'variance': variance, 'edgeFlush': edgeFlush,
-			'edgeFloat': edgeFloat, 'torchlike': torchlike, 'removable': removable,
-			'doorlike': doorlike, 'new_groups': new_groups}
+			'groupSwap': groupSwap, 'variance': flags['variance'],
+			'edgeFlush': flags['edgeFlush'], 'edgeFloat': flags['edgeFloat'],
+			'torchlike': flags['torchlike'], 'removable': flags['removable'],
+			'doorlike': flags['doorlike'], 'new_groups': []}
 
 	def proccess_poly_orientations(
 			self, face: FaceStruct, swapProps: Dict[str, str], swapGen: str,
@@ -998,12 +1327,13 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 			"Instance:  loc, face.local, face.nrm, hanging offset, if_edgeFloat:",
 			vv_only=True)
 		env.log(
-			str([loc, face.l, face.n, [a, b, c], outside_hanging]),
+			"[%s, %s, %s, [%s, %s, %s], %s]",
+			loc, face.l, face.n, a, b, c, outside_hanging,
 			vv_only=True)
 
 		# ## START HACK PATCH, FOR MINEWAYS (single-tex export) double-tall blocks
 		# prevent double high grass... which mineways names sunflowers.
-		hack_check = ["Sunflower", "Iron_Door", "Wooden_Door"]
+		hack_check = self.double_tall_hack
 		if swapGen in hack_check and f"{x}-{y - 2}-{z}" in instance_configs:
 			overwrite = -1
 		elif swapGen in hack_check and f"{x}-{y + 1}-{z}" in instance_configs:
@@ -1069,7 +1399,7 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 			else:
 				rot_type = 0
 		elif self.track_exporter == "Mineways":
-			env.log(f"checking: {x_diff} {z_diff}")
+			env.log("checking: %s %s", x_diff, z_diff)
 			if swapProps['torchlike']:  # needs fixing
 				env.log("recognized it's a torchlike obj..")
 				if (x_diff > .1 and x_diff < 0.6):
@@ -1118,6 +1448,86 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 		loc_unoffset = [pos + offset for pos in loc]
 		instance_configs[instance_key] = [loc_unoffset, rot_type]
 
+	def use_point_instances(self) -> bool:
+		"""Whether to instance blocks on points, needs named attributes (3.2+)"""
+		return self.use_dupliverts and util.min_bv((3, 2))
+
+	def get_instance_transform(
+		self,
+		swap: bpy.types.Object,
+		swapProps: Dict[str, str],
+		loc_local: VectorType,
+		rot: int
+	) -> Tuple[mathutils.Vector, List[float]]:
+		"""Returns the world location and euler rotation of a single instance.
+
+		Applies the rotation type from proccess_poly_orientations, and adds
+		the location variances if any.
+		"""
+		loc = util.matmul(swap.matrix_world, mathutils.Vector(loc_local))
+		rotation = list(swap.rotation_euler)
+
+		# special case of un-applied,
+		# 90(+/- 0.01)-0-0 rotation on source (y-up conversion)
+		checkcon = swap.rotation_euler[0] >= math.pi / 2 - .01
+		checkcon &= swap.rotation_euler[0] <= math.pi / 2 + .01
+		checkcon &= swap.rotation_euler[1] == 0
+		checkcon &= swap.rotation_euler[2] == 0
+		if checkcon:
+			rotation[0] -= math.pi / 2
+
+		# rotation/translation for walls
+		x, y, offset, rotValue, z = 0, 0, 0.28, 0.436332, 0.12
+
+		if rot == 1:
+			# torch rotation 1
+			x = -offset
+			loc += mathutils.Vector((x, y, z))
+			rotation[1] += rotValue
+		elif rot == 2:
+			# torch rotation 2
+			y = offset
+			loc += mathutils.Vector((x, y, z))
+			rotation[0] += rotValue
+		elif rot == 3:
+			# torch rotation 3
+			x = offset
+			loc += mathutils.Vector((x, y, z))
+			rotation[1] -= rotValue
+		elif rot == 4:
+			# torch rotation 4
+			y = -offset
+			loc += mathutils.Vector((x, y, z))
+			rotation[0] -= rotValue
+		elif rot == 5:
+			# edge block rotation 1
+			rotation[2] += -math.pi / 2
+		elif rot == 6:
+			# edge block rotation 2
+			rotation[2] += math.pi
+		elif rot == 7:
+			# edge block rotation 3
+			rotation[2] += math.pi / 2
+		elif rot == 8:
+			# edge block rotation 4 (ceiling, not 'keep same')
+			rotation[0] += math.pi / 2
+
+		# extra variance to break up regularity, e.g. for tall grass
+		# first, xy and z variance
+		if [True, 1] == swapProps['variance']:
+			x = (random.random() - 0.5) * 0.5
+			y = (random.random() - 0.5) * 0.5
+			z = (random.random() / 2 - 0.5) * 0.6
+			loc += mathutils.Vector((x, y, z))
+		# now for just xy variance, base stays the same
+		elif [True, 0] == swapProps['variance']:  # for non-z variance
+			# values LOWER than *1.0 make it less variable
+			x = (random.random() - 0.5) * 0.5
+			y = (random.random() - 0.5) * 0.5
+			loc += mathutils.Vector((x, y, 0))
+
+		return loc, rotation
+
 	def add_instances_with_transforms(
 		self,
 		context: Context,
@@ -1133,6 +1543,11 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 
 		base = swapProps["object"]
 		grouped = swapProps["groupSwap"]
+
+		if self.use_point_instances():
+			return grouped, self.add_point_instances(
+				context, swap, swapProps, instance_configs)
+
 		dupedObj = []  # duplicating, rotating and moving
 
 		for instance_key in list(instance_configs):
@@ -1147,13 +1562,13 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 				if hasattr(context, "view_layer"):
 					context.view_layer.update()  # but does not redraw ui
 
-			loc = util.matmul(swap.matrix_world, mathutils.Vector(loc_local))
+			loc, rotation = self.get_instance_transform(
+				swap, swapProps, loc_local, rot)
 
-			# loc = swap.matrix_world*mathutils.Vector(set) #local to global
 			if grouped:
 				# definition for randimization, defined at top!
 				randGroup = util.randomizeMeshSwap(swapProps['importName'], 3)
-				env.log(f"Rand group: {randGroup}")
+				env.log("Rand group: %s", randGroup)
 				new_ob = util.addGroupInstance(randGroup, loc)
 				if hasattr(new_ob, "empty_draw_size"):
 					new_ob.empty_draw_size = 0.25
@@ -1161,78 +1576,73 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 					new_ob.empty_display_size = 0.25
 				dupedObj.append(new_ob)
 			else:
-				# TODO: Change to adding a single vertex, dupliverts
 				new_ob = util.obj_copy(base, context)
-				new_ob.location = mathutils.Vector(loc)
+				new_ob.location = loc
 				util.select_set(new_ob, True)  # needed?
 				dupedObj.append(new_ob)
 
-			# obj = new_ob # bpy.context.selected_objects[-1]
-			# do extra transformations now as necessary
-			new_ob.rotation_euler = swap.rotation_euler
-
-			# special case of un-applied,
-			# 90(+/- 0.01)-0-0 rotation on source (y-up conversion)
-			checkcon = swap.rotation_euler[0] >= math.pi / 2 - .01
-			checkcon &= swap.rotation_euler[0] <= math.pi / 2 + .01
-			checkcon &= swap.rotation_euler[1] == 0
-			checkcon &= swap.rotation_euler[2] == 0
-			if checkcon:
-				new_ob.rotation_euler[0] -= math.pi / 2
+			new_ob.rotation_euler = rotation
 			new_ob.scale = swap.scale
 
-			# rotation/translation for walls, assumes last added object still selected
-			x, y, offset, rotValue, z = 0, 0, 0.28, 0.436332, 0.12
-
-			if rot == 1:
-				# torch rotation 1
-				x = -offset
-				new_ob.location += mathutils.Vector((x, y, z))
-				new_ob.rotation_euler[1] += rotValue
-			elif rot == 2:
-				# torch rotation 2
-				y = offset
-				new_ob.location += mathutils.Vector((x, y, z))
-				new_ob.rotation_euler[0] += rotValue
-			elif rot == 3:
-				# torch rotation 3
-				x = offset
-				new_ob.location += mathutils.Vector((x, y, z))
-				new_ob.rotation_euler[1] -= rotValue
-			elif rot == 4:
-				# torch rotation 4
-				y = -offset
-				new_ob.location += mathutils.Vector((x, y, z))
-				new_ob.rotation_euler[0] -= rotValue
-			elif rot == 5:
-				# edge block rotation 1
-				new_ob.rotation_euler[2] += -math.pi / 2
-			elif rot == 6:
-				# edge block rotation 2
-				new_ob.rotation_euler[2] += math.pi
-			elif rot == 7:
-				# edge block rotation 3
-				new_ob.rotation_euler[2] += math.pi / 2
-			elif rot == 8:
-				# edge block rotation 4 (ceiling, not 'keep same')
-				new_ob.rotation_euler[0] += math.pi / 2
-
-			# extra variance to break up regularity, e.g. for tall grass
-			# first, xy and z variance
-			if [True, 1] == swapProps['variance']:
-				x = (random.random() - 0.5) * 0.5
-				y = (random.random() - 0.5) * 0.5
-				z = (random.random() / 2 - 0.5) * 0.6
-				new_ob.location += mathutils.Vector((x, y, z))
-			# now for just xy variance, base stays the same
-			elif [True, 0] == swapProps['variance']:  # for non-z variance
-				# values LOWER than *1.0 make it less variable
-				x = (random.random() - 0.5) * 0.5
-				y = (random.random() - 0.5) * 0.5
-				new_ob.location += mathutils.Vector((x, y, 0))
-
 		return grouped, dupedObj
 
+	def add_point_instances(
+		self,
+		context: Context,
+		swap: bpy.types.Object,
+		swapProps: Dict[str, str],
+		instance_configs: Dict[str, Tuple[VectorType, int]]
+	) -> List[bpy.types.Object]:
+		"""Instance all blocks of a single object from point cloud meshes.
+
+		Creates one point mesh per instanced object or collection, with the
+		per point rotation and scale saved as attributes, which a geometry
+		nodes modifier then instances the block on.
+		"""
+		grouped = swapProps["groupSwap"]
+		points = {}  # asset name: (flat locations, flat rotations)
+		for loc_local, rot in instance_configs.values():
+			self.runcount += 1
+			loc, rotation = self.get_instance_transform(
+				swap, swapProps, loc_local, rot)
+			if grouped:
+				asset_name = util.randomizeMeshSwap(swapProps['importName'], 3)
+			else:
+				asset_name = swapProps["object"].name
+			locs, rots = points.setdefault(asset_name, ([], []))
+			locs.extend(loc)
+			rots.extend(rotation)
+
+		new_objects = []
+		for asset_name, (locs, rots) in points.items():
+			if grouped:
+				asset = util.collections().get(asset_name)
+			else:
+				asset = swapProps["object"]
+			if not asset:
+				env.log(f"Could not find meshswap asset to instance: {asset_name}")
+				continue
+
+			count = len(locs) // 3
+			mesh = bpy.data.meshes.new(f"{swapProps['importName']} instances")
+			mesh.vertices.add(count)
+			mesh.vertices.foreach_set("co", locs)
+			rot_attr = mesh.attributes.new(MESHSWAP_ROT_ATTR, "FLOAT_VECTOR", "POINT")
+			rot_attr.data.foreach_set("vector", rots)
+			scale_attr = mesh.attributes.new(
+				MESHSWAP_SCALE_ATTR, "FLOAT_VECTOR", "POINT")
+			scale_attr.data.foreach_set("vector", list(swap.scale) * count)
+
+			new_ob = bpy.data.objects.new(mesh.name, mesh)
+			util.obj_link_scene(new_ob, context)
+			geo_mod = new_ob.modifiers.new("MCprep instances", "NODES")
+			geo_mod.node_group = get_instancer_node_group(asset)
+			util.select_set(new_ob, True)
+			new_objects.append(new_ob)
+			env.log(f"Instanced {count} of {asset_name} on points")
+
+		return new_objects
+
 	def offsetByHalf(self, obj: bpy.types.Object) -> None:
 		if obj.type != 'MESH':
 			return
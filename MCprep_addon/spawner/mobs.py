@@ -18,7 +18,7 @@
 
 
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional
 import errno
 import os
 import shutil
@@ -59,70 +59,56 @@ def update_rig_path(self, context: Context) -> None:
 	spawn_rigs_categories(self, context)
 
 
+# Icon extensions supported for custom mob icons
+MOB_ICON_EXTENSIONS = [".png", ".jpg", ".jpeg"]
+
+# Number of preview icons to load per timer tick, see load_queued_mob_icons
+MOB_ICON_BATCH = 8
+
+
+def get_icon_index(icon_folder: Path) -> Dict[str, str]:
+	"""Returns map of lowercase icon name (no extension) to its file path."""
+	index = {}
+	try:
+		entries = sorted(os.scandir(icon_folder), key=lambda ent: ent.name)
+	except OSError:
+		return index
+	for entry in entries:
+		if entry.name.startswith(".") or not entry.is_file():
+			continue
+		base, ext = os.path.splitext(entry.name.lower())
+		if ext not in MOB_ICON_EXTENSIONS:
+			continue
+		index.setdefault(base, entry.path)
+	return index
+
+
+def get_blend_rig_names(blend_path: Path) -> List[str]:
+	"""Returns the rig collection names in a blend.
+
+	Names come from the library index, see util.get_blend_contents, so the
+	blend is only re-read if its size or modified time changed.
+	"""
+	try:
+		contents = util.get_blend_contents(blend_path)
+	except OSError:
+		return []
+	return spawn_util.filter_collections(contents)
+
+
 def update_rig_list(context: Context) -> None:
-	"""Update the rig list and subcategory list"""
-
-	def _add_rigs_from_blend(path: Path, blend_name: str, category: str):
-		"""Block for loading blend file groups to get rigs"""
-		with bpy.data.libraries.load(path) as (data_from, data_to):
-
-			extensions = [".png", ".jpg", ".jpeg"]
-			icon_folder = os.path.join(os.path.dirname(path), "icons")
-			run_icons = os.path.isdir(icon_folder)
-			if not env.use_icons or env.preview_collections["mobs"] == "":
-				run_icons = False
-
-			mob_names = spawn_util.filter_collections(data_from)
-
-			for name in mob_names:
-				mob = context.scene.mcprep_props.mob_list_all.add()
-				if spawn_util.INCLUDE_COLL.lower() in name.lower():
-					subname = name.lower().replace(
-						spawn_util.INCLUDE_COLL.lower(), "")
-					subname = subname.strip()
-				else:
-					subname = name
-
-				description = "Spawn one {x} rig".format(x=subname)
-				mob.description = description  # add in non all-list
-				mob.name = subname.title()
-				mob.category = category
-				mob.index = len(context.scene.mcprep_props.mob_list_all)
-				if category:
-					mob.mcmob_type = f"{os.path.join(category, blend_name)}:/:{name}"
-				else:
-					mob.mcmob_type = f"{blend_name}:/:{name}"
-
-				# if available, load the custom icon too
-				if not run_icons:
-					continue
-
-				icons = [
-					f for f in os.listdir(icon_folder)
-					if os.path.isfile(os.path.join(icon_folder, f))
-					and subname.lower() == os.path.splitext(f.lower())[0]
-					and not f.startswith(".")
-					and os.path.splitext(f.lower())[-1] in extensions]
-				if not icons:
-					continue
-				env.preview_collections["mobs"].load(
-					"mob-{}".format(mob.index),
-					os.path.join(icon_folder, icons[0]),
-					'IMAGE')
+	"""Update the rig list and subcategory list
 
+	Only blend files which changed since the last scan are re-read. Icons are
+	matched from one index per icon folder, and loaded in the background.
+	"""
 	rigpath = bpy.path.abspath(context.scene.mcprep_mob_path)
 	context.scene.mcprep_props.mob_list.clear()
 	context.scene.mcprep_props.mob_list_all.clear()
 
-	if env.use_icons and env.preview_collections["mobs"]:
-		print("Removing mobs preview collection")
-		try:
-			bpy.utils.previews.remove(env.preview_collections["mobs"])
-		except:
-			env.log("MCPREP: Failed to remove icon set, mobs")
-
 	if os.path.isdir(rigpath) is False:
 		env.log("Rigpath directory not found")
+		queue_mob_icons({})
 		return
 
 	categories = [
@@ -134,6 +120,7 @@ def update_rig_list(context: Context) -> None:
 		and f.endswith(".blend")
 		and not f.startswith(".")]
 
+	rig_blends = []  # each is: [ blend_path, blend_name, category ]
 	for category in categories:
 		cat_path = os.path.join(rigpath, category)
 		blend_files = [
@@ -145,19 +132,111 @@ def update_rig_list(context: Context) -> None:
 		for blend_name in blend_files:
 			if not spawn_util.check_blend_eligible(blend_name, blend_files):
 				continue  # Not eligible, use allowed blend in list instead.
-			blend_path = os.path.join(cat_path, blend_name)
-			_add_rigs_from_blend(blend_path, blend_name, category)
+			rig_blends.append(
+				[os.path.join(cat_path, blend_name), blend_name, category])
 
 	# Update the list with non-categorized mobs (ie root of target folder)
 	for blend_name in no_category_blends:
 		if not spawn_util.check_blend_eligible(blend_name, no_category_blends):
-			return  # Not eligible, use allowed blend in list instead.
-		blend_path = os.path.join(rigpath, blend_name)
-		_add_rigs_from_blend(blend_path, blend_name, "")
-
+			continue  # Not eligible, use allowed blend in list instead.
+		rig_blends.append([os.path.join(rigpath, blend_name), blend_name, ""])
+
+	icon_indexes = {}
+	icons = {}  # icon id to file path
+
+	for blend_path, blend_name, category in rig_blends:
+		icon_folder = os.path.join(os.path.dirname(blend_path), "icons")
+		if icon_folder not in icon_indexes:
+			icon_indexes[icon_folder] = get_icon_index(icon_folder)
+
+		for name in get_blend_rig_names(blend_path):
+			mob = context.scene.mcprep_props.mob_list_all.add()
+			if spawn_util.INCLUDE_COLL.lower() in name.lower():
+				subname = name.lower().replace(
+					spawn_util.INCLUDE_COLL.lower(), "")
+				subname = subname.strip()
+			else:
+				subname = name
+
+			description = "Spawn one {x} rig".format(x=subname)
+			mob.description = description  # add in non all-list
+			mob.name = subname.title()
+			mob.category = category
+			mob.index = len(context.scene.mcprep_props.mob_list_all)
+			if category:
+				mob.mcmob_type = f"{os.path.join(category, blend_name)}:/:{name}"
+			else:
+				mob.mcmob_type = f"{blend_name}:/:{name}"
+
+			# if available, queue the custom icon too
+			icon = icon_indexes[icon_folder].get(subname.lower())
+			if icon:
+				icons["mob-{}".format(mob.index)] = icon
+
+	queue_mob_icons(icons)
 	update_rig_category(context)
 
 
+def queue_mob_icons(icons: Dict[str, str]) -> None:
+	"""Queue mob preview icons to load, dropping any no longer matching.
+
+	Icons already loaded from the same file are kept as they are.
+	"""
+	env.mob_icon_queue = []
+	if not env.use_icons or env.preview_collections["mobs"] == "":
+		return
+	pcoll = env.preview_collections["mobs"]
+
+	for icon_id in list(pcoll.keys()):
+		if icons.get(icon_id) == env.mob_icon_paths.get(icon_id):
+			continue
+		del pcoll[icon_id]
+		env.mob_icon_paths.pop(icon_id, None)
+
+	env.mob_icon_queue = [
+		(icon_id, path) for icon_id, path in icons.items()
+		if icon_id not in pcoll]
+	if not env.mob_icon_queue:
+		return
+
+	if bpy.app.background or not hasattr(bpy.app, "timers"):
+		# No UI to keep responsive, load right away.
+		while load_queued_mob_icons() is not None:
+			pass
+	elif not bpy.app.timers.is_registered(load_queued_mob_icons):
+		bpy.app.timers.register(
+			load_queued_mob_icons, first_interval=0.0, persistent=False)
+
+
+def load_queued_mob_icons() -> Optional[float]:
+	"""Timer to load a batch of queued mob icons, until the queue is empty."""
+	pcoll = env.preview_collections.get("mobs")
+	if pcoll is None or pcoll == "":
+		env.mob_icon_queue = []
+		return None
+
+	batch = env.mob_icon_queue[:MOB_ICON_BATCH]
+	env.mob_icon_queue = env.mob_icon_queue[MOB_ICON_BATCH:]
+	for icon_id, path in batch:
+		if icon_id in pcoll:
+			continue
+		try:
+			pcoll.load(icon_id, path, 'IMAGE')
+		except Exception as err:
+			env.log(f"Failed to load mob icon {path}: {err}")
+			continue
+		env.mob_icon_paths[icon_id] = path
+
+	if not bpy.app.background and bpy.context.window_manager:
+		for window in bpy.context.window_manager.windows:
+			for area in window.screen.areas:
+				area.tag_redraw()
+
+	if env.mob_icon_queue:
+		return 0.01
+	return None
+
+
 def update_rig_category(context: Context):
 	"""Update the list of mobs for the given category from the master list"""
 
@@ -272,7 +351,7 @@ class MCPREP_OT_mob_spawner(bpy.types.Operator):
 			self.report({'ERROR'}, "Failed to parse mcmob_type, try reloading mobs")
 			return {'CANCELLED'}
 		path = os.path.join(context.scene.mcprep_mob_path, path)
-		env.log("Path is now ", path)
+		env.log("Path is now %s", path)
 
 		try:
 			# must be in object mode, this make similar behavior to other objs
@@ -655,6 +734,7 @@ class MCPREP_OT_install_mob_icon(bpy.types.Operator, ImportHelper):
 		else:
 			env.preview_collections["mobs"].load(icon_id, new_file, 'IMAGE')
 			print("Icon reloaded")
+		env.mob_icon_paths[icon_id] = new_file
 
 		return {'FINISHED'}
 
@@ -713,5 +793,7 @@ def register():
 
 
 def unregister():
+	if hasattr(bpy.app, "timers") and bpy.app.timers.is_registered(load_queued_mob_icons):
+		bpy.app.timers.unregister(load_queued_mob_icons)
 	for cls in reversed(classes):
 		bpy.utils.unregister_class(cls)
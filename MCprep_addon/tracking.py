@@ -889,6 +889,10 @@ def report_error(function):
 		except Exception:
 			err = traceback.format_exc()
 			print(err)  # Always print raw traceback.
+			if VALID_IMPORT and env.log_history:
+				# Local only, log messages may include user paths.
+				print("Recent MCprep log messages:")
+				print("\n".join(env.log_history))
 
 			if updater.json.get("just_updated") is True:
 				print("MCprep was just updated, try restarting blender.")
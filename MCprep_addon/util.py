@@ -16,8 +16,10 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
+from pathlib import Path
 from subprocess import Popen, PIPE
-from typing import List, Optional, Union, Tuple
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Union, Tuple
 import enum
 import json
 import operator
@@ -25,7 +27,9 @@ import os
 import platform
 import random
 import re
+import struct
 import subprocess
+import zlib
 
 import bpy
 from bpy.types import (
@@ -39,6 +43,12 @@ from bpy.types import (
 )
 from mathutils import Vector, Matrix
 
+# Bundled with Blender, only needed by the png helpers below.
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
 from .conf import MCprepError, env
 
 # Commonly used name for an excluded collection in Blender 2.8+
@@ -134,6 +144,7 @@ def materialsFromObj(obj_list: List[bpy.types.Object]) -> List[Material]:
 	return mat_list
 
 
+@env.span("util.bAppendLink")
 def bAppendLink(directory: str, name: str, toLink: bool, active_layer: bool=True) -> bool:
 	"""For multiple version compatibility, this function generalized
 	appending/linking blender post 2.71 changed to new append/link methods
@@ -179,6 +190,7 @@ def bAppendLink(directory: str, name: str, toLink: bool, active_layer: bool=True
 				return False
 
 
+@env.span("util.obj_copy")
 def obj_copy(
 	base: bpy.types.Object,
 	context: Optional[Context] = None,
@@ -322,9 +334,147 @@ def loadTexture(texture: str) -> Image:
 	else:
 		data_img = bpy.data.images.load(texture, check_existing=True)
 		env.log("Loading new texture image", vv_only=True)
+	env.count("images_loaded")
 	return data_img
 
 
+def write_png(path: Path, pixels: "np.ndarray") -> None:
+	"""Write 8 bit RGB(A) float pixels in blender's bottom-up row order to png.
+
+	Only uses zlib which releases the GIL, so can run in worker threads.
+	"""
+	height, width, channels = pixels.shape
+	rows = np.clip(pixels[::-1] * 255.0 + 0.5, 0, 255).astype(np.uint8)
+	raw = np.zeros((height, width * channels + 1), dtype=np.uint8)
+	raw[:, 1:] = rows.reshape(height, -1)  # Filter type 0 per scanline
+
+	def chunk(tag: bytes, data: bytes) -> bytes:
+		crc = zlib.crc32(tag + data) & 0xffffffff
+		return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", crc)
+
+	color_type = 6 if channels == 4 else 2
+	header = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+	with open(path, "wb") as png:
+		png.write(b"\x89PNG\r\n\x1a\n")
+		png.write(chunk(b"IHDR", header))
+		png.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+		png.write(chunk(b"IEND", b""))
+
+
+def read_png(path: Path) -> Optional["np.ndarray"]:
+	"""Read an 8 bit png to float pixels in blender's bottom-up row order.
+
+	Returns a (height, width, 3 or 4) array, or None for interlaced or other
+	bit depths which need to be loaded through blender instead. Only uses
+	zlib and numpy, so can run in worker threads.
+	"""
+	try:
+		with open(path, "rb") as png:
+			data = png.read()
+	except OSError:
+		return None
+	if data[:8] != b"\x89PNG\r\n\x1a\n":
+		return None
+
+	header = None
+	palette = None
+	transparency = None
+	idat = []
+	pos = 8
+	while pos + 8 <= len(data):
+		length, tag = struct.unpack(">I4s", data[pos:pos + 8])
+		chunk = data[pos + 8:pos + 8 + length]
+		pos += length + 12
+		if tag == b"IHDR":
+			header = struct.unpack(">IIBBBBB", chunk)
+		elif tag == b"PLTE":
+			palette = np.frombuffer(chunk, dtype=np.uint8).reshape(-1, 3)
+		elif tag == b"tRNS":
+			transparency = np.frombuffer(chunk, dtype=np.uint8)
+		elif tag == b"IDAT":
+			idat.append(chunk)
+		elif tag == b"IEND":
+			break
+	if header is None:
+		return None
+	width, height, depth, color_type, _, _, interlace = header
+	channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}.get(color_type)
+	if depth != 8 or interlace or channels is None:
+		return None
+	if color_type == 3 and palette is None:
+		return None
+	try:
+		raw = zlib.decompress(b"".join(idat))
+	except zlib.error:
+		return None
+	stride = width * channels
+	if len(raw) < height * (stride + 1):
+		return None
+	lines = np.frombuffer(raw, dtype=np.uint8)[:height * (stride + 1)]
+	lines = lines.reshape(height, stride + 1).astype(np.int32)
+
+	# Undo the per scanline filters, see the png spec.
+	rows = np.empty((height, stride), dtype=np.uint8)
+	prev = np.zeros(stride, dtype=np.int32)
+	for y in range(height):
+		filter_type = lines[y, 0]
+		line = lines[y, 1:]
+		if filter_type == 0:  # None
+			cur = line
+		elif filter_type == 1:  # Sub
+			cur = np.cumsum(line.reshape(width, channels), axis=0).ravel() % 256
+		elif filter_type == 2:  # Up
+			cur = (line + prev) % 256
+		elif filter_type in (3, 4):  # Average, Paeth, depend on prior pixels
+			cur = line.tolist()
+			up = prev.tolist()
+			for x in range(stride):
+				left = cur[x - channels] if x >= channels else 0
+				if filter_type == 3:
+					pred = (left + up[x]) // 2
+				else:
+					up_left = up[x - channels] if x >= channels else 0
+					p = left + up[x] - up_left
+					pa, pb, pc = abs(p - left), abs(p - up[x]), abs(p - up_left)
+					if pa <= pb and pa <= pc:
+						pred = left
+					elif pb <= pc:
+						pred = up[x]
+					else:
+						pred = up_left
+				cur[x] = (cur[x] + pred) & 0xff
+			cur = np.array(cur, dtype=np.int32)
+		else:
+			return None
+		rows[y] = cur
+		prev = cur
+
+	pixels = rows.reshape(height, width, channels)
+	if color_type == 3:
+		alpha = np.full(len(palette), 255, dtype=np.uint8)
+		if transparency is not None:
+			alpha[:len(transparency)] = transparency[:len(palette)]
+		index = np.minimum(pixels[..., 0], len(palette) - 1)
+		pixels = np.concatenate(
+			[palette[index], alpha[index][..., None]], axis=-1)
+	elif color_type == 0:
+		pixels = np.repeat(pixels, 3, axis=-1)
+	elif color_type == 4:
+		pixels = np.concatenate(
+			[np.repeat(pixels[..., :1], 3, axis=-1), pixels[..., 1:]], axis=-1)
+	return pixels[::-1].astype(np.float32) / 255.0
+
+
+def write_json_text(name: str, data: Dict) -> bpy.types.Text:
+	"""Write data as json into a text datablock, replacing any contents."""
+	text = bpy.data.texts.get(name)
+	if text is None:
+		text = bpy.data.texts.new(name)
+	text.clear()
+	text.write(json.dumps(data, indent=2, default=str))
+	return text
+
+
 def get_objects_conext(context: Context) -> List[bpy.types.Object]:
 	"""Returns list of objects, either from view layer if 2.8 or scene if 2.8"""
 	return context.view_layer.objects
@@ -381,7 +531,7 @@ def open_program(executable: str) -> Union[int, str]:
 			env.log("Opened using built in path opener")
 			return 0
 		else:
-			env.log("Did not get finished response: ", str(res))
+			env.log("Did not get finished response: %s", res)
 	except:
 		env.log("failed to open using builtin mehtod")
 		pass
@@ -483,6 +633,82 @@ def load_mcprep_json() -> bool:
 			env.json_data = default
 
 
+# Datablock types stored per blend file in the library index
+LIBRARY_INDEX_TYPES = [
+	"collections", "objects", "materials", "node_groups", "particles"]
+LIBRARY_INDEX_VERSION = 1
+
+
+def load_library_index() -> Dict[str, dict]:
+	"""Load the on-disk index of blend file contents, if not already loaded."""
+	if env.library_index is not None:
+		return env.library_index
+	env.library_index = {}
+	path = env.library_index_path
+	if not os.path.isfile(path):
+		return env.library_index
+	try:
+		with open(path) as data_file:
+			data = json.load(data_file)
+	except Exception as err:
+		env.log(f"Failed to read library index, rebuilding: {err}")
+		return env.library_index
+	if data.get("version") != LIBRARY_INDEX_VERSION:
+		env.log("Library index version changed, rebuilding")
+		return env.library_index
+	env.library_index = data.get("blends", {})
+	return env.library_index
+
+
+def save_library_index() -> None:
+	"""Write the library index back to disk, replacing the prior file."""
+	if env.library_index is None:
+		return
+	path = env.library_index_path
+	tmp_path = f"{path}.tmp"
+	data = {"version": LIBRARY_INDEX_VERSION, "blends": env.library_index}
+	try:
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(tmp_path, 'w') as data_file:
+			json.dump(data, data_file)
+		os.replace(tmp_path, path)
+	except OSError as err:
+		env.log(f"Could not save library index: {err}")
+
+
+@env.span("util.get_blend_contents")
+def get_blend_contents(blendfile: str) -> SimpleNamespace:
+	"""Returns the names of datablocks within a blend file.
+
+	Reads from the persistent library index, keyed by path, size and modified
+	time, so that the blend file is only opened if it changed since it was
+	last indexed.
+
+	Returns:
+		Namespace with a list of names for each of LIBRARY_INDEX_TYPES, which
+		can be used in place of the `from` part of a bpy file reader scope.
+	"""
+	path = os.path.abspath(blendfile)
+	stat = os.stat(path)
+	index = load_library_index()
+
+	entry = index.get(path)
+	if not entry or entry.get("size") != stat.st_size or entry.get("mtime") != stat.st_mtime:
+		env.log(f"Indexing library contents of {path}", vv_only=True)
+		entry = {"size": stat.st_size, "mtime": stat.st_mtime}
+		with bpy.data.libraries.load(path) as (data_from, _):
+			for attr in LIBRARY_INDEX_TYPES:
+				if attr == "collections" and hasattr(data_from, "groups"):
+					entry[attr] = list(data_from.groups)  # blender 2.7
+				else:
+					entry[attr] = list(getattr(data_from, attr, []))
+		index[path] = entry
+		save_library_index()
+
+	return SimpleNamespace(**{
+		attr: list(entry.get(attr, [])) for attr in LIBRARY_INDEX_TYPES})
+
+
 def ui_scale() -> float:
 	"""Returns scale of UI, for width drawing. Compatible down to blender 2.72"""
 	prefs = get_preferences()
@@ -22,6 +22,7 @@ import addon_utils
 
 from . import util
 from . import tracking
+from .conf import env
 
 
 # -----------------------------------------------------------------------------
@@ -227,6 +228,54 @@ class MCPREP_OT_prep_material_legacy(bpy.types.Operator):
 		return {'FINISHED'}
 
 
+class MCPREP_OT_toggle_instrumentation(bpy.types.Operator):
+	"""Start or stop timing MCprep functions and operators, stopping writes
+	the collected report"""
+	bl_idname = "mcprep.toggle_instrumentation"
+	bl_label = "Toggle MCprep profiling"
+
+	def execute(self, context):
+		if env.spans is None:
+			env.start_instrumentation()
+			self.report({"INFO"}, "Started MCprep profiling")
+			return {'FINISHED'}
+		bpy.ops.mcprep.instrumentation_report()
+		env.stop_instrumentation()
+		return {'FINISHED'}
+
+
+class MCPREP_OT_instrumentation_report(bpy.types.Operator):
+	"""Write call counts and cumulative time of profiled MCprep functions"""
+	bl_idname = "mcprep.instrumentation_report"
+	bl_label = "MCprep profiling report"
+
+	text_name: bpy.props.StringProperty(
+		name="Text name",
+		default="mcprep_instrumentation_report.json")
+	reset: bpy.props.BoolProperty(
+		name="Reset",
+		description="Clear the collected results after reporting",
+		default=False)
+
+	def execute(self, context):
+		if env.spans is None:
+			self.report({"ERROR"}, "MCprep profiling is not running")
+			return {'CANCELLED'}
+		report = env.instrumentation_report()
+		for name, span in report["spans"].items():
+			print(
+				f"{name}: {span['calls']} calls, {span['seconds']:.4f}s "
+				f"({span['mean_ms']:.3f}ms each)")
+		for name, value in report["counters"].items():
+			print(f"{name}: {value}")
+		text = util.write_json_text(self.text_name, report)
+		if self.reset:
+			env.start_instrumentation()
+		self.report(
+			{"INFO"}, f"Profiled {len(report['spans'])} spans, see {text.name}")
+		return {'FINISHED'}
+
+
 # -----------------------------------------------------------------------------
 # Registration
 # -----------------------------------------------------------------------------
@@ -238,7 +287,9 @@ classes = (
 	MCPREP_OT_open_folder,
 	MCPREP_OT_open_help,
 	MCPREP_OT_open_file,
-	MCPREP_OT_prep_material_legacy
+	MCPREP_OT_prep_material_legacy,
+	MCPREP_OT_toggle_instrumentation,
+	MCPREP_OT_instrumentation_report,
 )
 
 
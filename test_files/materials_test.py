@@ -18,17 +18,24 @@
 
 from typing import Tuple
 import datetime
+import functools
+import http.server
+import json
 import os
 import shutil
 import tempfile
+import threading
 import unittest
+from unittest import mock
 
 import bpy
 from bpy.types import Material
 
 from MCprep_addon import util
+from MCprep_addon.conf import env
 from MCprep_addon.materials import generate
 from MCprep_addon.materials import sequences
+from MCprep_addon.materials import skin
 from MCprep_addon.materials.generate import find_additional_passes
 from MCprep_addon.materials.generate import get_mc_canonical_name
 from MCprep_addon.materials.uv_tools import get_uv_bounds_per_material
@@ -149,6 +156,33 @@ class MaterialsTest(unittest.TestCase):
         self.assertEqual(res, {'FINISHED'}, "Did not return finished")
         return new_mat
 
+    def test_prep_materials_dry_run(self):
+        """Dry runs leave materials as is and write a timing report."""
+        bpy.ops.mesh.primitive_plane_add()
+        obj = bpy.context.object
+        new_mat, _ = self._create_canon_mat("sugar_cane")
+        obj.active_material = new_mat
+        node_count = len(new_mat.node_tree.nodes)
+
+        res = bpy.ops.mcprep.prep_materials(
+            animateTextures=False,
+            packFormat="simple",
+            autoFindMissingTextures=False,
+            improveUiSettings=False,
+            dryRun=True)
+        self.assertEqual(res, {'FINISHED'})
+        self.assertEqual(len(new_mat.node_tree.nodes), node_count)
+        self.assertIsNone(env.counters)
+
+        text = bpy.data.texts["mcprep_prep_materials_report.json"]
+        report = json.loads(text.as_string())
+        self.assertTrue(report["dry_run"])
+        self.assertEqual(set(report["timings"]), {"analyze", "apply"})
+        entry = report["materials"][new_mat.name]
+        self.assertTrue(entry["changes"]["prepped"])
+        self.assertEqual(entry["changes"]["generator"], "matgen_cycles_simple")
+        self.assertEqual(entry["images_loaded"], 0)
+
     def _get_imgnode_stats(self, mat: Material) -> Tuple[int, int]:
         count_images = 0
         missing_images = 0
@@ -326,6 +360,115 @@ class MaterialsTest(unittest.TestCase):
                 res,
                 "Failed to get success resposne from generate img sequence")
 
+    def test_export_sequence_workers(self):
+        """Frames encoded in worker threads match those saved by blender."""
+        tiled_img = os.path.join(
+            os.path.dirname(__file__),
+            "test_resource_pack", "textures", "campfire_fire.png")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            serial_dir = os.path.join(tmp_dir, "serial")
+            worker_dir = os.path.join(tmp_dir, "workers")
+            first_serial = sequences.export_image_to_sequence(
+                tiled_img, [], serial_dir)
+            first_worker = sequences.export_image_to_sequence(
+                tiled_img, [], worker_dir, workers=2)
+            self.assertEqual(
+                os.path.basename(first_serial), os.path.basename(first_worker))
+            frames = sorted(os.listdir(serial_dir))
+            self.assertEqual(frames, sorted(os.listdir(worker_dir)))
+            self.assertGreater(len(frames), 1)
+
+            for frame in frames:
+                img_a = bpy.data.images.load(os.path.join(serial_dir, frame))
+                img_b = bpy.data.images.load(os.path.join(worker_dir, frame))
+                self.assertEqual(tuple(img_a.size), tuple(img_b.size))
+                self.assertEqual(list(img_a.pixels), list(img_b.pixels), frame)
+                bpy.data.images.remove(img_a)
+                bpy.data.images.remove(img_b)
+
+    def test_animate_materials_batch(self):
+        """Batch animating exports shared sequences once for all materials."""
+        tiled_img = os.path.join(
+            os.path.dirname(__file__),
+            "test_resource_pack", "textures", "campfire_fire.png")
+        result_dir = os.path.splitext(tiled_img)[0]
+        shutil.rmtree(result_dir, ignore_errors=True)
+
+        bpy.ops.mesh.primitive_plane_add()
+        res = bpy.ops.mcprep.load_material(
+            filepath=tiled_img, animateTextures=False)
+        self.assertEqual(res, {'FINISHED'})
+        mat_a = bpy.context.object.active_material
+        mat_b = mat_a.copy()
+
+        try:
+            with mock.patch.object(
+                    sequences, "generate_material_sequence",
+                    wraps=sequences.generate_material_sequence) as gen:
+                results, timings = sequences.animate_materials(
+                    [mat_a, mat_b], "CYCLES", "original", clear_cache=True)
+                self.assertEqual(gen.call_count, 1)
+        finally:
+            shutil.rmtree(result_dir, ignore_errors=True)
+
+        self.assertEqual(
+            sorted(timings), ["apply", "export", "resolve", "scan"])
+        for mat in [mat_a, mat_b]:
+            affectable, affected, err = results[mat.name]
+            self.assertIsNone(err)
+            self.assertTrue(affected, f"{mat.name} not animated")
+            self.assertTrue(self._has_animated_tex_node(mat))
+
+    def test_sequence_frame_cache(self):
+        """Exported frames are reused from the frame cache and validated."""
+        tiled_img = os.path.join(
+            os.path.dirname(__file__),
+            "test_resource_pack", "textures", "campfire_fire.png")
+        result_dir = os.path.splitext(tiled_img)[0]
+        shutil.rmtree(result_dir, ignore_errors=True)
+
+        addon_prefs = util.get_user_preferences(bpy.context)
+        prior_path = addon_prefs.frame_cache_path
+        with tempfile.TemporaryDirectory() as cache_dir:
+            addon_prefs.frame_cache_path = cache_dir
+            try:
+                res, err = sequences.generate_material_sequence(
+                    tiled_img, tiled_img, None, "original", clear_cache=True)
+                self.assertIsNone(err)
+                key = generate.get_file_hash(tiled_img)
+                manifest = sequences.read_frame_manifest(
+                    os.path.join(cache_dir, key))
+                self.assertIsNotNone(manifest, "Frames not added to cache")
+                frames = sorted(os.listdir(result_dir))
+                self.assertEqual(manifest["frames"], len(frames))
+
+                # Without any local frames, restore from the cache.
+                shutil.rmtree(result_dir)
+                with mock.patch.object(
+                        sequences, "export_image_to_sequence") as export:
+                    res, err = sequences.generate_material_sequence(
+                        tiled_img, tiled_img, None, "original", False)
+                    export.assert_not_called()
+                self.assertEqual(frames, sorted(os.listdir(result_dir)))
+
+                # A partial local export gets fully restored again.
+                os.remove(os.path.join(result_dir, frames[-1]))
+                res, err = sequences.generate_material_sequence(
+                    tiled_img, tiled_img, None, "original", False)
+                self.assertEqual(frames, sorted(os.listdir(result_dir)))
+
+                # Entries with an incomplete manifest are pruned.
+                entry_dir = os.path.join(cache_dir, key)
+                manifest = sequences.read_frame_manifest(entry_dir)
+                del manifest["bytes"]
+                sequences.write_frame_manifest(entry_dir, manifest)
+                sequences.prune_frame_cache(cache_dir, 1024 ** 3)
+                self.assertFalse(os.path.isdir(entry_dir))
+            finally:
+                addon_prefs.frame_cache_path = prior_path
+                shutil.rmtree(result_dir, ignore_errors=True)
+
     def test_detect_desaturated_images(self):
         """Checks the desaturate images are recognized as such."""
         should_saturate = {
@@ -358,8 +501,18 @@ class MaterialsTest(unittest.TestCase):
                     self.assertFalse(
                         res, f"Should not detect {tex} as grayscale")
 
-        # TODO: test that it is caching as expected.. by setting a false
-        # value for cache flag and seeing it's returning the property value
+        # Cached value is returned as long as the file is unchanged.
+        img_file = self._get_canon_texture_image("grass", test_pack=False)
+        img = bpy.data.images.load(img_file, check_existing=False)
+        self.assertTrue(generate.is_image_grayscale(img))
+        self.assertIn("grayscale_stamp", img)
+        self.assertIn("grayscale_hash", img)
+        img["grayscale"] = False
+        with mock.patch.object(generate, "get_image_hash") as image_hash:
+            self.assertFalse(generate.is_image_grayscale(img))
+            image_hash.assert_not_called()
+        img["grayscale_stamp"] = "outdated"
+        self.assertTrue(generate.is_image_grayscale(img))
 
     def test_matprep_cycles(self):
         """Tests the generation function used within an operator."""
@@ -380,6 +533,81 @@ class MaterialsTest(unittest.TestCase):
         self.assertEqual(1, len(bpy.data.materials))
         self.assertEqual(1, len(bpy.data.images), list(bpy.data.images))
 
+    def test_matprep_cycles_node_group(self):
+        """Materials prepped with node groups share one group per format."""
+        canon = "grass_block_top"
+        for pack_format in generate.PackFormat:
+            with self.subTest(pack_format):
+                mats = []
+                for _ in range(2):
+                    mat, img_node = self._create_canon_mat(canon, test_pack=False)
+                    options = generate.PrepOptions(
+                        passes={
+                            "diffuse": img_node.image,
+                            "normal": None,
+                            "specular": None},
+                        use_reflections=True,
+                        use_principled=True,
+                        only_solid=False,
+                        pack_format=pack_format,
+                        use_emission_nodes=False,
+                        use_emission=False)
+                    res = generate.matprep_cycles(
+                        mat, options, use_node_group=True)
+                    self.assertEqual(res, 0)
+                    mats.append(mat)
+
+                groups = [
+                    nd.node_tree for mat in mats
+                    for nd in mat.node_tree.nodes if nd.type == "GROUP"]
+                self.assertEqual(len(groups), 2)
+                self.assertEqual(groups[0], groups[1])
+                self.assertEqual(
+                    groups[0].name,
+                    generate.get_shader_group_name(
+                        generate.get_shader_group_key(options)))
+                self.assertEqual(
+                    generate.get_node_for_pass(mats[1], "diffuse").image,
+                    img_node.image)
+
+                # Renamed groups are still found by their config.
+                groups[0].name = "renamed"
+                key = generate.get_shader_group_key(options)
+                self.assertEqual(generate.get_shader_node_group(key), groups[0])
+
+                # Any other config gets its own group.
+                solid_key = (key[0], key[1], key[2], True)
+                self.assertNotEqual(
+                    generate.get_shader_node_group(solid_key), groups[0])
+
+    def test_convert_skin_layout(self):
+        """Legacy skins convert the same on disk as through blender."""
+        img = bpy.data.images.new("legacy_skin", 64, 32, alpha=True)
+        img.pixels = [(i % 255) / 255 for i in range(len(img.pixels))]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = []
+            for name in ["file_skin.png", "image_skin.png"]:
+                img.filepath_raw = os.path.join(tmp_dir, name)
+                img.file_format = "PNG"
+                img.save()
+                paths.append(img.filepath_raw)
+            bpy.data.images.remove(img)
+
+            converted = skin.convert_skin_files(paths[:1], workers=2)
+            self.assertEqual(converted, paths[:1])
+            self.assertTrue(skin.convert_skin_image(paths[1]))
+            # Already converted skins are left as is.
+            self.assertEqual(skin.convert_skin_files(paths), [])
+
+            results = []
+            for path in paths:
+                res = bpy.data.images.load(path)
+                self.assertEqual(list(res.size), [64, 64])
+                results.append(list(res.pixels))
+                bpy.data.images.remove(res)
+            for file_px, image_px in zip(*results):
+                self.assertAlmostEqual(file_px, image_px, places=2)
+
     def test_skin_swap_local(self):
         bpy.ops.mcprep.reload_skins()
         skin_ind = bpy.context.scene.mcprep_skins_list_index
@@ -497,6 +725,54 @@ class MaterialsTest(unittest.TestCase):
                 self.assertTrue(os.path.isfile(_user_file),
                                 f"{_user} file should have downloaded")
 
+        # All skins are local now, so every user is skipped without errors.
+        res = bpy.ops.mcprep.download_username_list(
+            username_list=','.join(usernames),
+            skip_redownload=True,
+            convert_layout=True)
+        self.assertEqual(res, {'FINISHED'})
+
+    def test_fetch_skin_conditional(self):
+        """Ensure unchanged skins are not downloaded again."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src_dir = os.path.join(tmp_dir, "server")
+            os.mkdir(src_dir)
+            with open(os.path.join(src_dir, "steve"), 'wb') as skin_file:
+                skin_file.write(b"skin")
+
+            class QuietHandler(http.server.SimpleHTTPRequestHandler):
+                def log_message(self, *args):
+                    pass
+
+            handler = functools.partial(QuietHandler, directory=src_dir)
+            server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                url = f"http://127.0.0.1:{server.server_port}/"
+                saveloc = os.path.join(tmp_dir, "steve.png")
+
+                status, meta = skin.fetch_skin(url + "steve", saveloc)
+                self.assertEqual(status, "downloaded")
+                self.assertTrue(os.path.isfile(saveloc))
+                self.assertIsNotNone(meta["last_modified"])
+
+                status, meta2 = skin.fetch_skin(url + "steve", saveloc, meta)
+                self.assertEqual(status, "unchanged")
+                self.assertEqual(meta, meta2)
+
+                # Missing local file means the cache entry can't be used.
+                os.remove(saveloc)
+                status, _ = skin.fetch_skin(url + "steve", saveloc, meta)
+                self.assertEqual(status, "downloaded")
+
+                status, _ = skin.fetch_skin(
+                    url + "alex", os.path.join(tmp_dir, "alex.png"))
+                self.assertEqual(status, "missing")
+            finally:
+                server.shutdown()
+                server.server_close()
+
     def test_spawn_with_skin(self):
         bpy.ops.mcprep.reload_mobs()
         bpy.ops.mcprep.reload_skins()
@@ -654,6 +930,80 @@ class MaterialsTest(unittest.TestCase):
                     res, val,
                     f"{key} should map to {res} ({mapped}, not {val}")
 
+    def test_canonical_name_resolver_cache(self):
+        """Ensure canonical lookups are memoized and reset on json reload."""
+        first = get_mc_canonical_name("grass_block_top.001")
+        self.assertIsNotNone(env.canon_resolver, "Resolver not built")
+        self.assertIn("grass_block_top.001", env.canon_resolver._cache)
+        self.assertEqual(first, get_mc_canonical_name("grass_block_top.001"))
+
+        util.load_mcprep_json()
+        self.assertIsNone(
+            env.canon_resolver, "Resolver should reset when json reloads")
+        self.assertEqual(first, get_mc_canonical_name("grass_block_top.001"))
+
+    def test_find_from_texturepack_index(self):
+        """Ensure indexed pack lookups keep the subfolder search priority."""
+        tmp_dir = tempfile.mkdtemp()
+        textures = os.path.join(tmp_dir, "assets", "minecraft", "textures")
+        files = [
+            "stone.jpeg",
+            os.path.join("block", "stone.png"),
+            os.path.join("item", "stick.png"),
+            os.path.join("entity", "chest", "normal.png"),
+            os.path.join("Block", "Mossy_Stone.PNG"),
+            os.path.join("item", "Torch.png"),
+            os.path.join("block", "torch.png"),
+        ]
+        for fname in files:
+            path = os.path.join(textures, fname)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a'):
+                os.utime(path)
+
+        try:
+            cases = {
+                "stone": "stone.jpeg",
+                "stick": os.path.join("item", "stick.png"),
+                "entity/chest/normal": os.path.join(
+                    "entity", "chest", "normal.png"),
+                "chest/normal": os.path.join("entity", "chest", "normal.png"),
+                # Mixed case names resolve, as they did on Windows and macOS.
+                "mossy_stone": os.path.join("Block", "Mossy_Stone.PNG"),
+                "block/MOSSY_stone": os.path.join("Block", "Mossy_Stone.PNG"),
+                # Exact case matches come before the case insensitive ones.
+                "Torch": os.path.join("item", "Torch.png"),
+                "torch": os.path.join("block", "torch.png"),
+                "not_a_block": None,
+            }
+            for blockname, expected in cases.items():
+                with self.subTest(blockname):
+                    res = generate.find_from_texturepack(blockname, tmp_dir)
+                    if expected is None:
+                        self.assertIsNone(res)
+                    else:
+                        self.assertEqual(
+                            res, os.path.join(textures, expected))
+
+            # Newly added files are picked up once the index is rechecked.
+            index = generate.get_texturepack_index(tmp_dir)
+            index.recheck_interval = 0
+            new_file = os.path.join(textures, "block", "dirt.png")
+            with open(new_file, 'a'):
+                os.utime(new_file)
+            os.utime(os.path.dirname(new_file), (0, 0))
+            self.assertEqual(
+                generate.find_from_texturepack("dirt", tmp_dir), new_file)
+
+            # Folders without /textures are checked by path, not indexed.
+            block_dir = os.path.join(textures, "block")
+            self.assertIsNone(generate.get_texturepack_index(textures))
+            self.assertEqual(
+                generate.find_from_texturepack("stone", block_dir),
+                os.path.join(block_dir, "stone.png"))
+        finally:
+            shutil.rmtree(tmp_dir)
+
     def detect_extra_passes(self):
         """Ensure only the correct pbr file matches are found for input file"""
 
@@ -727,6 +1077,69 @@ class MaterialsTest(unittest.TestCase):
         cleanup()
         self.assertEqual(res, {}, "Fake file should not have any return")
 
+    def test_find_additional_passes_cache(self):
+        """Pass lookups are cached per folder until the folder changes."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            diffuse = os.path.join(tmp_dir, "stone.png")
+            normal = os.path.join(tmp_dir, "stone_n.png")
+            with open(diffuse, 'a'):
+                pass
+
+            res = find_additional_passes(diffuse)
+            self.assertEqual(res, {"diffuse": diffuse})
+            self.assertIn(tmp_dir, env.pass_index_cache)
+
+            with open(normal, 'a'):
+                pass
+            # Ensure the folder mtime differs even on coarse filesystems.
+            mtime = os.stat(tmp_dir).st_mtime + 10
+            os.utime(tmp_dir, (mtime, mtime))
+            res = find_additional_passes(diffuse)
+            self.assertEqual(res, {"diffuse": diffuse, "normal": normal})
+        env.pass_index_cache.pop(tmp_dir, None)
+
+    def test_analyze_materials(self):
+        """Pre-analysis finds the same files with or without threads."""
+        mat_ok, _ = self._create_canon_mat("sugar_cane")
+        mat_missing, node = self._create_canon_mat("stone")
+        node.image.filepath = "//not/a/real/stone.png"
+        node.image.reload()
+        mats = [mat_ok, mat_missing]
+
+        serial, timings = generate.analyze_materials(
+            mats, use_extra_maps=True, find_missing=True, workers=0)
+        threaded, _ = generate.analyze_materials(
+            mats, use_extra_maps=True, find_missing=True, workers=2)
+        self.assertEqual(serial, threaded)
+        self.assertEqual(list(timings), ["gather", "scan", "resolve"])
+        self.assertEqual(serial[mat_ok.name]["missing"], {})
+        self.assertIn("diffuse", serial[mat_missing.name]["missing"])
+
+        passes = generate.apply_material_analysis(
+            mat_missing, serial[mat_missing.name])
+        self.assertEqual(passes["diffuse"], node.image)
+        self.assertEqual(
+            node.image.filepath, serial[mat_missing.name]["missing"]["diffuse"])
+        self.assertTrue(mat_missing.get("texture_swapped"))
+
+    def test_analyze_materials_hashing(self):
+        """Only desaturated blocks without a saved result get hashed."""
+        mat_plain, _ = self._create_canon_mat("sugar_cane")
+        mat_gray, node = self._create_canon_mat("grass")
+        mats = [mat_plain, mat_gray]
+        gray_path = bpy.path.abspath(node.image.filepath)
+
+        with mock.patch.object(generate, "get_file_hash") as file_hash:
+            generate.analyze_materials(
+                mats, use_extra_maps=False, find_missing=False)
+            file_hash.assert_called_once_with(gray_path)
+
+        generate.is_image_grayscale(node.image)
+        with mock.patch.object(generate, "get_file_hash") as file_hash:
+            generate.analyze_materials(
+                mats, use_extra_maps=False, find_missing=False)
+            file_hash.assert_not_called()
+
     def test_replace_missing_images_fixed(self):
         """Find missing images from selected materials, cycles.
 
@@ -918,6 +1331,38 @@ class MaterialsTest(unittest.TestCase):
                 prepMaterials=True)
             self.assertTrue(res, {"FINISHED"})
 
+        # A dry run leaves the scene's texture pack as is.
+        with self.subTest("dry_run"):
+            pre_path = bpy.context.scene.mcprep_texturepack_path
+            res = bpy.ops.mcprep.swap_texture_pack(
+                filepath=addon_prefs.custom_texturepack_path,
+                prepMaterials=True,
+                dryRun=True)
+            self.assertEqual(res, {"FINISHED"})
+            self.assertEqual(
+                bpy.context.scene.mcprep_texturepack_path, pre_path)
+
+        # The chained prep dry run looks up passes in the pending pack.
+        with self.subTest("dry_run_pending_pack"):
+            test_pack = bpy.context.scene.mcprep_texturepack_path
+            bpy.context.scene.mcprep_texturepack_path = (
+                addon_prefs.custom_texturepack_path)
+            default_mat, _ = self._create_canon_mat("diamond_ore")
+            obj.active_material = default_mat
+            res = bpy.ops.mcprep.swap_texture_pack(
+                filepath=test_pack,
+                prepMaterials=True,
+                useExtraMaps=True,
+                packFormat="specular",
+                dryRun=True)
+            self.assertEqual(res, {"FINISHED"})
+            text = bpy.data.texts["mcprep_prep_materials_report.json"]
+            report = json.loads(text.as_string())
+            load = report["materials"][default_mat.name]["changes"]["load"]
+            self.assertIn("normal", load)
+            self.assertTrue(
+                load["normal"].startswith(bpy.path.abspath(test_pack)))
+
 
 if __name__ == '__main__':
     unittest.main(exit=False)
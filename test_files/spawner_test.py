@@ -16,13 +16,20 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
+import json
 import os
+import tempfile
 import unittest
+from unittest import mock
 
 import bpy
 from mathutils import Vector
 
 from MCprep_addon import util
+from MCprep_addon.conf import env
+from MCprep_addon.spawner import mcmodel
+from MCprep_addon.spawner import meshswap
+from MCprep_addon.spawner import mobs
 
 
 class BaseSpawnerTest(unittest.TestCase):
@@ -81,6 +88,22 @@ class MobSpawnerTest(BaseSpawnerTest):
                 prep_materials=False)
             self.assertEqual(res, {'FINISHED'})
 
+    def test_mob_reload_incremental(self):
+        """Reloading rigs reuses the prior scan for unchanged blends"""
+        res = bpy.ops.mcprep.reload_mobs()
+        self.assertEqual(res, {'FINISHED'})
+        scn_props = bpy.context.scene.mcprep_props
+        first = [mob.mcmob_type for mob in scn_props.mob_list_all]
+        self.assertIn(self.fast_mcmob_type, first)
+
+        # Unchanged blends are read from the library index, not re-indexed.
+        with mock.patch.object(util, "save_library_index") as save_index:
+            mobs.update_rig_list(bpy.context)
+            save_index.assert_not_called()
+        second = [mob.mcmob_type for mob in scn_props.mob_list_all]
+        self.assertEqual(first, second)
+        self.assertEqual(env.mob_icon_queue, [])
+
     def test_bogus_mob_spawn(self):
         """Spawn mobs, reload mobs, etc"""
         res = bpy.ops.mcprep.reload_mobs()
@@ -325,6 +348,171 @@ class ModelSpawnerTest(BaseSpawnerTest):
         self.assertTrue(model.active_material, "No material on model")
 
 
+    def test_model_spawner_reuse(self):
+        """Test repeat model spawns share their mesh and materials"""
+        scn_props = bpy.context.scene.mcprep_props
+        bpy.ops.mcprep.reload_models()
+        filepath = scn_props.model_list[scn_props.model_list_index].filepath
+
+        res = bpy.ops.mcprep.spawn_model(filepath=filepath)
+        self.assertEqual(res, {'FINISHED'})
+        first = bpy.context.active_object
+        mat_count = len(bpy.data.materials)
+
+        res = bpy.ops.mcprep.spawn_model(filepath=filepath)
+        self.assertEqual(res, {'FINISHED'})
+        second = bpy.context.active_object
+        self.assertNotEqual(first, second)
+        self.assertEqual(first.data, second.data, "Mesh not reused")
+        self.assertEqual(len(bpy.data.materials), mat_count)
+
+        # Removed meshes are rebuilt, with materials still shared.
+        mesh = first.data
+        bpy.data.objects.remove(first)
+        bpy.data.objects.remove(second)
+        bpy.data.meshes.remove(mesh)
+        mesh_count = len(bpy.data.meshes)
+        res = bpy.ops.mcprep.spawn_model(filepath=filepath)
+        self.assertEqual(res, {'FINISHED'})
+        third = bpy.context.active_object
+        self.assertEqual(len(bpy.data.meshes), mesh_count + 1)
+        self.assertEqual(len(bpy.data.materials), mat_count)
+
+        # Edited meshes are not reused.
+        third.data.vertices[0].co.z += 1
+        res = bpy.ops.mcprep.spawn_model(filepath=filepath)
+        self.assertEqual(res, {'FINISHED'})
+        self.assertNotEqual(bpy.context.active_object.data, third.data)
+        self.assertEqual(len(bpy.data.meshes), mesh_count + 2)
+
+        res = bpy.ops.mcprep.spawn_model(filepath=filepath, reuse_data=False)
+        self.assertEqual(res, {'FINISHED'})
+        self.assertEqual(len(bpy.data.meshes), mesh_count + 3)
+        self.assertGreater(len(bpy.data.materials), mat_count)
+
+    def test_read_model_cache(self):
+        """Test parent models are read once and changes are picked up"""
+        with tempfile.TemporaryDirectory() as pack:
+            models = os.path.join(pack, "assets", "minecraft", "models", "block")
+            os.makedirs(models)
+
+            def write_model(name, data):
+                with open(os.path.join(models, f"{name}.json"), 'w') as fd:
+                    json.dump(data, fd)
+
+            write_model("cube", {
+                "elements": [{"from": [0, 0, 0], "to": [16, 16, 16]}],
+                "textures": {"particle": "#all", "all": "block/dirt"}})
+            write_model("stone", {
+                "parent": "block/cube", "textures": {"all": "block/stone"}})
+            write_model("granite", {
+                "parent": "block/cube", "textures": {"all": "block/granite"}})
+
+            env.model_cache = {}
+            env.start_instrumentation()
+            try:
+                stone = mcmodel.resolve_model(
+                    os.path.join(models, "stone.json"), pack, pack)
+                mcmodel.resolve_model(
+                    os.path.join(models, "granite.json"), pack, pack)
+                mcmodel.resolve_model(
+                    os.path.join(models, "stone.json"), pack, pack)
+                counters = dict(env.counters)
+            finally:
+                env.stop_instrumentation()
+
+            # cube is shared by both children, and stone read only once.
+            self.assertEqual(counters["cache_misses"], 3)
+            self.assertEqual(counters["cache_hits"], 2)
+            self.assertEqual(stone["textures"]["all"], "block/stone")
+            self.assertEqual(stone["textures"]["particle"], "#all")
+            self.assertEqual(len(stone["elements"]), 1)
+
+            # Editing the parent invalidates the children.
+            write_model("cube", {
+                "elements": [
+                    {"from": [0, 0, 0], "to": [16, 8, 16]},
+                    {"from": [0, 8, 0], "to": [8, 16, 8]}],
+                "textures": {"all": "block/dirt"}})
+            cube_path = os.path.join(models, "cube.json")
+            stat = os.stat(cube_path)
+            os.utime(cube_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            stone = mcmodel.resolve_model(
+                os.path.join(models, "stone.json"), pack, pack)
+            self.assertEqual(len(stone["elements"]), 2)
+            self.assertNotIn("particle", stone["textures"])
+
+            # A parent added later to a higher priority pack is picked up.
+            with tempfile.TemporaryDirectory() as override:
+                stone = mcmodel.resolve_model(
+                    os.path.join(models, "stone.json"), override, override)
+                self.assertEqual(len(stone["elements"]), 2)
+                override_models = os.path.join(
+                    override, "assets", "minecraft", "models", "block")
+                os.makedirs(override_models)
+                with open(os.path.join(override_models, "cube.json"), 'w') as fd:
+                    json.dump({
+                        "elements": [{"from": [0, 0, 0], "to": [16, 16, 16]}],
+                        "textures": {"all": "block/dirt"}}, fd)
+                stone = mcmodel.resolve_model(
+                    os.path.join(models, "stone.json"), override, override)
+                self.assertEqual(len(stone["elements"]), 1)
+
+
+    def test_element_verts(self):
+        """Test element corners match rotating each corner on its own"""
+        for axis in ("x", "y", "z"):
+            for angle in (0, 22.5, -45, 90):
+                with self.subTest(axis=axis, angle=angle):
+                    elm_from = [1, 2, 3]
+                    elm_to = [15, 9, 12]
+                    origin = [4, 8, 6]
+                    verts = mcmodel.element_verts(
+                        elm_from, elm_to, origin, axis, angle)
+                    for vert, corner in zip(verts, mcmodel.ELEMENT_CORNERS):
+                        pos = [
+                            (elm_from, elm_to)[pick][i]
+                            for i, pick in enumerate(corner)]
+                        expected = mcmodel.rotate_around(
+                            angle, pos, origin, axis)
+                        for value, exp in zip(vert, expected):
+                            self.assertAlmostEqual(value, exp, places=5)
+
+    def test_add_model_geometry(self):
+        """Test model meshes are built from element arrays"""
+        all_faces = {
+            face: {"texture": "#all", "uv": [0, 0, 16, 16]}
+            for face in mcmodel.ELEMENT_FACE_DIRS}
+        elements = [
+            {"from": [0, 0, 0], "to": [16, 16, 16], "faces": all_faces},
+            {
+                "from": [0, 16, 0], "to": [16, 16, 16],
+                "rotation": {"angle": 45, "axis": "y", "origin": [8, 8, 8]},
+                "faces": {"up": {"texture": "#top", "rotation": 90}}}]
+
+        mesh = bpy.data.meshes.new("model_geometry")
+        mcmodel.add_model_geometry(
+            mesh, elements, ["#all", "#top"], "model_geometry")
+
+        # The unrotated cube's top verts don't overlap the rotated plane,
+        # and unused corners of the plane element are not added.
+        self.assertEqual(len(mesh.vertices), 12)
+        self.assertEqual(len(mesh.polygons), 7)
+        self.assertEqual(
+            [poly.material_index for poly in mesh.polygons], [0] * 6 + [1])
+        self.assertEqual(len(mesh.uv_layers[0].data), 28)
+
+        # Rotated uvs start from the next corner.
+        top = mesh.polygons[6]
+        uvs = [tuple(mesh.uv_layers[0].data[i].uv) for i in top.loop_indices]
+        self.assertEqual(uvs, [(0, 1), (0, 0), (1, 0), (1, 1)])
+
+        # Rotated element corners stay within the block's bounds.
+        for vert in mesh.vertices:
+            self.assertLessEqual(abs(vert.co.x), 0.5 * 2 ** 0.5 + 1e-5)
+        bpy.data.meshes.remove(mesh)
+
+
 class EntitySpawnerTest(BaseSpawnerTest):
     """EntitySpawning-related tests."""
 
@@ -431,6 +619,52 @@ class MeshswapTest(BaseSpawnerTest):
                 res = self._meshswap_util(mat_name)
                 self.assertEqual("", res)
 
+    def test_meshswap_world_jmc_instancing(self):
+        if bpy.app.version < (3, 2):
+            self.skipTest("Point instancing requires blender 3.2+")
+        test_subpath = os.path.join("test_data", "jmc2obj_test_1_15_2.obj")
+        self._import_world_with_settings(file=test_subpath)
+
+        obj = None
+        for ob in bpy.data.objects:
+            if ob.active_material and ob.active_material.name == "torch":
+                obj = ob
+                break
+        self.assertIsNotNone(obj, "Failed to find torch object")
+        for ob in bpy.context.scene.objects:
+            ob.select_set(False)
+        obj.select_set(True)
+
+        pre_objs = set(bpy.data.objects)
+        res = bpy.ops.mcprep.meshswap(use_dupliverts=True)
+        self.assertEqual(res, {'FINISHED'})
+        new_objs = set(bpy.data.objects) - pre_objs
+        instancers = [
+            ob for ob in new_objs
+            if any(mod.type == "NODES" for mod in ob.modifiers)]
+        self.assertTrue(instancers, "No point instancer objects added")
+        self.assertLess(
+            len(new_objs), 10, "Should not add one object per block")
+
+    def test_instancer_node_group_reuse(self):
+        """Instancer groups are found by asset, and rebuilt in place"""
+        if bpy.app.version < (3, 2):
+            self.skipTest("Point instancing requires blender 3.2+")
+        asset = bpy.data.objects.new("torch_asset", None)
+        tree = meshswap.get_instancer_node_group(asset)
+        self.assertIs(meshswap.get_instancer_asset(tree), asset)
+
+        tree.name = "renamed"
+        self.assertEqual(meshswap.get_instancer_node_group(asset), tree)
+
+        # A new asset of the same name reuses and updates the same group.
+        bpy.data.objects.remove(asset)
+        asset = bpy.data.objects.new("torch_asset", None)
+        pre_groups = len(bpy.data.node_groups)
+        self.assertEqual(meshswap.get_instancer_node_group(asset), tree)
+        self.assertEqual(len(bpy.data.node_groups), pre_groups)
+        self.assertIs(meshswap.get_instancer_asset(tree), asset)
+
     def test_meshswap_world_mineways_separated(self):
         test_subpath = os.path.join(
             "test_data", "mineways_test_separated_1_15_2.obj")
@@ -20,7 +20,10 @@ import unittest
 
 import bpy
 import os
+import tempfile
 
+from MCprep_addon import util
+from MCprep_addon.conf import env, LogLevel
 from MCprep_addon.util import nameGeneralize
 
 # TODO: restructure tests to be inside MCprep_addon to support rel imports.
@@ -87,6 +90,99 @@ class UtilOperatorsTest(unittest.TestCase):
                     res, test_sets[key],
                     f"{key} converts to {res} and should be {test_sets[key]}")
 
+    def test_blend_library_index(self):
+        """Ensure blend contents are indexed once and refreshed on change"""
+        mat = bpy.data.materials.new("library_index_test")
+        prior_path = env.library_index_path
+        prior_index = env.library_index
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            env.library_index_path = os.path.join(tmp_dir, "library_index.json")
+            env.library_index = None
+            self.addCleanup(setattr, env, "library_index", prior_index)
+            self.addCleanup(setattr, env, "library_index_path", prior_path)
+            blend = os.path.join(tmp_dir, "index_test.blend")
+            bpy.data.libraries.write(blend, {mat})
+
+            contents = util.get_blend_contents(blend)
+            self.assertIn(mat.name, contents.materials)
+            entry = env.library_index[os.path.abspath(blend)]
+            self.assertEqual(entry["size"], os.path.getsize(blend))
+
+            # Rewriting the file with new contents updates the index.
+            mat_b = bpy.data.materials.new("library_index_test_b")
+            bpy.data.libraries.write(blend, {mat, mat_b})
+            os.utime(blend, (entry["mtime"] + 10, entry["mtime"] + 10))
+            contents = util.get_blend_contents(blend)
+            self.assertIn(mat_b.name, contents.materials)
+
+            # Unchanged entries survive a reload from disk.
+            env.library_index = None
+            contents = util.get_blend_contents(blend)
+            self.assertIn(mat_b.name, contents.materials)
+        bpy.data.materials.remove(mat)
+        bpy.data.materials.remove(mat_b)
+
+
+    def test_instrumentation_spans(self):
+        """Spans only collect while instrumenting, and report per name."""
+        @env.span("test.decorated")
+        def decorated(value):
+            return value * 2
+
+        self.assertIsNone(env.spans)
+        self.assertEqual(decorated(2), 4)
+        self.assertIsNone(env.spans)
+
+        env.start_instrumentation()
+        try:
+            for i in range(3):
+                decorated(i)
+            with env.span("test.block"):
+                env.count("test_counter", 2)
+            res = bpy.ops.mcprep.instrumentation_report(
+                text_name="instrumentation_test.json")
+            self.assertEqual(res, {"FINISHED"})
+            report = env.instrumentation_report()
+        finally:
+            env.stop_instrumentation()
+
+        self.assertEqual(report["spans"]["test.decorated"]["calls"], 3)
+        self.assertEqual(report["spans"]["test.block"]["calls"], 1)
+        self.assertEqual(report["counters"], {"test_counter": 2})
+        self.assertIn("instrumentation_test.json", bpy.data.texts)
+        self.assertIsNone(env.counters)
+        with self.assertRaises(RuntimeError):
+            bpy.ops.mcprep.instrumentation_report()
+
+    def test_lazy_log(self):
+        """Log statements are only formatted when their level is enabled."""
+        calls = []
+
+        def statement():
+            calls.append(1)
+            return "lazy statement"
+
+        verbose, very_verbose = env.verbose, env.very_verbose
+        try:
+            env.verbose = False
+            env.very_verbose = False
+            env.log(statement)
+            env.log("Not formatted %s", object())
+            self.assertEqual(calls, [])
+            env.log("Warning %d", 1, level=LogLevel.WARNING)
+            self.assertEqual(env.log_history[-1], "Warning 1")
+
+            env.verbose = True
+            env.log(statement, vv_only=True)
+            self.assertEqual(calls, [])
+            env.log(statement)
+            self.assertEqual(calls, [1])
+            self.assertEqual(env.log_history[-1], "lazy statement")
+            env.log("Tile %d of %s", 2, "stone")
+            self.assertEqual(env.log_history[-1], "Tile 2 of stone")
+        finally:
+            env.verbose = verbose
+            env.very_verbose = very_verbose
 
 if __name__ == '__main__':
     # TODO: restructure tests to be inside MCprep_addon to support rel imports.